@@ -0,0 +1,38 @@
+"""add daily_rollups and votes.created_at index
+
+Revision ID: add_daily_rollups
+Revises: add_email_outbox
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_daily_rollups'
+down_revision = 'add_email_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_rollups',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('board_id', sa.BigInteger(), primary_key=True),
+        sa.Column('media_type', sa.String(length=20), primary_key=True),
+        sa.Column('uploads', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('votes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('unique_voters', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    # Rollups (and every "recent votes" query) filter votes by time.
+    # Built concurrently so voting isn't blocked while it builds.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_votes_created_at', 'votes', ['created_at'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_votes_created_at', table_name='votes', postgresql_concurrently=True)
+    op.drop_table('daily_rollups')
@@ -0,0 +1,43 @@
+"""add partial index of votes waiting for a GeoIP location
+
+Revision ID: add_votes_geoip_pending_index
+Revises: partition_votes
+Create Date: 2026-10-18 20:00:00.000000
+
+Postgres can't build an index on a partitioned table concurrently, so the
+parent index is created on votes alone (invalid until complete), each
+partition's index is built concurrently and attached, and the parent index
+becomes valid once every partition has one. Partitions created later get
+it automatically.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_votes_geoip_pending_index'
+down_revision = 'partition_votes'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_votes_geoip_pending'
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    op.execute(f"CREATE INDEX {INDEX} ON ONLY votes (created_at) WHERE country_code IS NULL")
+    partitions = conn.execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'votes'::regclass ORDER BY c.relname"
+    )).scalars().all()
+    # Voting isn't blocked while each partition's index builds
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_geoip_pending "
+                f"ON {partition} (created_at) WHERE country_code IS NULL"
+            )
+            op.execute(f"ALTER INDEX {INDEX} ATTACH PARTITION {partition}_geoip_pending")
+
+
+def downgrade() -> None:
+    op.execute(f"DROP INDEX IF EXISTS {INDEX}")
@@ -0,0 +1,26 @@
+"""add votes (media_type, media_id) index
+
+Revision ID: add_votes_media_index
+Revises: add_daily_rollups
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_votes_media_index'
+down_revision = 'add_daily_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Board tallies join votes to content on (media_type, media_id).
+    # Built concurrently so voting isn't blocked while it builds.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_votes_media', 'votes', ['media_type', 'media_id'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_votes_media', table_name='votes', postgresql_concurrently=True)
@@ -0,0 +1,143 @@
+"""partition votes by month and add vote_tally_archive
+
+Revision ID: partition_votes
+Revises: add_votes_media_index
+Create Date: 2026-10-18 18:00:00.000000
+
+The votes table is rebuilt as a table range-partitioned on created_at
+while voting continues:
+
+1. votes_new is created partitioned, with monthly partitions from the
+   oldest vote to a few months ahead, a default partition and all indexes.
+2. A trigger mirrors every insert, update and delete on votes into it.
+3. Existing rows are copied over in committed batches. Each batch locks its
+   source rows (FOR SHARE), so a concurrent update or delete waits for the
+   batch and is then mirrored on top of it.
+4. One short ACCESS EXCLUSIVE transaction drops the trigger, hands the id
+   sequence over, drops the old table and renames votes_new to votes.
+
+Later partitions are created, and old ones retired, by the scheduler (see
+app/vote_partitions.py).
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'partition_votes'
+down_revision = 'add_votes_media_index'
+branch_labels = None
+depends_on = None
+
+BATCH = 50_000
+MONTHS_AHEAD = 3
+
+INDEXES = [
+    # (name, columns)
+    ('ix_votes_id', 'id'),
+    ('ix_votes_voter_email', 'voter_email'),
+    ('ix_votes_media', 'media_type, media_id'),
+    ('ix_votes_created_at', 'created_at'),
+]
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_partition(table: str, month: date) -> None:
+    op.execute(
+        f"CREATE TABLE votes_p{month:%Y%m} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        'vote_tally_archive',
+        sa.Column('month', sa.Date(), primary_key=True),
+        sa.Column('media_type', sa.String(length=20), primary_key=True),
+        sa.Column('media_id', sa.BigInteger(), primary_key=True),
+        sa.Column('votes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('likes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('dislikes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+    conn = op.get_bind()
+    op.execute("UPDATE votes SET created_at = now() WHERE created_at IS NULL")
+    oldest = conn.execute(sa.text("SELECT min(created_at) AT TIME ZONE 'UTC' FROM votes")).scalar()
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    month = oldest.date().replace(day=1) if oldest else this_month
+
+    # The partition key has to be part of the primary key
+    op.execute("CREATE TABLE votes_new (LIKE votes INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)")
+    op.execute("ALTER TABLE votes_new ALTER COLUMN created_at SET NOT NULL")
+    op.execute("ALTER TABLE votes_new ADD CONSTRAINT votes_new_pkey PRIMARY KEY (id, created_at)")
+    op.execute("ALTER TABLE votes_new ADD CONSTRAINT votes_new_song_id_fkey FOREIGN KEY (song_id) REFERENCES songs (id)")
+    op.execute("ALTER TABLE votes_new ADD CONSTRAINT votes_new_voter_id_fkey FOREIGN KEY (voter_id) REFERENCES users (id)")
+    while month <= _add_months(this_month, MONTHS_AHEAD):
+        _create_partition('votes_new', month)
+        month = _add_months(month, 1)
+    op.execute("CREATE TABLE votes_default PARTITION OF votes_new DEFAULT")
+    for name, columns in INDEXES:
+        op.execute(f"CREATE INDEX {name}_new ON votes_new ({columns})")
+
+    op.execute("""
+        CREATE FUNCTION votes_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM votes_new WHERE id = OLD.id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO votes_new SELECT (NEW).*
+                ON CONFLICT (id, created_at) DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("CREATE TRIGGER votes_mirror AFTER INSERT OR UPDATE OR DELETE ON votes FOR EACH ROW EXECUTE FUNCTION votes_mirror()")
+
+    # Everything written from here on is mirrored; copy what was there before
+    with op.get_context().autocommit_block():
+        last_id = conn.execute(sa.text("SELECT coalesce(max(id), 0) FROM votes")).scalar()
+        start = 0
+        while start < last_id:
+            conn.execute(sa.text(
+                "INSERT INTO votes_new SELECT * FROM votes WHERE id > :start AND id <= :end "
+                "FOR SHARE ON CONFLICT (id, created_at) DO NOTHING"
+            ), {"start": start, "end": start + BATCH})
+            start += BATCH
+
+    op.execute("SET LOCAL lock_timeout = '10s'")
+    op.execute("LOCK TABLE votes IN ACCESS EXCLUSIVE MODE")
+    op.execute("DROP TRIGGER votes_mirror ON votes")
+    op.execute("DROP FUNCTION votes_mirror()")
+    op.execute("ALTER SEQUENCE votes_id_seq OWNED BY votes_new.id")
+    op.execute("DROP TABLE votes")
+    op.execute("ALTER TABLE votes_new RENAME TO votes")
+    op.execute("ALTER TABLE votes RENAME CONSTRAINT votes_new_pkey TO votes_pkey")
+    op.execute("ALTER TABLE votes RENAME CONSTRAINT votes_new_song_id_fkey TO votes_song_id_fkey")
+    op.execute("ALTER TABLE votes RENAME CONSTRAINT votes_new_voter_id_fkey TO votes_voter_id_fkey")
+    for name, _ in INDEXES:
+        op.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+
+
+def downgrade() -> None:
+    # Back to a single table. Votes in retired partitions are gone; only
+    # their archived tallies were kept, and they are dropped here too.
+    op.execute("LOCK TABLE votes IN ACCESS EXCLUSIVE MODE")
+    op.execute("CREATE TABLE votes_old (LIKE votes INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    op.execute("INSERT INTO votes_old SELECT * FROM votes")
+    op.execute("ALTER SEQUENCE votes_id_seq OWNED BY votes_old.id")
+    op.execute("DROP TABLE votes")
+    op.execute("ALTER TABLE votes_old RENAME TO votes")
+    op.execute("ALTER TABLE votes ADD CONSTRAINT votes_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE votes ADD CONSTRAINT votes_song_id_fkey FOREIGN KEY (song_id) REFERENCES songs (id)")
+    op.execute("ALTER TABLE votes ADD CONSTRAINT votes_voter_id_fkey FOREIGN KEY (voter_id) REFERENCES users (id)")
+    for name, columns in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON votes ({columns})")
+    op.drop_table('vote_tally_archive')
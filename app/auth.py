@@ -1,27 +1,26 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from .database import get_db
 from app.models import User
 from .config import settings
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from . import user_cache
+# Password hashing lives in app.passwords (runs on its own thread pool)
+from .passwords import (
+    pwd_context,
+    verify_password,
+    get_password_hash,
+    check_password,
+    verify_password_async,
+    hash_password_async,
+)
 
 # JWT token handling
 security = HTTPBearer()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,7 +28,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     
-    to_encode.update({"exp": expire})
+    # iat keys the user cache, so a fresh login never sees an older cached entry
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
@@ -55,16 +55,16 @@ async def get_current_user(
         if payload is None:
             raise credentials_exception
         
-        user_id: int = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
             raise credentials_exception
+        user_id = int(user_id)
             
-    except JWTError:
+    except (JWTError, ValueError):
         raise credentials_exception
     
-    # Get user from database
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    # Cached per worker; only a cache miss touches the users table
+    user = await user_cache.get_user(db, user_id, payload.get("iat"))
     
     if user is None:
         raise credentials_exception
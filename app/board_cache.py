@@ -0,0 +1,192 @@
+"""
+Rendered page cache for board and smart-vote pages.
+
+Each board has two version counters in Redis:
+
+  * content - bumped when content is uploaded or approved on the board;
+  * tally   - bumped whenever a vote on the board's content changes.
+
+Pages are cached under a key built from the page name, board id, the
+versions that page depends on and (where the template renders it) the
+request URL, so a write never has to find and delete cached pages: bumping
+a version simply makes the old keys unreachable, and they age out.
+
+Counters start at the current epoch in milliseconds (SET NX), so if Redis
+loses them they restart at a value no earlier page was cached under.
+
+Lookups go through an in-process tier first, then Redis; the version read
+(one MGET) always goes to Redis, so every worker sees a bump immediately.
+Without Redis there are no trustworthy versions and pages are rendered
+normally. Only anonymous traffic (no session cookie) is served from cache.
+
+The same versions make ETags for the board JSON APIs: board_etag() costs one
+MGET, so a poller presenting a current If-None-Match gets a 304 before any
+content table is queried.
+"""
+import hashlib
+import logging
+import time
+from typing import Optional, Sequence
+
+from fastapi import Request, Response
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .config import settings
+from .models import Board
+from .redis_client import get_redis, mark_redis_down
+
+logger = logging.getLogger(__name__)
+
+CONTENT = "content"
+TALLY = "tally"
+
+# Idle version keys expire; a fresh epoch value then just invalidates old pages
+VERSION_TTL = 30 * 86400
+
+_local_pages = TTLCache(maxsize=settings.page_cache_local_size, ttl=settings.page_cache_ttl)
+# Slugs don't move between boards, so this only needs to expire eventually
+_slug_ids = TTLCache(maxsize=10_000, ttl=300)
+
+
+def _version_key(board_id: int, kind: str) -> str:
+    return f"board:{board_id}:{kind}_ver"
+
+
+def is_cacheable(request: Request) -> bool:
+    """Anonymous GETs only; signed-in visitors always get a fresh render"""
+    return (
+        settings.page_cache_enabled
+        and request.method == "GET"
+        and settings.session_cookie_name not in request.cookies
+    )
+
+
+async def board_id_for_slug(db: AsyncSession, slug: str) -> Optional[int]:
+    board_id = _slug_ids.get(slug)
+    if board_id is None:
+        result = await db.execute(select(Board.id).where(Board.slug == slug))
+        board_id = result.scalar_one_or_none()
+        if board_id is not None:
+            _slug_ids.set(slug, board_id)
+    return board_id
+
+
+async def get_versions(board_id: int, kinds: Sequence[str]) -> Optional[list]:
+    """Current version numbers for a board, or None when Redis is unavailable"""
+    redis = await get_redis()
+    if redis is None:
+        return None
+    keys = [_version_key(board_id, kind) for kind in kinds]
+    try:
+        values = await redis.mget(keys)
+        if None in values:
+            epoch = int(time.time() * 1000)
+            pipe = redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.set(key, epoch, nx=True, ex=VERSION_TTL)
+            pipe.mget(keys)
+            values = (await pipe.execute())[-1]
+        return [int(value) for value in values]
+    except RedisError as e:
+        mark_redis_down(e)
+        return None
+
+
+async def bump(board_id: Optional[int], *kinds: str) -> None:
+    """Invalidate every cached page depending on these versions of a board"""
+    if board_id is None:
+        return
+    redis = await get_redis()
+    if redis is None:
+        return
+    try:
+        pipe = redis.pipeline(transaction=False)
+        for kind in kinds:
+            pipe.incr(_version_key(board_id, kind))
+        await pipe.execute()
+    except RedisError as e:
+        mark_redis_down(e)
+
+
+async def bump_content(board_id: Optional[int]) -> None:
+    await bump(board_id, CONTENT)
+
+
+async def bump_tally(board_id: Optional[int]) -> None:
+    await bump(board_id, TALLY)
+
+
+async def page_key(page: str, board_id: int, kinds: Sequence[str], extra: str = "") -> Optional[str]:
+    """Cache key for a page at the board's current versions, or None if caching is off"""
+    versions = await get_versions(board_id, kinds)
+    if versions is None:
+        return None
+    suffix = hashlib.blake2b(extra.encode(), digest_size=8).hexdigest() if extra else "-"
+    return f"page:{page}:{board_id}:{':'.join(map(str, versions))}:{suffix}"
+
+
+async def get_page(key: str) -> Optional[bytes]:
+    body = _local_pages.get(key)
+    if body is not None:
+        return body
+    redis = await get_redis()
+    if redis is None:
+        return None
+    try:
+        body = await redis.get(key)
+    except RedisError as e:
+        mark_redis_down(e)
+        return None
+    if body is not None:
+        _local_pages.set(key, body)
+    return body
+
+
+async def set_page(key: str, body: bytes) -> None:
+    _local_pages.set(key, body)
+    redis = await get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.set(key, body, ex=settings.page_cache_ttl)
+    except RedisError as e:
+        mark_redis_down(e)
+
+
+async def board_etag(board_id: int, extra: str = "") -> Optional[str]:
+    """Weak ETag for board data at its current content and tally versions"""
+    versions = await get_versions(board_id, [CONTENT, TALLY])
+    if versions is None:
+        return None
+    token = hashlib.blake2b(f"{board_id}:{versions[0]}:{versions[1]}:{extra}".encode(), digest_size=12).hexdigest()
+    return f'W/"{token}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" name the same representation
+    bare = etag[2:]
+    return "*" in candidates or etag in candidates or bare in candidates
+
+
+def set_cache_headers(response: Response, etag: Optional[str]) -> None:
+    """ETag plus a short shared-cache lifetime for CDNs"""
+    if etag is None:
+        return
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = (
+        f"public, max-age={settings.api_cache_max_age}, "
+        f"stale-while-revalidate={settings.api_cache_stale_while_revalidate}"
+    )
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_cache_headers(response, etag)
+    return response
@@ -0,0 +1,214 @@
+"""
+Per-board vote statistics in one pass.
+
+The board's content is gathered into one CTE (UNION ALL over songs, videos
+and visuals, tagged with its media type) and LEFT JOINed to votes on
+(media_type, media_id), so ids from different media tables never mix.
+Likes and dislikes per item come from ``count(*) FILTER (WHERE ...)``;
+ranking() adds DENSE_RANK and a tie-broken position over those tallies, and
+board totals, per-type content counts and the cross-media top N are window
+functions over the ranking, so a whole stats dashboard is a single query.
+Tallies include months of votes retired into vote_tally_archive.
+
+voting_stats() reads the same join for vote totals, unique voters and the
+per-country breakdown, with ROLLUP adding the board-wide row to the
+per-country groups so one scan of the board's votes answers all three. It
+only covers votes that haven't been retired (see app/vote_partitions.py).
+
+Only media types the board allows are included.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, and_, func, literal, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import vote_media
+from .models import Board, Song, Video, Visual, Vote, VoteTallyArchive
+
+MEDIA_MODELS = {"music": Song, "video": Video, "visuals": Visual}
+
+
+def allowed_media_types(board: Board) -> List[str]:
+    allowed = {"music": board.allow_music, "video": board.allow_video, "visuals": board.allow_visuals}
+    return [media_type for media_type, ok in allowed.items() if ok]
+
+
+def _items(board_id: int, media_types: Sequence[str], approved_only: bool = False):
+    """CTE of (media_type, id, title, artist_name, file_path, external_link) for each item on the board"""
+    parts = []
+    for media_type, model in MEDIA_MODELS.items():
+        if media_type not in media_types:
+            continue
+        part = select(
+            literal(media_type, String).label("media_type"),
+            model.id.label("id"),
+            model.title.label("title"),
+            model.artist_name.label("artist_name"),
+            model.file_path.label("file_path"),
+            model.external_link.label("external_link"),
+        ).where(model.board_id == board_id)
+        if approved_only:
+            part = part.where(model.is_approved == True)
+        parts.append(part)
+    return union_all(*parts).cte("items")
+
+
+def _on_item(items):
+    return and_(Vote.media_type == items.c.media_type, Vote.media_id == items.c.id)
+
+
+def tallies(board_id: int, media_types: Sequence[str], approved_only: bool = False):
+    """CTE of each item on the board with its likes and dislikes, archived months included"""
+    items = _items(board_id, media_types, approved_only)
+    archived = (
+        select(
+            VoteTallyArchive.media_type,
+            VoteTallyArchive.media_id,
+            func.sum(VoteTallyArchive.likes).label("likes"),
+            func.sum(VoteTallyArchive.dislikes).label("dislikes"),
+        )
+        .where(tuple_(VoteTallyArchive.media_type, VoteTallyArchive.media_id).in_(
+            select(items.c.media_type, items.c.id)
+        ))
+        .group_by(VoteTallyArchive.media_type, VoteTallyArchive.media_id)
+        .subquery("archived")
+    )
+    return (
+        select(
+            *items.c,
+            (func.count(Vote.id).filter(Vote.vote_type == "like") + func.coalesce(archived.c.likes, 0)).label("likes"),
+            (func.count(Vote.id).filter(Vote.vote_type == "dislike") + func.coalesce(archived.c.dislikes, 0)).label("dislikes"),
+        )
+        .select_from(items)
+        .outerjoin(Vote, _on_item(items))
+        .outerjoin(archived, and_(archived.c.media_type == items.c.media_type, archived.c.media_id == items.c.id))
+        .group_by(*items.c, archived.c.likes, archived.c.dislikes)
+        .cte("tallies")
+    )
+
+
+def ranking(board_id: int, media_types: Sequence[str], approved_only: bool = False):
+    """CTE ranking every item on the board by likes, across media types
+
+    rank is DENSE_RANK, so tied items share a rank and the next rank follows
+    on; position numbers items 1..n in display order, breaking ties by media
+    type then id so pages and neighbours are stable between requests.
+    """
+    t = tallies(board_id, media_types, approved_only)
+    return select(
+        *t.c,
+        func.dense_rank().over(order_by=t.c.likes.desc()).label("rank"),
+        func.row_number().over(order_by=(t.c.likes.desc(), t.c.media_type, t.c.id)).label("position"),
+    ).cte("ranking")
+
+
+async def item_tallies(db: AsyncSession, board_id: int, media_types: Sequence[str]) -> Dict[Tuple[str, int], Tuple[int, int]]:
+    """{(media_type, id): (likes, dislikes)} for every item on the board"""
+    if not media_types:
+        return {}
+    t = tallies(board_id, media_types)
+    result = await db.execute(select(t.c.media_type, t.c.id, t.c.likes, t.c.dislikes))
+    return {(row.media_type, row.id): (row.likes, row.dislikes) for row in result.all()}
+
+
+async def board_stats(db: AsyncSession, board: Board, top_n: int = 5) -> Dict:
+    """Content counts, vote totals and the top items by likes across media types"""
+    media_types = allowed_media_types(board)
+    stats = {
+        "content_counts": {media_type: 0 for media_type in MEDIA_MODELS},
+        "total_content": 0,
+        "total_upvotes": 0,
+        "total_downvotes": 0,
+        "top_content": [],
+    }
+    if not media_types:
+        return stats
+
+    r = ranking(board.id, media_types)
+    type_counts = [
+        func.count().filter(r.c.media_type == media_type).over().label(f"{media_type}_count")
+        for media_type in MEDIA_MODELS
+    ]
+    result = await db.execute(
+        select(
+            r.c.media_type,
+            r.c.id,
+            r.c.title,
+            r.c.artist_name,
+            r.c.likes,
+            r.c.rank,
+            func.count().over().label("total_content"),
+            func.sum(r.c.likes).over().label("total_upvotes"),
+            func.sum(r.c.dislikes).over().label("total_downvotes"),
+            *type_counts,
+        )
+        .order_by(r.c.position)
+        .limit(max(top_n, 1))  # the totals ride on the first row
+    )
+    rows = result.all()
+    if not rows:
+        return stats
+
+    first = rows[0]
+    stats["content_counts"] = {media_type: getattr(first, f"{media_type}_count") for media_type in MEDIA_MODELS}
+    stats["total_content"] = first.total_content
+    stats["total_upvotes"] = int(first.total_upvotes or 0)
+    stats["total_downvotes"] = int(first.total_downvotes or 0)
+    # Items nobody has liked aren't "top" content
+    stats["top_content"] = [
+        {
+            "id": row.id,
+            "title": row.title,
+            "artist_name": row.artist_name,
+            "content_type": row.media_type,
+            "upvotes": row.likes,
+            "rank": row.rank,
+        }
+        for row in rows[:top_n]
+        if row.likes > 0
+    ]
+    return stats
+
+
+async def voting_stats(
+    db: AsyncSession,
+    board: Board,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> Dict:
+    """Total votes, unique voters and votes per country, optionally for days in [start, end]"""
+    stats = {"total_votes": 0, "unique_voters": 0, "votes_by_country": []}
+    media_types = allowed_media_types(board)
+    if not media_types:
+        return stats
+
+    items = _items(board.id, media_types)
+    country = Vote.country_code
+    query = (
+        select(
+            country,
+            func.grouping(country).label("board_wide"),
+            func.count().label("votes"),
+            func.count(func.distinct(vote_media.voter_key)).label("voters"),
+        )
+        .select_from(items)
+        .join(Vote, _on_item(items))
+        .group_by(func.rollup(country))
+    )
+    if start is not None:
+        query = query.where(Vote.created_at >= datetime.combine(start, time.min, tzinfo=timezone.utc))
+    if end is not None:
+        # Inclusive of the whole end day
+        query = query.where(Vote.created_at < datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc))
+
+    by_country = []
+    for row in (await db.execute(query)).all():
+        if row.board_wide:
+            stats["total_votes"] = row.votes
+            stats["unique_voters"] = row.voters
+        else:
+            by_country.append({"country": row.country_code, "votes": row.votes, "unique_voters": row.voters})
+    by_country.sort(key=lambda entry: entry["votes"], reverse=True)
+    stats["votes_by_country"] = by_country
+    return stats
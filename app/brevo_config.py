@@ -1,23 +1,72 @@
-import os
-from sib_api_v3_sdk import Configuration, ApiClient, TransactionalEmailsApi
-from sib_api_v3_sdk.models import SendSmtpEmail, SendSmtpEmailTo, SendSmtpEmailSender
+"""
+Brevo (Sendinblue) API calls and email payloads.
 
-# Brevo API Configuration
-BREVO_API_KEY = os.getenv("BREVO_API_KEY", "your-api-key-here")
+Requests go through the shared async HTTP client; nothing here blocks the
+event loop. Routes should not call send_transactional()/import_contacts()
+directly - they enqueue through app.email_outbox and the dispatcher delivers.
+The base URL is configurable (BREVO_API_BASE_URL) so a local stand-in can be
+used in development.
+"""
+from typing import Any, Dict, List, Optional
 
-# Configure Brevo API
-configuration = Configuration()
-configuration.api_key['api-key'] = BREVO_API_KEY
+import httpx
 
-# Create API client
-api_client = ApiClient(configuration)
-transactional_api = TransactionalEmailsApi(api_client)
+from .config import settings
+from .http_client import get_http_client
 
-def send_welcome_email(user_email: str, user_name: str, media_board_name: str, media_board_slug: str):
-    """Send welcome email to media board purchaser"""
+BREVO_SENDER = {"email": "noreply@urvote.rocks", "name": "UrVote.Rocks"}
+
+
+class BrevoError(Exception):
+    """A failed Brevo call; status_code is None for network errors"""
+
+    def __init__(self, status_code: Optional[int], message: str):
+        super().__init__(f"{status_code or 'network'}: {message}")
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+async def _post(path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    if not settings.brevo_api_key:
+        raise BrevoError(None, "BREVO_API_KEY is not configured")
+    headers = {
+        "accept": "application/json",
+        "api-key": settings.brevo_api_key,
+        "content-type": "application/json",
+    }
     try:
-        # Create email content
-        html_content = f"""
+        response = await get_http_client().post(
+            f"{settings.brevo_api_base_url}{path}", headers=headers, json=body
+        )
+    except httpx.HTTPError as e:
+        raise BrevoError(None, str(e) or type(e).__name__)
+    if response.status_code >= 300:
+        raise BrevoError(response.status_code, response.text[:500])
+    return response.json() if response.content else {}
+
+
+async def send_transactional(payload: Dict[str, Any]) -> Optional[str]:
+    """Send one transactional email; returns Brevo's message id"""
+    result = await _post("/smtp/email", payload)
+    return result.get("messageId")
+
+
+async def import_contacts(emails: List[str], list_id: int) -> None:
+    """Add or update many contacts on a list in a single request"""
+    await _post("/contacts/import", {
+        "jsonBody": [{"email": email} for email in emails],
+        "listIds": [list_id],
+        "updateExistingContacts": True,
+        "emptyContactsAttributes": False,
+    })
+
+
+def welcome_email(user_email: str, user_name: str, media_board_name: str, media_board_slug: str) -> Dict[str, Any]:
+    """Welcome email for a media board purchaser"""
+    html_content = f"""
         <html>
         <body>
             <h2>Welcome to UrVote.Rocks! 🎉</h2>
@@ -30,36 +79,17 @@ def send_welcome_email(user_email: str, user_name: str, media_board_name: str, m
         </body>
         </html>
         """
-        
-        # Create email
-        send_smtp_email = SendSmtpEmail(
-            to=[SendSmtpEmailTo(email=user_email, name=user_name)],
-            sender=SendSmtpEmailSender(email="noreply@urvote.rocks", name="UrVote.Rocks"),
-            subject=f"Welcome to UrVote.Rocks - {media_board_name}",
-            html_content=html_content
-        )
-        
-        # Send email
-        api_response = transactional_api.send_transac_email(send_smtp_email)
-        
-        return {
-            "success": True,
-            "message_id": api_response.message_id,
-            "error": None
-        }
-        
-    except Exception as e:
-        return {
-            "success": False,
-            "message_id": None,
-            "error": str(e)
-        }
-
-def send_test_email(test_email: str):
-    """Send test email to verify Brevo integration"""
-    try:
-        # Create email content
-        html_content = """
+    return {
+        "sender": BREVO_SENDER,
+        "to": [{"email": user_email, "name": user_name}],
+        "subject": f"Welcome to UrVote.Rocks - {media_board_name}",
+        "htmlContent": html_content,
+    }
+
+
+def test_email(to_email: str) -> Dict[str, Any]:
+    """Email used to verify the Brevo integration"""
+    html_content = """
         <html>
         <body>
             <h2>Brevo Integration Test ✅</h2>
@@ -70,27 +100,49 @@ def send_test_email(test_email: str):
         </body>
         </html>
         """
-        
-        # Create email
-        send_smtp_email = SendSmtpEmail(
-            to=[SendSmtpEmailTo(email=test_email, name="Test User")],
-            sender=SendSmtpEmailSender(email="noreply@urvote.rocks", name="UrVote.Rocks"),
-            subject="Brevo Integration Test - UrVote.Rocks",
-            html_content=html_content
-        )
-        
-        # Send email
-        api_response = transactional_api.send_transac_email(send_smtp_email)
-        
-        return {
-            "success": True,
-            "message_id": api_response.message_id,
-            "error": None
-        }
-        
-    except Exception as e:
-        return {
-            "success": False,
-            "message_id": None,
-            "error": str(e)
-        }
+    return {
+        "sender": BREVO_SENDER,
+        "to": [{"email": to_email, "name": "Test User"}],
+        "subject": "Brevo Integration Test - UrVote.Rocks",
+        "htmlContent": html_content,
+    }
+
+
+def contact_form_email(first_name: str, last_name: str, email: str, subject: str, message: str) -> Dict[str, Any]:
+    """Contact form submission, addressed to support"""
+    return {
+        "sender": {
+            "name": "UrVote.Rocks Contact Form",
+            "email": "noreply@urvote.rocks"
+        },
+        "to": [
+            {
+                "email": "support@urvote.rocks",
+                "name": "UrVote.Rocks Support"
+            }
+        ],
+        "subject": f"Contact Form: {subject}",
+        "htmlContent": f"""
+            <h2>New Contact Form Submission</h2>
+            <p><strong>Name:</strong> {first_name} {last_name}</p>
+            <p><strong>Email:</strong> {email}</p>
+            <p><strong>Subject:</strong> {subject}</p>
+            <p><strong>Message:</strong></p>
+            <p>{message.replace(chr(10), '<br>')}</p>
+            <hr>
+            <p><em>This message was sent from the UrVote.Rocks contact form.</em></p>
+            """,
+        "textContent": f"""
+            New Contact Form Submission
+
+            Name: {first_name} {last_name}
+            Email: {email}
+            Subject: {subject}
+
+            Message:
+            {message}
+
+            ---
+            This message was sent from the UrVote.Rocks contact form.
+            """
+    }
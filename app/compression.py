@@ -0,0 +1,40 @@
+"""
+Response compression.
+
+Uses Brotli (with gzip fallback) when the optional ``brotli-asgi`` package is
+installed, otherwise Starlette's gzip. Responses smaller than
+``compression_minimum_size`` are sent as-is, and uploaded media under
+/uploads is never recompressed - it is already compressed and large, so it
+would only cost CPU.
+"""
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .config import settings
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # optional dependency
+    BrotliMiddleware = None
+
+SKIP_PREFIXES = ("/uploads/",)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 500) -> None:
+        self.app = app
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(
+                app,
+                quality=settings.brotli_quality,
+                minimum_size=minimum_size,
+                gzip_fallback=True,
+            )
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not scope["path"].startswith(SKIP_PREFIXES):
+            await self.compressed(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 import os
 os.environ.clear()  # Clear any cached environment variables
 
@@ -12,6 +12,38 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     
+    # Password hashing (bcrypt runs on a bounded thread pool)
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 32  # queued hashes before answering 503
+    password_hash_slow_wait: float = 0.5  # seconds of queueing that get logged
+    
+    # Authenticated user cache (per worker, invalidated over Redis pub/sub)
+    user_cache_enabled: bool = True
+    user_cache_ttl: int = 60
+    user_cache_size: int = 10_000
+    
+    # Server-side sessions ("redis" falls back to memory while Redis is down)
+    session_backend: str = "redis"
+    session_cookie_name: str = "urvote_session"
+    session_max_age: int = 14 * 24 * 60 * 60
+    session_https_only: bool = False
+    
+    # Rendered board / smart-vote page cache (anonymous traffic only)
+    page_cache_enabled: bool = True
+    page_cache_ttl: int = 600
+    page_cache_local_size: int = 256  # pages kept in each worker
+    site_stats_ttl: int = 60  # seconds site-wide song/vote totals are reused
+    leaderboard_cache_ttl: int = 15  # seconds a ranked leaderboard page is reused
+    
+    # Cache-Control for board JSON APIs (sent with their ETags)
+    api_cache_max_age: int = 5
+    api_cache_stale_while_revalidate: int = 30
+    
+    # Response compression (Brotli needs the optional brotli-asgi package)
+    compression_minimum_size: int = 500
+    brotli_quality: int = 4
+    
     # File Upload - Multi-Client Structure
     upload_dir: str = "/opt/urvote/uploads"
     clients_dir: str = "/opt/urvote/uploads/clients"
@@ -26,6 +58,25 @@ class Settings(BaseSettings):
     
     # Redis
     redis_url: str = "redis://localhost:6379"
+    redis_enabled: bool = True
+    redis_socket_timeout: float = 0.5  # seconds
+    redis_retry_seconds: int = 30  # how long to use in-process fallbacks after a Redis failure
+    
+    # Rate Limiting ("count/second|minute|hour|day")
+    rate_limit_enabled: bool = True
+    rate_limits: Dict[str, str] = {
+        "vote": "30/minute",
+        "upload": "10/minute",
+        "signup": "5/minute",
+        "login": "10/minute",
+    }
+    rate_limit_board_overrides: Dict[str, str] = {}  # e.g. {"12:upload": "3/minute"}
+    rate_limit_ip_multiplier: int = 5  # per-IP allowance relative to per-device limit
+    
+    # "Already voted today" Bloom filter
+    vote_bloom_enabled: bool = True
+    vote_bloom_capacity: int = 1_000_000  # expected votes per day
+    vote_bloom_error_rate: float = 0.01
     
     # External Services
     recaptcha_secret: Optional[str] = None
@@ -36,10 +87,14 @@ class Settings(BaseSettings):
     
     # App Settings
     app_name: str = "UrVote.Rocks"
-    debug: bool = False
+    debug: bool = False  # also enables template auto-reload
+    template_bytecode_cache_dir: Optional[str] = None  # defaults to a temp dir
     
     # GeoIP Service
     geoip_api_key: Optional[str] = None
+    geoip_database_path: Optional[str] = None  # local GeoLite2/GeoIP2 .mmdb for vote locations (app/geoip.py)
+    geoip_cache_size: int = 65536  # /24 (IPv6: /48) prefixes cached per worker
+    geoip_interval: int = 60  # seconds between runs of the vote location job
 
     # DigitalOcean Spaces Configuration
     spaces_endpoint: str = "https://sfo3.digitaloceanspaces.com"
@@ -61,11 +116,53 @@ class Settings(BaseSettings):
     # Brevo Email Configuration
     brevo_api: Optional[str] = None
     brevo_api_key: Optional[str] = None
+    brevo_api_base_url: str = "https://api.brevo.com/v3"  # point at a local stand-in for testing
+    brevo_newsletter_list_id: int = 9
+    
+    # Email outbox dispatcher
+    email_dispatcher_enabled: bool = True
+    email_outbox_batch_size: int = 50
+    email_outbox_poll_interval: float = 2.0
+    email_max_attempts: int = 8
+    email_retry_base: float = 30.0  # seconds, doubled per attempt
+    email_retry_max: float = 3600.0
+    email_outbox_lease: float = 300.0  # seconds a claimed row is held before another worker may retry it
+    
+    # Trending scores (app/trending.py)
+    trending_half_life: float = 6 * 3600  # seconds for a like's weight to halve
+    trending_min_score: float = 1.0  # decayed likes for an item to count as trending
+    
+    # Background jobs (app/scheduler.py)
+    scheduler_enabled: bool = True
+    rollup_interval: int = 300  # seconds between refreshes of today's daily rollups
+    vote_partition_interval: int = 6 * 3600  # seconds between votes partition maintenance runs
+    vote_partitions_ahead: int = 3  # months of votes partitions created in advance
+    vote_retention_months: int = 0  # retire raw votes (keeping tallies) after this many months; 0 = keep forever
+    
+    # Columnar vote archive for analytics (app/vote_archive.py; needs pyarrow)
+    vote_archive_enabled: bool = False
+    vote_archive_storage: str = "local"  # "local" or "spaces"
+    vote_archive_path: str = "archive/votes"  # directory, or key prefix in the Spaces bucket
+    vote_archive_interval: int = 6 * 3600  # seconds between checks for newly ended months
+    
+    # Vote-ring detection (app/fraud.py)
+    fraud_min_ring_size: int = 5  # voters in a cluster for it to be reported
+    fraud_link_window: float = 600  # seconds; votes this close from one fingerprint, IP or uncommon domain link their voters
+    fraud_common_domain_share: float = 0.2  # email domains used by more of a board's voters don't link
+    
+    # Outbound HTTP (shared client)
+    http_timeout: float = 10.0
+    http_connect_timeout: float = 5.0
     
     # Google OAuth Configuration
     google_client_id: Optional[str] = None
     google_client_secret: Optional[str] = None
     google_redirect_uri: str = "http://localhost:8000/auth/google/callback"
+    # Provider endpoints; override to test against a local fake IdP
+    google_auth_uri: str = "https://accounts.google.com/o/oauth2/v2/auth"
+    google_token_uri: str = "https://oauth2.googleapis.com/token"
+    google_jwks_uri: str = "https://www.googleapis.com/oauth2/v3/certs"
+    google_issuers: List[str] = ["https://accounts.google.com", "accounts.google.com"]
 
     @property
     def allowed_extensions(self) -> set:
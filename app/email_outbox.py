@@ -0,0 +1,161 @@
+"""
+Email outbox: routes enqueue, a background dispatcher delivers.
+
+Newsletter signups and contact form messages used to call Brevo inline, so a
+slow provider stalled the request (and, with the blocking client, the whole
+worker). Now the route inserts an EmailOutbox row and returns. Every worker
+runs run_dispatcher() from the app lifespan:
+
+  * rows are claimed with FOR UPDATE SKIP LOCKED and leased by moving
+    next_attempt_at ``email_outbox_lease`` seconds ahead in a short
+    transaction, so workers don't send the same row twice and a crashed
+    worker's rows become claimable again once the lease runs out. Brevo is
+    called with no transaction open, and the results are recorded in a
+    second one;
+  * contact rows are grouped per list into one /contacts/import call. If
+    Brevo rejects a batch outright (one malformed address fails the whole
+    import), it is split in halves until the bad rows are isolated, so only
+    they are marked failed;
+  * transactional emails are sent concurrently over the pooled HTTP client;
+  * failures are retried with exponential backoff (plus jitter) until
+    ``email_max_attempts``; 4xx responses other than 429 fail immediately.
+"""
+import asyncio
+import logging
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import brevo_config
+from .brevo_config import BrevoError
+from .config import settings
+from .database import AsyncSessionLocal
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+KIND_TRANSACTIONAL = "transactional"
+KIND_CONTACT = "contact"
+
+# Wakes this worker's dispatcher as soon as something is queued
+_wakeup = asyncio.Event()
+
+
+async def enqueue(db: AsyncSession, kind: str, payload: Dict[str, Any]) -> EmailOutbox:
+    row = EmailOutbox(kind=kind, payload=payload, status="pending")
+    db.add(row)
+    await db.commit()
+    _wakeup.set()
+    return row
+
+
+async def enqueue_email(db: AsyncSession, payload: Dict[str, Any]) -> EmailOutbox:
+    """Queue a Brevo transactional email (an /smtp/email request body)"""
+    return await enqueue(db, KIND_TRANSACTIONAL, payload)
+
+
+async def enqueue_contact(db: AsyncSession, email: str, list_id: int) -> EmailOutbox:
+    """Queue adding a contact to a Brevo list"""
+    return await enqueue(db, KIND_CONTACT, {"email": email, "list_id": list_id})
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before attempt number `attempts + 1`"""
+    delay = min(settings.email_retry_base * 2 ** (attempts - 1), settings.email_retry_max)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _mark_sent(row: EmailOutbox, now: datetime) -> None:
+    row.status = "sent"
+    row.attempts += 1
+    row.sent_at = now
+    row.last_error = None
+
+
+def _mark_failed(row: EmailOutbox, error: BrevoError, now: datetime) -> None:
+    row.attempts += 1
+    row.last_error = str(error)
+    if not error.retryable or row.attempts >= settings.email_max_attempts:
+        row.status = "failed"
+        logger.error("Giving up on outbox row %s after %d attempts: %s", row.id, row.attempts, error)
+    else:
+        row.next_attempt_at = now + timedelta(seconds=retry_delay(row.attempts))
+
+
+async def _deliver_email(row: EmailOutbox, now: datetime) -> None:
+    try:
+        await brevo_config.send_transactional(row.payload)
+        _mark_sent(row, now)
+    except BrevoError as e:
+        _mark_failed(row, e, now)
+
+
+async def _deliver_contacts(list_id: int, rows: List[EmailOutbox], now: datetime) -> None:
+    try:
+        await brevo_config.import_contacts([row.payload["email"] for row in rows], list_id)
+        for row in rows:
+            _mark_sent(row, now)
+    except BrevoError as e:
+        if len(rows) > 1 and not e.retryable:
+            middle = len(rows) // 2
+            await _deliver_contacts(list_id, rows[:middle], now)
+            await _deliver_contacts(list_id, rows[middle:], now)
+            return
+        for row in rows:
+            _mark_failed(row, e, now)
+
+
+async def dispatch_batch() -> int:
+    """Deliver up to one batch of due rows; returns how many were processed"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(EmailOutbox)
+            .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= func.now())
+            .order_by(EmailOutbox.id)
+            .limit(settings.email_outbox_batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = result.scalars().all()
+        if not rows:
+            return 0
+        # Lease the rows, then release the locks before calling Brevo
+        now = datetime.now(timezone.utc)
+        for row in rows:
+            row.next_attempt_at = now + timedelta(seconds=settings.email_outbox_lease)
+        await db.commit()
+
+        contacts_by_list = defaultdict(list)
+        jobs = []
+        for row in rows:
+            if row.kind == KIND_CONTACT:
+                contacts_by_list[row.payload["list_id"]].append(row)
+            else:
+                jobs.append(_deliver_email(row, now))
+        for list_id, list_rows in contacts_by_list.items():
+            jobs.append(_deliver_contacts(list_id, list_rows, now))
+
+        # Results go in a second transaction
+        await asyncio.gather(*jobs)
+        await db.commit()
+        return len(rows)
+
+
+async def run_dispatcher() -> None:
+    """Deliver queued rows for the lifetime of the app"""
+    while True:
+        _wakeup.clear()
+        try:
+            processed = await dispatch_batch()
+        except Exception:
+            logger.exception("Email outbox dispatch failed")
+            processed = 0
+        if processed >= settings.email_outbox_batch_size:
+            continue  # more may be waiting
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.email_outbox_poll_interval)
+        except asyncio.TimeoutError:
+            pass
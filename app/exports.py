@@ -0,0 +1,118 @@
+"""
+Streaming voter exports.
+
+One query joins votes to users (and to the content tables for board
+filtering) and is read through a server-side cursor in batches of
+``EXPORT_BATCH`` rows, so memory stays flat however many votes match. Rows
+are encoded as CSV, NDJSON or a JSON array and yielded in chunks for a
+StreamingResponse.
+
+The generator opens its own session: the request's session may be closed
+before the body has finished streaming.
+"""
+import csv
+import io
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterator, Optional
+
+import orjson
+from sqlalchemy import func, select
+
+from . import vote_media
+from .database import AsyncSessionLocal
+from .models import User, Vote
+
+EXPORT_BATCH = 2000
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+COLUMNS = [
+    "vote_id", "email", "voter_name", "voter_id", "voter_type", "media_type", "media_id",
+    "board_id", "song_id", "vote_type", "ip_address", "country", "voted_at",
+]
+
+
+def voters_query(
+    board_id: Optional[int] = None,
+    media_type: Optional[str] = None,
+    media_id: Optional[int] = None,
+    song_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    query = vote_media.join_media(
+        select(
+            Vote.id.label("vote_id"),
+            # Signed-in voters' account email, else the email given when voting
+            func.coalesce(User.email, Vote.voter_email).label("email"),
+            Vote.voter_name,
+            Vote.voter_id,
+            Vote.voter_type,
+            vote_media.media_type.label("media_type"),
+            vote_media.media_id.label("media_id"),
+            vote_media.board_id.label("board_id"),
+            Vote.song_id,
+            Vote.vote_type,
+            Vote.ip_address,
+            Vote.country_code.label("country"),
+            Vote.created_at.label("voted_at"),
+        )
+        .select_from(Vote)
+        .outerjoin(User, User.id == Vote.voter_id)
+    )
+    if board_id is not None:
+        query = query.where(vote_media.board_id == board_id)
+    if media_type is not None:
+        query = query.where(vote_media.media_type == media_type)
+    if media_id is not None:
+        query = query.where(vote_media.media_id == media_id)
+    if song_id is not None:
+        query = query.where(Vote.song_id == song_id)
+    if start is not None:
+        query = query.where(Vote.created_at >= datetime.combine(start, time.min, tzinfo=timezone.utc))
+    if end is not None:
+        # Inclusive of the whole end day
+        query = query.where(Vote.created_at < datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc))
+    return query.order_by(Vote.id)
+
+
+def _record(row) -> dict:
+    record = dict(row._mapping)
+    if record["voted_at"] is not None:
+        record["voted_at"] = record["voted_at"].isoformat()
+    return record
+
+
+async def stream_voters(query, fmt: str) -> AsyncIterator[bytes]:
+    """Yield the query's rows encoded as csv, ndjson or json, one chunk per batch"""
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH))
+        first = True
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(COLUMNS)
+        elif fmt == "json":
+            yield b"["
+        async for rows in result.partitions():
+            if fmt == "csv":
+                writer.writerows(
+                    [record[column] for column in COLUMNS] for record in map(_record, rows)
+                )
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            elif fmt == "ndjson":
+                yield b"".join(orjson.dumps(_record(row)) + b"\n" for row in rows)
+            else:
+                chunk = b",".join(orjson.dumps(_record(row)) for row in rows)
+                yield chunk if first else b"," + chunk
+                first = False
+        if fmt == "csv" and buffer.tell():
+            yield buffer.getvalue().encode()  # header only: nothing matched
+        elif fmt == "json":
+            yield b"]"
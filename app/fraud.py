@@ -0,0 +1,374 @@
+"""
+Offline vote-ring detection.
+
+is_suspicious_vote() (app/utils/main.py) judges each vote on its own. This
+module looks at a whole board (or contest) at once and groups voters who
+are probably the same person or a coordinated ring, using union-find over
+what their votes share:
+
+* device fingerprint (hash of IP and user agent), when two voters' votes
+  from it are within ``fraud_link_window`` seconds of each other
+* IP address, within the same window
+* email domain, within the same window, for domains that aren't free-mail
+  providers and that fewer than ``fraud_common_domain_share`` of the board's
+  voters use (a company's own audience all shares a domain)
+
+Every link needs the timing because, over weeks, NAT, households and
+campuses would chain most of a board's voters into one component. That
+includes fingerprints: being only IP plus user agent, one is shared by
+everyone on the same stock mobile browser behind a carrier or campus NAT.
+
+Votes are streamed through a server-side cursor in time order into flat
+arrays of interned ids (about 30 bytes a vote, no ORM objects). The
+linking pass and the report then run over those arrays in a thread, so a
+few million votes take a minute or two. Clusters of at least
+``fraud_min_ring_size`` voters are reported with the evidence that joined
+them, for an admin to review; nothing is blocked or deleted.
+
+Run from the command line:
+
+    python -m app.fraud --board 12 [--start 2026-09-01] [--end 2026-09-30] [--json report.json]
+
+or through GET /api/admin/api/fraud/rings. Only votes that haven't been
+retired are seen (see app/vote_partitions.py).
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time as timer
+from array import array
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import vote_media
+from .config import settings
+from .database import AsyncSessionLocal
+from .models import Song, Vote
+
+FRAUD_BATCH = 20_000
+SAMPLE_VOTERS = 50  # voter keys listed per ring
+TOP_ITEMS = 5
+
+LINK_KINDS = ("fingerprint", "ip", "domain")
+FINGERPRINT, IP, DOMAIN = range(3)
+
+FREE_MAIL = frozenset({
+    "gmail.com", "googlemail.com", "yahoo.com", "ymail.com", "hotmail.com", "outlook.com",
+    "live.com", "msn.com", "icloud.com", "me.com", "aol.com", "proton.me", "protonmail.com",
+    "gmx.com", "gmx.de", "mail.com", "yandex.ru", "mail.ru", "qq.com", "163.com",
+})
+
+
+class DisjointSet:
+    """Union-find over 0..n-1 in flat arrays, with union by size and path halving
+
+    Also counts, per set, the links of each kind that merged two sets.
+    """
+
+    def __init__(self, n: int):
+        self.parent = array("i", range(n))
+        self.size = array("i", [1]) * n
+        self.links = [array("i", [0]) * n for _ in LINK_KINDS]
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int, kind: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        for k, links in enumerate(self.links):
+            links[a] += links[b] + (k == kind)
+
+
+class _Interner:
+    """Maps values to dense ints 0..n-1"""
+
+    def __init__(self):
+        self.ids: Dict[Any, int] = {}
+        self.values: List[Any] = []
+
+    def __call__(self, value) -> int:
+        id_ = self.ids.get(value)
+        if id_ is None:
+            id_ = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return id_
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class VoteColumns:
+    """One board's votes as parallel arrays, in time order"""
+
+    def __init__(self):
+        self.voters = _Interner()  # voter key
+        self.ips = _Interner()
+        self.fingerprints = _Interner()
+        self.domains = _Interner()
+        self.items = _Interner()  # (media_type, media_id)
+        self.voter = array("i")
+        self.ip = array("i")
+        self.fingerprint = array("i")  # -1 when missing
+        self.item = array("i")
+        self.at = array("d")  # unix time
+        self.voter_domain = array("i")  # per voter; -1 without an email
+
+    def add(self, voter_key: str, email: Optional[str], ip: str, fingerprint: Optional[str],
+            media_type: str, media_id: int, at: datetime) -> None:
+        voter = self.voters(voter_key)
+        if voter == len(self.voter_domain):
+            domain = email.rpartition("@")[2].lower() if email and "@" in email else None
+            self.voter_domain.append(self.domains(domain) if domain else -1)
+        self.voter.append(voter)
+        self.ip.append(self.ips(ip))
+        self.fingerprint.append(self.fingerprints(fingerprint) if fingerprint else -1)
+        self.item.append(self.items((media_type, media_id)))
+        self.at.append(at.timestamp())
+
+    def __len__(self) -> int:
+        return len(self.voter)
+
+
+def votes_query(
+    board_id: Optional[int] = None,
+    contest_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    query = vote_media.join_media(
+        select(
+            # Votes without an email or account fall back to their device, then IP
+            vote_media.voter_key,
+            Vote.voter_email,
+            Vote.ip_address,
+            Vote.device_fingerprint,
+            vote_media.media_type,
+            vote_media.media_id,
+            Vote.created_at,
+        ).select_from(Vote)
+    )
+    if board_id is not None:
+        query = query.where(vote_media.board_id == board_id)
+    if contest_id is not None:
+        query = query.where(Song.contest_id == contest_id)
+    if start is not None:
+        query = query.where(Vote.created_at >= datetime.combine(start, time.min, tzinfo=timezone.utc))
+    if end is not None:
+        # Inclusive of the whole end day
+        query = query.where(Vote.created_at < datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc))
+    return query.order_by(Vote.created_at)
+
+
+async def load_votes(db: AsyncSession, query) -> VoteColumns:
+    votes = VoteColumns()
+    result = await db.stream(query.execution_options(yield_per=FRAUD_BATCH))
+    async for rows in result.partitions():
+        for voter_key, email, ip, fingerprint, media_type, media_id, at in rows:
+            votes.add(voter_key or f"fp:{fingerprint or ip}", email, ip, fingerprint, media_type, media_id, at)
+    return votes
+
+
+def _common_domains(votes: VoteColumns, share: float) -> bytearray:
+    """1 for each domain that is free-mail or used by more than ``share`` of the voters"""
+    counts = Counter(d for d in votes.voter_domain if d >= 0)
+    limit = share * len(votes.voters)
+    return bytearray(
+        votes.domains.values[d] in FREE_MAIL or counts[d] > limit
+        for d in range(len(votes.domains))
+    )
+
+
+def link_voters(votes: VoteColumns, window: float, common_domain_share: float) -> DisjointSet:
+    """Union voters whose votes share a fingerprint, IP or uncommon domain within ``window``"""
+    sets = DisjointSet(len(votes.voters))
+    common = _common_domains(votes, common_domain_share)
+    last_on_fingerprint = array("i", [-1]) * len(votes.fingerprints)
+    last_fingerprint_at = array("d", [0.0]) * len(votes.fingerprints)
+    last_on_ip = array("i", [-1]) * len(votes.ips)
+    last_ip_at = array("d", [0.0]) * len(votes.ips)
+    last_on_domain = array("i", [-1]) * len(votes.domains)
+    last_domain_at = array("d", [0.0]) * len(votes.domains)
+
+    # Votes are in time order, so the last voter seen on a fingerprint, IP or
+    # domain is the only one a new vote can be within the window of without chaining
+    for voter, ip, fingerprint, at in zip(votes.voter, votes.ip, votes.fingerprint, votes.at):
+        if fingerprint >= 0:
+            other = last_on_fingerprint[fingerprint]
+            if other >= 0 and other != voter and at - last_fingerprint_at[fingerprint] <= window:
+                sets.union(voter, other, FINGERPRINT)
+            last_on_fingerprint[fingerprint] = voter
+            last_fingerprint_at[fingerprint] = at
+        other = last_on_ip[ip]
+        if other >= 0 and other != voter and at - last_ip_at[ip] <= window:
+            sets.union(voter, other, IP)
+        last_on_ip[ip] = voter
+        last_ip_at[ip] = at
+        domain = votes.voter_domain[voter]
+        if domain >= 0 and not common[domain]:
+            other = last_on_domain[domain]
+            if other >= 0 and other != voter and at - last_domain_at[domain] <= window:
+                sets.union(voter, other, DOMAIN)
+            last_on_domain[domain] = voter
+            last_domain_at[domain] = at
+    return sets
+
+
+def _iso(at: float) -> str:
+    return datetime.fromtimestamp(at, timezone.utc).isoformat()
+
+
+def rings(votes: VoteColumns, sets: DisjointSet, min_size: int) -> List[Dict[str, Any]]:
+    """Clusters of at least ``min_size`` voters, most votes first"""
+    roots = {root for root in range(len(sets.parent)) if sets.parent[root] == root and sets.size[root] >= min_size}
+    if not roots:
+        return []
+    found: Dict[int, Dict[str, Any]] = {
+        root: {"voters": [], "votes": 0, "ips": set(), "items": Counter(), "first": None, "last": None}
+        for root in roots
+    }
+    root_of = array("i", [-1]) * len(votes.voters)
+    for voter in range(len(votes.voters)):
+        root = sets.find(voter)
+        if root in roots:
+            root_of[voter] = root
+            found[root]["voters"].append(voter)
+    for voter, ip, item, at in zip(votes.voter, votes.ip, votes.item, votes.at):
+        root = root_of[voter]
+        if root < 0:
+            continue
+        ring = found[root]
+        ring["votes"] += 1
+        ring["ips"].add(ip)
+        ring["items"][item] += 1
+        if ring["first"] is None:
+            ring["first"] = at
+        ring["last"] = at
+
+    report = []
+    for root, ring in found.items():
+        top_items = ring["items"].most_common(TOP_ITEMS)
+        domains = Counter(
+            votes.domains.values[votes.voter_domain[v]] for v in ring["voters"] if votes.voter_domain[v] >= 0
+        )
+        report.append({
+            "voters": len(ring["voters"]),
+            "votes": ring["votes"],
+            "votes_per_voter": round(ring["votes"] / len(ring["voters"]), 2),
+            "distinct_ips": len(ring["ips"]),
+            "links": {kind: sets.links[k][root] for k, kind in enumerate(LINK_KINDS)},
+            "email_domains": dict(domains.most_common(5)),
+            "first_vote": _iso(ring["first"]),
+            "last_vote": _iso(ring["last"]),
+            "top_items": [
+                {"media_type": votes.items.values[item][0], "media_id": votes.items.values[item][1], "votes": n}
+                for item, n in top_items
+            ],
+            # Share of the ring's votes that went to its favourite item
+            "top_item_share": round(top_items[0][1] / ring["votes"], 3),
+            "voter_sample": [votes.voters.values[v] for v in ring["voters"][:SAMPLE_VOTERS]],
+        })
+    report.sort(key=lambda ring: ring["votes"], reverse=True)
+    return report
+
+
+async def find_rings(
+    db: AsyncSession,
+    board_id: Optional[int] = None,
+    contest_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    min_size: Optional[int] = None,
+    window: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Cluster the voters on a board or contest and report the rings"""
+    min_size = min_size or settings.fraud_min_ring_size
+    window = window or settings.fraud_link_window
+    started = timer.monotonic()
+    votes = await load_votes(db, votes_query(board_id, contest_id, start, end))
+    loaded = timer.monotonic()
+
+    def analyse():
+        sets = link_voters(votes, window, settings.fraud_common_domain_share)
+        return rings(votes, sets, min_size)
+
+    found = await asyncio.to_thread(analyse)
+    return {
+        "board_id": board_id,
+        "contest_id": contest_id,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "min_ring_size": min_size,
+        "link_window": window,
+        "votes": len(votes),
+        "voters": len(votes.voters),
+        "flagged_voters": sum(ring["voters"] for ring in found),
+        "flagged_votes": sum(ring["votes"] for ring in found),
+        "load_seconds": round(loaded - started, 2),
+        "analysis_seconds": round(timer.monotonic() - loaded, 2),
+        "rings": found,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    scope = f"board {report['board_id']}" if report["board_id"] is not None else f"contest {report['contest_id']}"
+    lines = [
+        f"{report['votes']} votes from {report['voters']} voters on {scope} "
+        f"(loaded in {report['load_seconds']}s, analysed in {report['analysis_seconds']}s)",
+        f"{len(report['rings'])} rings of {report['min_ring_size']}+ voters: "
+        f"{report['flagged_voters']} voters, {report['flagged_votes']} votes",
+    ]
+    for n, ring in enumerate(report["rings"], 1):
+        links = ", ".join(f"{kind} {count}" for kind, count in ring["links"].items() if count)
+        top = ring["top_items"][0]
+        lines.append(
+            f"  #{n}: {ring['voters']} voters, {ring['votes']} votes, {ring['distinct_ips']} IPs; "
+            f"linked by {links}; {ring['top_item_share']:.0%} on {top['media_type']} {top['media_id']}; "
+            f"{ring['first_vote']} .. {ring['last_vote']}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.fraud", description="Find vote rings on a board or contest")
+    scope = parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument("--board", type=int)
+    scope.add_argument("--contest", type=int)
+    parser.add_argument("--start", type=date.fromisoformat, help="first day (YYYY-MM-DD, UTC)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day, inclusive")
+    parser.add_argument("--min-size", type=int, help=f"voters in a ring (default {settings.fraud_min_ring_size})")
+    parser.add_argument("--window", type=float, help=f"seconds for fingerprint/IP/domain links (default {settings.fraud_link_window})")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args()
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await find_rings(
+                db, board_id=args.board, contest_id=args.contest, start=args.start, end=args.end,
+                min_size=args.min_size, window=args.window,
+            )
+
+    report = asyncio.run(run())
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
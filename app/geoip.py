@@ -0,0 +1,186 @@
+"""
+GeoIP enrichment of votes from a local MaxMind database.
+
+Votes are stored without a location. A scheduled job fills in
+country_code, region and city afterwards from the .mmdb file at
+``geoip_database_path`` (GeoLite2/GeoIP2 City or Country), so voting never
+waits on a lookup and no network call is made per vote.
+
+The file is memory-mapped (MODE_MMAP): lookups read the mapped pages
+directly, and the OS shares them between workers. It is reopened when its
+modification time changes, e.g. after geoipupdate has replaced it.
+
+Locations are cached in an LRU per /24 (IPv6: /48) prefix, which is what
+the database resolves most addresses at. A lookup only fills the cache when
+the database's own network for the address covers the whole prefix, so
+cached answers are exact. Votes from one network, or from the same
+voters, mostly hit the cache.
+
+Each run enriches up to ``GEOIP_MAX_PER_RUN`` votes, newest first, found
+through the partial index ix_votes_geoip_pending. Each batch is committed
+in its own session, so votes are only locked for one batch's UPDATE and a
+vote being changed never waits for the whole run; the scheduler's session
+just holds the job lock. Addresses that can't be located (private ranges,
+unknown networks, IPv6 in an IPv4-only database) get country "ZZ", the ISO
+code for an unknown country, so they are looked up only once.
+
+maxminddb is optional. Without it, or without a database file, the job does
+nothing and votes keep their null location.
+"""
+import asyncio
+import ipaddress
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .config import settings
+from .database import AsyncSessionLocal
+from .models import Vote
+
+try:
+    import maxminddb
+except ImportError:  # optional dependency
+    maxminddb = None
+
+logger = logging.getLogger(__name__)
+
+GEOIP_BATCH = 5000
+GEOIP_MAX_PER_RUN = 50_000
+UNKNOWN_COUNTRY = "ZZ"
+PREFIX_BITS = {4: 24, 6: 48}
+
+Location = Tuple[str, Optional[str], Optional[str]]  # (country_code, region, city)
+UNKNOWN: Location = (UNKNOWN_COUNTRY, None, None)
+
+# Cleared whenever the database is reopened
+_locations = TTLCache(maxsize=settings.geoip_cache_size, ttl=86400)
+_reader = None
+_reader_mtime: Optional[float] = None
+
+
+def _open_reader():
+    """The memory-mapped database, reopened if the file changed; None if unavailable"""
+    global _reader, _reader_mtime
+    path = settings.geoip_database_path
+    if maxminddb is None or not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        logger.warning("GeoIP database %s not found", path)
+        return None
+    if _reader is None or mtime != _reader_mtime:
+        if _reader is not None:
+            _reader.close()
+        _reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+        _reader_mtime = mtime
+        _locations.clear()
+    return _reader
+
+
+def _name(entry: Optional[dict]) -> Optional[str]:
+    if not entry:
+        return None
+    name = entry.get("names", {}).get("en")
+    return name[:100] if name else None
+
+
+def _location(record: Optional[dict]) -> Location:
+    if not record:
+        return UNKNOWN
+    country = record.get("country") or record.get("registered_country") or {}
+    code = country.get("iso_code")
+    if not code:
+        return UNKNOWN
+    subdivisions = record.get("subdivisions") or [None]
+    return code, _name(subdivisions[0]), _name(record.get("city"))
+
+
+def lookup(reader, ip: str) -> Location:
+    """Location of an address, through the per-prefix cache"""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return UNKNOWN
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    prefix = PREFIX_BITS[address.version]
+    key = (address.version, int(address) >> (address.max_prefixlen - prefix))
+    location = _locations.get(key)
+    if location is not None:
+        return location
+    try:
+        record, network_bits = reader.get_with_prefix_len(address)
+    except ValueError:
+        # An IPv6 address in an IPv4-only database
+        return UNKNOWN
+    location = _location(record)
+    if network_bits <= prefix:
+        _locations.set(key, location)
+    return location
+
+
+async def enrich_batch(db: AsyncSession, reader) -> int:
+    """Locate the newest votes without a location; returns how many were updated"""
+    result = await db.execute(
+        select(Vote.id, Vote.created_at, Vote.ip_address)
+        .where(Vote.country_code.is_(None))
+        .order_by(Vote.created_at.desc())
+        .limit(GEOIP_BATCH)
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+
+    def locate() -> Dict[Location, List[Tuple[int, object]]]:
+        by_location: Dict[Location, List[Tuple[int, object]]] = {}
+        for vote_id, created_at, ip in rows:
+            by_location.setdefault(lookup(reader, ip), []).append((vote_id, created_at))
+        return by_location
+
+    by_location = await asyncio.to_thread(locate)
+    ids, created, countries, regions, cities = [], [], [], [], []
+    for (country, region, city), votes in by_location.items():
+        for vote_id, created_at in votes:
+            ids.append(vote_id)
+            created.append(created_at)
+            countries.append(country)
+            regions.append(region)
+            cities.append(city)
+    # One statement per batch. The id list and time range keep Postgres on the
+    # id indexes of the partitions the batch falls in, instead of hashing all votes.
+    await db.execute(
+        text(
+            "UPDATE votes SET country_code = g.country, region = g.region, city = g.city "
+            "FROM unnest(CAST(:ids AS integer[]), CAST(:created AS timestamptz[]), CAST(:countries AS varchar[]), "
+            "CAST(:regions AS varchar[]), CAST(:cities AS varchar[])) AS g(id, created_at, country, region, city) "
+            "WHERE votes.id = g.id AND votes.created_at = g.created_at "
+            "AND votes.id = ANY(CAST(:ids AS integer[])) AND votes.created_at BETWEEN :oldest AND :newest"
+        ),
+        {
+            "ids": ids, "created": created, "countries": countries, "regions": regions, "cities": cities,
+            "oldest": min(created), "newest": max(created),
+        },
+    )
+    return len(rows)
+
+
+async def run_geoip_job(db: AsyncSession) -> None:
+    """Scheduler job: fill in the location of votes that don't have one yet"""
+    reader = _open_reader()
+    if reader is None:
+        return
+    total = 0
+    while total < GEOIP_MAX_PER_RUN:
+        async with AsyncSessionLocal() as batch_db:
+            updated = await enrich_batch(batch_db, reader)
+            await batch_db.commit()
+        total += updated
+        if updated < GEOIP_BATCH:
+            break
+    if total:
+        logger.info("Located %s votes", total)
@@ -0,0 +1,149 @@
+"""
+Async Google OAuth / OpenID Connect client.
+
+The callback used google-auth-oauthlib's Flow.fetch_token and
+id_token.verify_oauth2_token, which made two blocking HTTP calls per login
+(including a fresh download of Google's certificates). Here:
+
+  * the code exchange goes through the shared async HTTP client;
+  * Google's signing keys (JWKS) are cached for as long as their
+    Cache-Control max-age allows, refetched once early if a token arrives
+    signed with an unknown key id (key rotation);
+  * ID tokens are verified locally with python-jose: RS256 signature,
+    audience, issuer and expiry.
+
+All endpoints and the accepted issuers come from settings, so development
+and tests can point them at a local fake identity provider.
+"""
+import asyncio
+import re
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+import httpx
+from jose import JWTError, jwt
+
+from .config import settings
+from .http_client import get_http_client
+
+SCOPES = [
+    "https://www.googleapis.com/auth/userinfo.email",
+    "https://www.googleapis.com/auth/userinfo.profile",
+    "openid"
+]
+
+# Used when the JWKS response has no usable Cache-Control header
+DEFAULT_JWKS_MAX_AGE = 3600
+# Minimum gap between refetches triggered by an unknown key id
+JWKS_REFRESH_COOLDOWN = 60
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleAuthError(Exception):
+    """The code exchange or ID token verification failed"""
+
+
+def is_configured() -> bool:
+    return bool(settings.google_client_id and settings.google_client_secret)
+
+
+def authorization_url(state: str) -> str:
+    """URL of Google's consent screen for this login attempt"""
+    params = {
+        "client_id": settings.google_client_id,
+        "redirect_uri": settings.google_redirect_uri,
+        "response_type": "code",
+        "scope": " ".join(SCOPES),
+        "state": state,
+        "access_type": "offline",
+        "include_granted_scopes": "true",
+    }
+    return f"{settings.google_auth_uri}?{urlencode(params)}"
+
+
+async def exchange_code(code: str) -> Dict[str, Any]:
+    """Trade an authorization code for tokens (the response includes id_token)"""
+    try:
+        response = await get_http_client().post(settings.google_token_uri, data={
+            "code": code,
+            "client_id": settings.google_client_id,
+            "client_secret": settings.google_client_secret,
+            "redirect_uri": settings.google_redirect_uri,
+            "grant_type": "authorization_code",
+        })
+    except httpx.HTTPError as e:
+        raise GoogleAuthError(f"Token endpoint unreachable: {e}")
+    if response.status_code != 200:
+        raise GoogleAuthError(f"Token exchange failed ({response.status_code}): {response.text[:200]}")
+    return response.json()
+
+
+class JWKSCache:
+    """Signing keys from the JWKS endpoint, cached per Cache-Control"""
+
+    def __init__(self):
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _max_age(cache_control: str) -> int:
+        match = _MAX_AGE_RE.search(cache_control or "")
+        return int(match.group(1)) if match else DEFAULT_JWKS_MAX_AGE
+
+    async def _refresh(self) -> None:
+        try:
+            response = await get_http_client().get(settings.google_jwks_uri)
+            response.raise_for_status()
+            keys = response.json()["keys"]
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            raise GoogleAuthError(f"Could not fetch signing keys: {e}")
+        now = time.monotonic()
+        self._keys = {key["kid"]: key for key in keys if "kid" in key}
+        self._fetched_at = now
+        self._expires_at = now + self._max_age(response.headers.get("cache-control"))
+
+    async def get_key(self, kid: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        if now < self._expires_at and kid in self._keys:
+            return self._keys[kid]
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            now = time.monotonic()
+            stale = now >= self._expires_at
+            rotated = kid not in self._keys and now - self._fetched_at > JWKS_REFRESH_COOLDOWN
+            if stale or rotated:
+                await self._refresh()
+        return self._keys.get(kid)
+
+
+jwks_cache = JWKSCache()
+
+
+async def verify_id_token(token: str) -> Dict[str, Any]:
+    """Verify an ID token locally and return its claims"""
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError as e:
+        raise GoogleAuthError(f"Malformed ID token: {e}")
+    if header.get("alg") != "RS256":
+        raise GoogleAuthError("Unexpected ID token algorithm")
+
+    key = await jwks_cache.get_key(header.get("kid"))
+    if key is None:
+        raise GoogleAuthError("ID token signed with an unknown key")
+
+    try:
+        return jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=settings.google_client_id,
+            issuer=settings.google_issuers,
+            options={"verify_at_hash": False},
+        )
+    except JWTError as e:
+        raise GoogleAuthError(f"Invalid ID token: {e}")
@@ -0,0 +1,31 @@
+"""
+Shared outbound HTTP client.
+
+One pooled httpx.AsyncClient per worker, so calls to Brevo, Google and other
+APIs reuse connections (and TLS sessions) and never block the event loop.
+Closed from the app lifespan.
+"""
+from typing import Optional
+
+import httpx
+
+from .config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=10),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,145 @@
+"""
+Vote-ranked leaderboards.
+
+contest_page() ranks a contest's approved songs in a single query: songs
+LEFT JOIN votes, GROUP BY song, ORDER BY votes with LIMIT/OFFSET, with the
+rank and the total entry count computed by window functions over the whole
+contest, so every page carries correct ranks. Votes from retired months
+come from vote_tally_archive. Pages are cached per (contest, page, size)
+for ``leaderboard_cache_ttl`` seconds as plain dicts that templates read
+like Song objects.
+
+board_leaderboard() ranks a media board's songs, videos and visuals together
+by likes (board_stats.ranking(), one UNION ALL with DENSE_RANK), including
+items nobody has voted on yet. Its optional "around me" window returns the
+items ranked just above and below one item, in the same statement as the
+top N.
+"""
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import between, func, inspect, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import board_stats
+from .cache import TTLCache
+from .config import settings
+from .models import Board, Song, Vote, VoteTallyArchive
+
+_SONG_COLUMNS = [attr.key for attr in inspect(Song).column_attrs]
+_contest_pages = TTLCache(maxsize=1024, ttl=settings.leaderboard_cache_ttl)
+
+
+async def contest_page(db: AsyncSession, contest_id: int, page: int = 1, per_page: int = 100) -> Dict[str, Any]:
+    """{"entries": [...], "total": n, "page": page, "per_page": per_page, "pages": n}"""
+    key = (contest_id, page, per_page)
+    cached = _contest_pages.get(key)
+    if cached is not None:
+        return cached
+
+    archived = (
+        select(VoteTallyArchive.media_id, func.sum(VoteTallyArchive.votes).label("votes"))
+        .where(
+            VoteTallyArchive.media_type == "music",
+            VoteTallyArchive.media_id.in_(select(Song.id).where(Song.contest_id == contest_id)),
+        )
+        .group_by(VoteTallyArchive.media_id)
+        .subquery("archived")
+    )
+    vote_count = func.count(Vote.id) + func.coalesce(archived.c.votes, 0)
+    result = await db.execute(
+        select(
+            Song,
+            vote_count.label("vote_count"),
+            func.rank().over(order_by=vote_count.desc()).label("rank"),
+            func.count().over().label("total"),
+        )
+        .outerjoin(Vote, Vote.song_id == Song.id)
+        .outerjoin(archived, archived.c.media_id == Song.id)
+        .where(Song.contest_id == contest_id, Song.is_approved == True)
+        .group_by(Song.id, archived.c.votes)
+        .order_by(vote_count.desc(), Song.created_at.desc(), Song.id)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    )
+    rows = result.all()
+
+    entries = []
+    total = 0
+    for song, votes, rank, total in rows:
+        entry = {key: getattr(song, key) for key in _SONG_COLUMNS}
+        entry["vote_count"] = votes
+        entry["rank"] = rank
+        entries.append(entry)
+    if not rows and page > 1:
+        # Past the end: the window count isn't available, so count directly
+        total = (await db.execute(
+            select(func.count(Song.id)).where(Song.contest_id == contest_id, Song.is_approved == True)
+        )).scalar() or 0
+
+    data = {
+        "entries": entries,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "pages": max(1, -(-total // per_page)),
+    }
+    _contest_pages.set(key, data)
+    return data
+
+
+def _board_entry(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "artist_name": row.artist_name,
+        "content_type": row.media_type,
+        "file_path": row.file_path,
+        "external_link": row.external_link,
+        "vote_count": row.likes,
+        "rank": row.rank,
+        "position": row.position,
+    }
+
+
+async def board_leaderboard(
+    db: AsyncSession,
+    board: Board,
+    limit: int = 10,
+    media_types: Optional[Sequence[str]] = None,
+    around: Optional[Tuple[str, int]] = None,
+    radius: int = 2,
+    approved_only: bool = False,
+) -> Dict[str, Any]:
+    """{"top": [...], "around": [...]} ranked by likes across the board's media types
+
+    ``around`` is a (media_type, id) on the board; its entry and up to
+    ``radius`` neighbours either side are returned under "around" (empty if
+    the item isn't ranked). Entries carry rank (DENSE_RANK by likes) and
+    position (1-based, ties broken deterministically).
+    """
+    allowed = board_stats.allowed_media_types(board)
+    if media_types is not None:
+        allowed = [media_type for media_type in allowed if media_type in media_types]
+    if not allowed:
+        return {"top": [], "around": []}
+
+    r = board_stats.ranking(board.id, allowed, approved_only)
+    wanted = r.c.position <= limit
+    if around is not None:
+        target = (
+            select(r.c.position)
+            .where(r.c.media_type == around[0], r.c.id == around[1])
+            .scalar_subquery()
+        )
+        wanted = or_(wanted, between(r.c.position, target - radius, target + radius))
+    rows = (await db.execute(select(r).where(wanted).order_by(r.c.position))).all()
+
+    top = [_board_entry(row) for row in rows if row.position <= limit]
+    neighbours = []
+    if around is not None:
+        me = next((row for row in rows if (row.media_type, row.id) == tuple(around)), None)
+        if me is not None:
+            neighbours = [
+                _board_entry(row) for row in rows if abs(row.position - me.position) <= radius
+            ]
+    return {"top": top, "around": neighbours}
@@ -1,4 +1,6 @@
 # app/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
@@ -7,8 +9,6 @@ from fastapi import FastAPI, Request, Depends, HTTPException, Form, File, Upload
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from starlette.middleware.sessions import SessionMiddleware
 
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -17,7 +17,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from .config import settings
 from .database import get_db
 from .models import Contest, Client, Song, Vote, User
-from .auth import verify_password
+from .auth import check_password
+from .passwords import hash_pool_stats
+from .rate_limit import rate_limit
+from .redis_client import close_redis
+from .http_client import close_http_client
+from . import board_cache, brevo_config, email_outbox, leaderboard, scheduler
+from .templating import templates, precompile as precompile_templates
+from .sessions import ServerSessionMiddleware
+from .compression import CompressionMiddleware
+from . import user_cache
 
 # Routers (updated: campaigns -> songboards, add sales)
 from .routers import auth, songs, voting, songboards, signup, static_pages, brevo_test
@@ -26,6 +35,27 @@ from .routers import admin
 from app.routers import submitter, board_owner, boards, auth_google
 # Routers (updated: campaigns -> songboards, add sales)
 
+# ------------------------------------------------------------------------------
+# Lifespan (background tasks)
+# ------------------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile every template before taking traffic
+    await asyncio.to_thread(precompile_templates)
+    tasks = [
+        asyncio.create_task(user_cache.listen_for_invalidations()),
+    ]
+    if settings.email_dispatcher_enabled:
+        tasks.append(asyncio.create_task(email_outbox.run_dispatcher()))
+    if settings.scheduler_enabled:
+        tasks.append(asyncio.create_task(scheduler.run()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await close_http_client()
+    await close_redis()
+
 # ------------------------------------------------------------------------------
 # FastAPI app
 # ------------------------------------------------------------------------------
@@ -35,6 +65,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    lifespan=lifespan,
 )
 
 # ------------------------------------------------------------------------------
@@ -57,8 +88,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Session middleware for OAuth state management
-app.add_middleware(SessionMiddleware, secret_key=settings.secret_key)
+# Session middleware for OAuth state management (cookie holds only a session id)
+app.add_middleware(
+    ServerSessionMiddleware,
+    cookie_name=settings.session_cookie_name,
+    max_age=settings.session_max_age,
+    https_only=settings.session_https_only,
+)
+
+# gzip/Brotli for responses above the size threshold (uploaded media excluded)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
 
 # Add security headers middleware for uploads
 from fastapi.responses import Response
@@ -85,7 +124,6 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")  # Re-en
 @app.get("/robots.txt")
 async def robots_txt():
     return FileResponse("app/static/robots.txt", media_type="text/plain")
-templates = Jinja2Templates(directory="app/templates")
 
 # Remove the custom file serving route since it conflicts with board routes
 # The static mount will handle file serving, and we'll add security through other means
@@ -123,6 +161,18 @@ async def board_page(
     # Import models here to avoid circular imports
     from .models import Board, Song, Video, Visual
     
+    # Anonymous views are served from the page cache until board content changes
+    cache_key = None
+    if board_cache.is_cacheable(request):
+        board_id = await board_cache.board_id_for_slug(db, slug)
+        if board_id is None:
+            raise HTTPException(status_code=404, detail="Board not found")
+        cache_key = await board_cache.page_key("board", board_id, [board_cache.CONTENT])
+        if cache_key:
+            cached = await board_cache.get_page(cache_key)
+            if cached is not None:
+                return HTMLResponse(cached)
+    
     # Find board by slug
     board_res = await db.execute(select(Board).where(Board.slug == slug))
     board = board_res.scalar_one_or_none()
@@ -140,13 +190,16 @@ async def board_page(
     visuals_res = await db.execute(select(Visual).where(Visual.board_id == board.id).order_by(Visual.created_at.desc()))
     visuals = visuals_res.scalars().all()
     
-    return templates.TemplateResponse("board.html", {
+    response = templates.TemplateResponse("board.html", {
         "request": request,
         "board": board,
         "songs": songs,
         "videos": videos,
         "visuals": visuals
     })
+    if cache_key:
+        await board_cache.set_page(cache_key, response.body)
+    return response
 
 # Smart Voting Link Page - Dynamic for each piece of content
 @app.get("/vote/{content_id}/{slug}", response_class=HTMLResponse)
@@ -162,6 +215,21 @@ async def smart_vote_page(
         from .models import Board, Song, Video, Visual, Vote
         from sqlalchemy import select, func
         
+        # Anonymous views are cached until the board's content or votes change.
+        # The template renders request.url, so it is part of the key.
+        cache_key = None
+        if board_cache.is_cacheable(request):
+            board_id = await board_cache.board_id_for_slug(db, slug)
+            if board_id is None:
+                raise HTTPException(status_code=404, detail="Board not found")
+            cache_key = await board_cache.page_key(
+                "smart-vote", board_id, [board_cache.CONTENT, board_cache.TALLY], str(request.url)
+            )
+            if cache_key:
+                cached = await board_cache.get_page(cache_key)
+                if cached is not None:
+                    return HTMLResponse(cached)
+        
         # Find the board by slug
         board_res = await db.execute(select(Board).where(Board.slug == slug))
         board = board_res.scalar_one_or_none()
@@ -199,73 +267,25 @@ async def smart_vote_page(
         if not content:
             raise HTTPException(status_code=404, detail="Content not found")
         
-        # Get top voted content for leaderboard
-        leaderboard = []
-        
-        # Get top music
-        if board.allow_music:
-            music_query = select(Song, func.count(Vote.id).label('vote_count')).join(
-                Vote, (Vote.media_type == "music") & (Vote.media_id == Song.id) & (Vote.vote_type == "like")
-            ).where(Song.board_id == board.id).group_by(Song.id).order_by(func.count(Vote.id).desc()).limit(10)
-            music_res = await db.execute(music_query)
-            music_items = music_res.all()
-            for song, vote_count in music_items:
-                leaderboard.append({
-                    "id": song.id,
-                    "title": song.title,
-                    "artist_name": song.artist_name,
-                    "content_type": "music",
-                    "vote_count": vote_count,
-                    "rank": len(leaderboard) + 1
-                })
-        
-        # Get top videos
-        if board.allow_video:
-            video_query = select(Video, func.count(Vote.id).label('vote_count')).join(
-                Vote, (Vote.media_type == "video") & (Vote.media_id == Video.id) & (Vote.vote_type == "like")
-            ).where(Video.board_id == board.id).group_by(Video.id).order_by(func.count(Vote.id).desc()).limit(10)
-            video_res = await db.execute(video_query)
-            video_items = video_res.all()
-            for video, vote_count in video_items:
-                leaderboard.append({
-                    "id": video.id,
-                    "title": video.title,
-                    "artist_name": video.artist_name,
-                    "content_type": "video",
-                    "vote_count": vote_count,
-                    "rank": len(leaderboard) + 1
-                })
-        
-        # Get top visuals
-        if board.allow_visuals:
-            visual_query = select(Visual, func.count(Vote.id).label('vote_count')).join(
-                Vote, (Vote.media_type == "visuals") & (Vote.media_id == Visual.id) & (Vote.vote_type == "like")
-            ).where(Visual.board_id == board.id).group_by(Visual.id).order_by(func.count(Vote.id).desc()).limit(10)
-            visual_res = await db.execute(visual_query)
-            visual_items = visual_res.all()
-            for visual, vote_count in visual_items:
-                leaderboard.append({
-                    "id": visual.id,
-                    "title": visual.title,
-                    "artist_name": visual.artist_name,
-                    "content_type": "visuals",
-                    "vote_count": vote_count,
-                    "rank": len(leaderboard) + 1
-                })
-        
-        # Sort leaderboard by vote count and assign final ranks
-        leaderboard.sort(key=lambda x: x['vote_count'], reverse=True)
-        for i, item in enumerate(leaderboard):
-            item['rank'] = i + 1
+        # Top 10 across media types, plus this item's neighbours, in one query
+        ranking = await leaderboard.board_leaderboard(
+            db, board, limit=10, around=(content_type, content.id), radius=2
+        )
         
-        return templates.TemplateResponse("smart-vote.html", {
+        response = templates.TemplateResponse("smart-vote.html", {
             "request": request,
             "board": board,
             "content": content,
             "content_type": content_type,
-            "leaderboard": leaderboard[:10]  # Top 10
+            "leaderboard": ranking["top"],
+            "around": ranking["around"]
         })
+        if cache_key:
+            await board_cache.set_page(cache_key, response.body)
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading voting page: {str(e)}")
 
@@ -339,7 +359,7 @@ async def mediaboard_login_page(request: Request):
     """Media board owner login page"""
     return templates.TemplateResponse("mediaboard-login.html", {"request": request})
 
-@app.post("/mediaboard-login", response_class=HTMLResponse)
+@app.post("/mediaboard-login", response_class=HTMLResponse, dependencies=[Depends(rate_limit("login"))])
 async def mediaboard_login_form(
     request: Request,
     email: str = Form(...),
@@ -351,7 +371,7 @@ async def mediaboard_login_form(
     result = await db.execute(select(User).where(User.email == email))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await check_password(db, user, password):
         # Redirect back to login with error message
         return RedirectResponse(url="/mediaboard-login?error=Invalid credentials", status_code=302)
     
@@ -363,6 +383,7 @@ async def mediaboard_login_form(
     access_token = create_access_token(data={"sub": str(user.id)})
     
     # Store user info in session
+    request.session.regenerate()
     request.session["user_id"] = user.id
     request.session["user_email"] = user.email
     request.session["access_token"] = access_token
@@ -414,7 +435,7 @@ app.include_router(static_pages.router, tags=["static_pages"])  # Sales, pricing
 # app.include_router(sales.router, tags=["sales"])  # Removed because 'sales' is not defined
 
 # Handle form submission (UI -> calls upload logic, then redirects)
-@app.post("/upload", response_class=HTMLResponse)
+@app.post("/upload", response_class=HTMLResponse, dependencies=[Depends(rate_limit("upload"))])
 async def handle_upload_form(
     request: Request,
     title: str = Form(...),
@@ -568,6 +589,7 @@ async def admin_upload_song(
         
         db.add(new_song)
         await db.commit()
+        await board_cache.bump_content(board_id)
         
         # Redirect back to upload page with success message
         return RedirectResponse(url="/admin/upload?success=true", status_code=303)
@@ -590,40 +612,34 @@ async def register_page(request: Request):
 async def client_leaderboard(
     client_slug: str,
     request: Request,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(100, ge=1, le=500),
     db: AsyncSession = Depends(get_db),
 ):
-    client_res = await db.execute(select(Client).where(Client.slug == client_slug))
-    client = client_res.scalar_one_or_none()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    contest_res = await db.execute(
-        select(Contest).where(Contest.client_id == client.id, Contest.is_active == True)
+    # Client and its active contest in one query
+    res = await db.execute(
+        select(Client, Contest)
+        .outerjoin(Contest, (Contest.client_id == Client.id) & (Contest.is_active == True))
+        .where(Client.slug == client_slug)
+        .order_by(Contest.created_at.desc())
+        .limit(1)
     )
-    contest = contest_res.scalar_one_or_none()
+    row = res.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Client not found")
+    client, contest = row
     if not contest:
         raise HTTPException(status_code=404, detail="No active contest found")
 
-    songs_res = await db.execute(
-        select(Song)
-        .where(Song.contest_id == contest.id, Song.is_approved == True)
-        .order_by(Song.created_at.desc())
-    )
-    songs = songs_res.scalars().all()
-
-    # Attach vote counts
-    for s in songs:
-        vc_res = await db.execute(select(func.count(Vote.id)).where(Vote.song_id == s.id))
-        s.vote_count = vc_res.scalar() or 0
-
-    # Sort by votes desc
-    songs.sort(key=lambda x: x.vote_count, reverse=True)
+    # Ranked in Postgres (one query), cached briefly per contest and page
+    ranking = await leaderboard.contest_page(db, contest.id, page=page, per_page=per_page)
 
     return templates.TemplateResponse("client/leaderboard.html", {
         "request": request,
         "client": client,
         "contest": contest,
-        "songs": songs,
+        "songs": ranking["entries"],
+        "pagination": ranking,
     })
 
 # How-to-submit static page
@@ -757,45 +773,20 @@ async def contests_page(request: Request, db: AsyncSession = Depends(get_db)):
 @app.post("/api/newsletter/subscribe")
 async def subscribe_newsletter(
     email: str = Form(...),
-    request: Request = None
+    request: Request = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Subscribe email to Brevo newsletter list"""
+    """Subscribe email to Brevo newsletter list (delivered by the email outbox)"""
+    if not settings.brevo_api_key:
+        raise HTTPException(status_code=500, detail="Email service not configured")
+    
     try:
-        import requests
-        from app.config import settings
-        
-        if not settings.brevo_api_key:
-            raise HTTPException(status_code=500, detail="Email service not configured")
-        
-        # Brevo API endpoint for adding contacts
-        brevo_url = "https://api.brevo.com/v3/contacts"
-        
-        headers = {
-            "accept": "application/json",
-            "api-key": settings.brevo_api_key,
-            "content-type": "application/json"
-        }
-        
-        data = {
-            "email": email,
-            "listIds": [9],  # Your Brevo list ID
-            "updateEnabled": True  # Update if contact already exists
-        }
-        
-        response = requests.post(brevo_url, headers=headers, json=data)
-        
-        if response.status_code in [200, 201]:
-            return {"message": "Successfully subscribed to newsletter!"}
-        elif response.status_code == 400:
-            # Contact already exists or invalid email
-            return {"message": "Already subscribed or invalid email"}
-        else:
-            print(f"Brevo API error: {response.status_code} - {response.text}")
-            raise HTTPException(status_code=500, detail="Subscription failed")
-            
+        await email_outbox.enqueue_contact(db, email, settings.brevo_newsletter_list_id)
     except Exception as e:
         print(f"Newsletter subscription error: {str(e)}")
         raise HTTPException(status_code=500, detail="Subscription failed")
+    
+    return {"message": "Successfully subscribed to newsletter!"}
 
 # ------------------------------------------------------------------------------
 # Contact Form Processing
@@ -807,94 +798,46 @@ async def submit_contact_form(
     email: str = Form(...),
     subject: str = Form(...),
     message: str = Form(...),
-    request: Request = None
+    request: Request = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Process contact form submission and send email via Brevo"""
+    """Queue the contact form submission for delivery via Brevo"""
+    if not settings.brevo_api_key:
+        raise HTTPException(status_code=500, detail="Email service not configured")
+    
+    # Map subject codes to readable subjects
+    subject_map = {
+        "media-board-inquiry": "Media Board Creation Inquiry",
+        "pricing-information": "Pricing Information",
+        "technical-support": "Technical Support",
+        "partnership": "Partnership Opportunities",
+        "general-question": "General Question",
+        "bug-report": "Bug Report",
+        "feature-request": "Feature Request"
+    }
+    readable_subject = subject_map.get(subject, subject)
+    
     try:
-        import requests
-        from app.config import settings
-        
-        if not settings.brevo_api_key:
-            raise HTTPException(status_code=500, detail="Email service not configured")
-        
-        # Brevo API endpoint for sending transactional emails
-        brevo_url = "https://api.brevo.com/v3/smtp/email"
-        
-        headers = {
-            "accept": "application/json",
-            "api-key": settings.brevo_api_key,
-            "content-type": "application/json"
-        }
-        
-        # Map subject codes to readable subjects
-        subject_map = {
-            "media-board-inquiry": "Media Board Creation Inquiry",
-            "pricing-information": "Pricing Information",
-            "technical-support": "Technical Support",
-            "partnership": "Partnership Opportunities",
-            "general-question": "General Question",
-            "bug-report": "Bug Report",
-            "feature-request": "Feature Request"
-        }
-        
-        readable_subject = subject_map.get(subject, subject)
-        
-        # Email content
-        email_data = {
-            "sender": {
-                "name": "UrVote.Rocks Contact Form",
-                "email": "noreply@urvote.rocks"
-            },
-            "to": [
-                {
-                    "email": "support@urvote.rocks",
-                    "name": "UrVote.Rocks Support"
-                }
-            ],
-            "subject": f"Contact Form: {readable_subject}",
-            "htmlContent": f"""
-            <h2>New Contact Form Submission</h2>
-            <p><strong>Name:</strong> {first_name} {last_name}</p>
-            <p><strong>Email:</strong> {email}</p>
-            <p><strong>Subject:</strong> {readable_subject}</p>
-            <p><strong>Message:</strong></p>
-            <p>{message.replace(chr(10), '<br>')}</p>
-            <hr>
-            <p><em>This message was sent from the UrVote.Rocks contact form.</em></p>
-            """,
-            "textContent": f"""
-            New Contact Form Submission
-            
-            Name: {first_name} {last_name}
-            Email: {email}
-            Subject: {readable_subject}
-            
-            Message:
-            {message}
-            
-            ---
-            This message was sent from the UrVote.Rocks contact form.
-            """
-        }
-        
-        response = requests.post(brevo_url, headers=headers, json=email_data)
-        
-        if response.status_code in [200, 201]:
-            return {"message": "Thank you for your message! We'll get back to you within 24 hours."}
-        else:
-            print(f"Brevo email error: {response.status_code} - {response.text}")
-            raise HTTPException(status_code=500, detail="Failed to send message")
-            
+        await email_outbox.enqueue_email(
+            db,
+            brevo_config.contact_form_email(first_name, last_name, email, readable_subject, message),
+        )
     except Exception as e:
         print(f"Contact form error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to send message")
+    
+    return {"message": "Thank you for your message! We'll get back to you within 24 hours."}
 
 # ------------------------------------------------------------------------------
 # Health & Error Handlers
 # ------------------------------------------------------------------------------
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "UrVote.Rocks"}
+    return {
+        "status": "healthy",
+        "service": "UrVote.Rocks",
+        "password_hashing": hash_pool_stats.snapshot(),
+    }
 
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, BigInteger, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Boolean, ForeignKey, BigInteger, JSON, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -263,17 +263,26 @@ class Vote(Base):
     # Rate limiting
     votes_per_email_per_day = Column(Integer, default=1)  # Track daily votes per email
     
-    # GeoIP data
+    # GeoIP data, filled in after the vote by app/geoip.py ("ZZ" = unknown)
     country_code = Column(String(2), nullable=True)
     region = Column(String(100), nullable=True)
     city = Column(String(100), nullable=True)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # In Postgres the table is partitioned by month on created_at and its
+    # primary key is (id, created_at); see app/vote_partitions.py
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     
     # Relationships
     song = relationship("Song", back_populates="votes")
     voter = relationship("User", back_populates="votes")
+    
+    __table_args__ = (
+        # Tallies join votes to content on (media_type, media_id)
+        Index("ix_votes_media", "media_type", "media_id"),
+        # Votes still waiting for a location
+        Index("ix_votes_geoip_pending", "created_at", postgresql_where=text("country_code IS NULL")),
+    )
 
 class Contest(Base):
     __tablename__ = "contests"
@@ -293,4 +302,46 @@ class Contest(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    client = relationship("Client", back_populates="contests")
\ No newline at end of file
+    client = relationship("Client", back_populates="contests")
+
+class EmailOutbox(Base):
+    """Outgoing Brevo requests, delivered by the background dispatcher (app/email_outbox.py)"""
+    __tablename__ = "email_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)  # transactional, contact
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+class DailyRollup(Base):
+    """Per-day upload and vote counts, maintained by the rollup job (app/rollups.py)"""
+    __tablename__ = "daily_rollups"
+    
+    day = Column(Date, primary_key=True)  # UTC
+    board_id = Column(BigInteger, primary_key=True)  # 0 = no board, or the site-wide row
+    media_type = Column(String(20), primary_key=True)  # music, video, visuals; "all" = site-wide row
+    uploads = Column(Integer, nullable=False, default=0)
+    votes = Column(Integer, nullable=False, default=0)
+    unique_voters = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class VoteTallyArchive(Base):
+    """Vote counts per item and month, kept when a month of raw votes is retired (app/vote_partitions.py)"""
+    __tablename__ = "vote_tally_archive"
+    
+    month = Column(Date, primary_key=True)  # first day of the UTC month
+    media_type = Column(String(20), primary_key=True)
+    media_id = Column(BigInteger, primary_key=True)
+    votes = Column(Integer, nullable=False, default=0)
+    likes = Column(Integer, nullable=False, default=0)
+    dislikes = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,141 @@
+"""
+Password hashing on a dedicated, bounded thread pool.
+
+bcrypt burns ~250ms of CPU per hash at cost 12. Run inline in an async
+handler, that stalls every other request on the worker, so login and
+registration await hash_password_async()/verify_password_async() instead.
+The pool is small and the number of queued jobs is capped: past the cap we
+answer 503 straight away rather than letting a login burst build a queue
+that starves vote and board traffic. Queue wait times are tracked in
+``hash_pool_stats`` (exposed on /health).
+
+Accounts created through the old /signup flow were stored as unsalted
+SHA-256 hex digests. Those still verify, but are marked deprecated: a
+successful login through check_password() rewrites them as bcrypt, and the
+same happens to bcrypt hashes below the configured cost. Placeholders such as
+the "oauth_user" marker on Google accounts never match any password.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(
+    schemes=["bcrypt", "hex_sha256"],
+    deprecated=["hex_sha256"],
+    bcrypt__rounds=settings.bcrypt_rounds,
+    # Hashes below the configured cost are upgraded on the next login
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="password-hash",
+)
+_pending = 0
+
+
+class HashPoolStats:
+    """Running totals for time spent waiting on the hash pool"""
+
+    def __init__(self):
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if wait > settings.password_hash_slow_wait:
+            logger.warning("Password hash waited %.0fms in queue", wait * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pending": _pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 1) if self.completed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+
+hash_pool_stats = HashPoolStats()
+
+
+async def run_in_hash_pool(fn: Callable, *args):
+    """Run a CPU-heavy hashing call on the pool, rejecting with 503 when the queue is full"""
+    global _pending
+    if _pending >= settings.password_hash_max_pending:
+        hash_pool_stats.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again in a moment",
+            headers={"Retry-After": "1"},
+        )
+
+    queued_at = time.perf_counter()
+
+    def job():
+        return time.perf_counter(), fn(*args)
+
+    _pending += 1
+    try:
+        started_at, result = await asyncio.get_running_loop().run_in_executor(_executor, job)
+    finally:
+        _pending -= 1
+    hash_pool_stats.record(started_at - queued_at)
+    return result
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return verify_and_update_password(plain_password, hashed_password)[0]
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning (ok, replacement hash or None)"""
+    if not hashed_password:
+        return False, None
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except ValueError:
+        # Not a password hash at all (e.g. the "oauth_user" placeholder)
+        return False, None
+
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await run_in_hash_pool(get_password_hash, password)
+
+
+async def check_password(db: AsyncSession, user: User, plain_password: str) -> bool:
+    """
+    Verify a login attempt and upgrade the stored hash if it uses a legacy
+    scheme or an outdated cost. The upgrade is committed immediately.
+    """
+    ok, new_hash = await run_in_hash_pool(
+        verify_and_update_password, plain_password, user.hashed_password
+    )
+    if ok and new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+        logger.info("Upgraded password hash for user %s", user.id)
+    return ok
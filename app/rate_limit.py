@@ -0,0 +1,177 @@
+"""
+Sliding-window rate limiting for vote, upload, signup and login routes.
+
+Limits are declared per route name in ``settings.rate_limits`` (e.g.
+``{"vote": "30/minute"}``) and can be overridden per board with
+``settings.rate_limit_board_overrides`` (``{"12:upload": "3/minute"}``).
+
+Each request is counted against two keys: the device fingerprint (IP + user
+agent, same hash as the vote records) at the route limit, and the bare IP at
+``rate_limit_ip_multiplier`` times the limit so shared NATs aren't punished for
+one noisy client. Counters use the two-bucket sliding window approximation:
+one INCR and one GET per key in a single Redis round trip, or an in-process
+table when Redis is unavailable.
+
+Use it as a route dependency so floods are rejected before any DB work:
+
+    @router.post("/vote", dependencies=[Depends(rate_limit("vote"))])
+"""
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from .config import settings
+from .redis_client import get_redis, mark_redis_down
+
+PERIODS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+# Upper bound on keys tracked by the in-process fallback
+MAX_LOCAL_KEYS = 100_000
+
+
+def parse_limit(spec: str) -> Tuple[int, int]:
+    """Parse "30/minute" into (30, 60)"""
+    try:
+        count, period = spec.split("/", 1)
+        return int(count), PERIODS[period.strip().rstrip("s")]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit '{spec}', expected e.g. '30/minute'")
+
+
+def get_limit(route: str, board_id: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """Resolve the limit for a route, honouring per-board overrides"""
+    spec = None
+    if board_id is not None:
+        spec = settings.rate_limit_board_overrides.get(f"{board_id}:{route}")
+    if spec is None:
+        spec = settings.rate_limits.get(route)
+    return parse_limit(spec) if spec else None
+
+
+def client_fingerprint(ip: str, user_agent: str) -> str:
+    """Device fingerprint, identical to the one stored on Vote rows"""
+    return hashlib.sha256(f"{ip}{user_agent}".encode()).hexdigest()[:32]
+
+
+def _weighted(prev: int, curr: int, now: float, window: int) -> float:
+    """Estimate hits in the last `window` seconds from the previous and current buckets"""
+    elapsed = now % window
+    return prev * (window - elapsed) / window + curr
+
+
+class LocalWindowStore:
+    """In-process sliding window counters, used when Redis is down"""
+
+    def __init__(self, max_keys: int = MAX_LOCAL_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def hit(self, key: str, now: float, window: int) -> float:
+        bucket_no = int(now // window)
+        entry = self._buckets.get(key)
+        if entry is None:
+            entry = [bucket_no, 0, 0]  # bucket number, current count, previous count
+            self._buckets[key] = entry
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            if entry[0] != bucket_no:
+                entry[2] = entry[1] if entry[0] == bucket_no - 1 else 0
+                entry[1] = 0
+                entry[0] = bucket_no
+        entry[1] += 1
+        return _weighted(entry[2], entry[1], now, window)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+_local_store = LocalWindowStore()
+
+
+async def _hit_redis(redis, keys: Dict[str, int], now: float, window: int) -> Dict[str, float]:
+    bucket_no = int(now // window)
+    pipe = redis.pipeline(transaction=False)
+    for key in keys:
+        current = f"{key}:{bucket_no}"
+        pipe.incr(current)
+        pipe.expire(current, window * 2)
+        pipe.get(f"{key}:{bucket_no - 1}")
+    results = await pipe.execute()
+
+    estimates = {}
+    for i, key in enumerate(keys):
+        curr, _, prev = results[i * 3:i * 3 + 3]
+        estimates[key] = _weighted(int(prev or 0), int(curr), now, window)
+    return estimates
+
+
+async def check_rate_limit(
+    route: str,
+    ip: str,
+    user_agent: str = "",
+    board_id: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Count a hit for this client and return None if allowed, or the number of
+    seconds to wait if the limit is exceeded.
+    """
+    if not settings.rate_limit_enabled:
+        return None
+    limit = get_limit(route, board_id)
+    if limit is None:
+        return None
+    max_hits, window = limit
+
+    scope = f"rl:{route}" if board_id is None else f"rl:{route}:b{board_id}"
+    keys = {
+        f"{scope}:fp:{client_fingerprint(ip, user_agent)}": max_hits,
+        f"{scope}:ip:{ip}": max_hits * settings.rate_limit_ip_multiplier,
+    }
+
+    now = time.time()
+    estimates = None
+    redis = await get_redis()
+    if redis is not None:
+        try:
+            estimates = await _hit_redis(redis, keys, now, window)
+        except RedisError as e:
+            mark_redis_down(e)
+    if estimates is None:
+        estimates = {key: _local_store.hit(key, now, window) for key in keys}
+
+    if any(estimates[key] > allowed for key, allowed in keys.items()):
+        return max(1, math.ceil(window - now % window))
+    return None
+
+
+def rate_limit(route: str):
+    """Build a dependency enforcing the configured limit for `route`"""
+
+    async def dependency(request: Request) -> None:
+        ip = request.client.host if request.client else "unknown"
+        retry_after = await check_rate_limit(
+            route,
+            ip,
+            request.headers.get("user-agent", ""),
+            request.path_params.get("board_id"),
+        )
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please slow down and try again shortly.",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    return dependency
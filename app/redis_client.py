@@ -0,0 +1,67 @@
+"""
+Shared Redis connection for rate limiting, caching and other hot-path helpers.
+
+Redis is optional: when it is disabled or unreachable, get_redis() returns None
+and callers fall back to their in-process implementation. After a failure we
+stop trying for ``redis_retry_seconds`` so a dead Redis doesn't add a connect
+timeout to every request.
+"""
+import logging
+import time
+from typing import Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[redis.Redis] = None
+_down_until: float = 0.0
+
+
+async def get_redis() -> Optional[redis.Redis]:
+    """Return the shared Redis client, or None if Redis should not be used right now"""
+    global _client
+    if not settings.redis_enabled or time.monotonic() < _down_until:
+        return None
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.redis_url,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+        )
+    return _client
+
+
+def new_pubsub_client() -> redis.Redis:
+    """
+    A dedicated client for long-lived subscriptions. It has no read timeout,
+    since an idle channel is normal, and it is not shared with request traffic.
+    """
+    return redis.Redis.from_url(
+        settings.redis_url,
+        socket_connect_timeout=settings.redis_socket_timeout,
+    )
+
+
+def mark_redis_down(exc: Exception) -> None:
+    """Record a Redis failure and switch callers to their fallback for a while"""
+    global _down_until
+    _down_until = time.monotonic() + settings.redis_retry_seconds
+    logger.warning(
+        "Redis unavailable, using in-process fallback for %ss: %s",
+        settings.redis_retry_seconds, exc,
+    )
+
+
+async def close_redis() -> None:
+    """Close the shared client (called on shutdown)"""
+    global _client
+    if _client is not None:
+        try:
+            await _client.aclose()
+        except RedisError:
+            pass
+        _client = None
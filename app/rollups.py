@@ -0,0 +1,216 @@
+"""
+Daily rollups of uploads and votes.
+
+The admin overview used to issue two COUNT range scans per day for the last
+week on every load. DailyRollup holds one row per (UTC day, board, media
+type) with uploads, votes and unique voters, plus one site-wide row per day
+(board_id 0, media_type "all") carrying the day's exact unique voter count,
+which can't be summed from the per-board rows.
+
+Days are recomputed whole from the source tables, so refreshing is
+idempotent and late or deleted rows are picked up on the next run. The
+scheduler refreshes yesterday and today every ``rollup_interval`` seconds;
+the first run backfills every day since the earliest vote or upload. Reads
+therefore lag writes by at most one interval.
+
+A voter is their email, or their user id when no email was given (see
+app/vote_media.py).
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, func, literal, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import vote_media
+from .models import DailyRollup, Song, Video, Visual, Vote
+
+ALL = "all"
+MEDIA_MODELS = (("music", Song), ("video", Video), ("visuals", Visual))
+
+
+def _day(column):
+    """UTC calendar day of a timestamptz column"""
+    return func.date(func.timezone("UTC", column))
+
+
+def _bounds(start: date, end: date):
+    """[start, end) as UTC datetimes, so range filters can use the created_at indexes"""
+    return (
+        datetime.combine(start, time.min, tzinfo=timezone.utc),
+        datetime.combine(end, time.min, tzinfo=timezone.utc),
+    )
+
+
+def _vote_query(start: date, end: date):
+    """Votes per (day, board, media type), with the site-wide per-day totals as grouping sets"""
+    lower, upper = _bounds(start, end)
+    rows = (
+        vote_media.join_media(
+            select(
+                _day(Vote.created_at).label("day"),
+                vote_media.board_id.label("board_id"),
+                vote_media.media_type.label("media_type"),
+                vote_media.voter_key.label("voter"),
+            ).select_from(Vote)
+        )
+        .where(Vote.created_at >= lower, Vote.created_at < upper)
+        .subquery()
+    )
+    return select(
+        rows.c.day,
+        rows.c.board_id,
+        rows.c.media_type,
+        func.grouping(rows.c.board_id).label("site_wide"),
+        func.count().label("votes"),
+        func.count(func.distinct(rows.c.voter)).label("unique_voters"),
+    ).group_by(
+        func.grouping_sets(
+            tuple_(rows.c.day, rows.c.board_id, rows.c.media_type),
+            tuple_(rows.c.day),
+        )
+    )
+
+
+def _upload_query(start: date, end: date):
+    lower, upper = _bounds(start, end)
+    parts = [
+        select(
+            _day(model.created_at).label("day"),
+            func.coalesce(model.board_id, 0).label("board_id"),
+            literal(media_type).label("media_type"),
+        ).where(model.created_at >= lower, model.created_at < upper)
+        for media_type, model in MEDIA_MODELS
+    ]
+    rows = union_all(*parts).subquery()
+    return select(
+        rows.c.day, rows.c.board_id, rows.c.media_type, func.count().label("uploads")
+    ).group_by(rows.c.day, rows.c.board_id, rows.c.media_type)
+
+
+async def compute(db: AsyncSession, start: date, end: date) -> List[Dict[str, Any]]:
+    """Rollup rows for days in [start, end), straight from the source tables"""
+    rows: Dict[tuple, Dict[str, Any]] = {}
+
+    def row(day: date, board_id: int, media_type: str) -> Dict[str, Any]:
+        key = (day, board_id, media_type)
+        if key not in rows:
+            rows[key] = {
+                "day": day, "board_id": board_id, "media_type": media_type,
+                "uploads": 0, "votes": 0, "unique_voters": 0,
+            }
+        return rows[key]
+
+    for r in (await db.execute(_vote_query(start, end))).all():
+        if r.site_wide:
+            target = row(r.day, 0, ALL)
+        else:
+            target = row(r.day, r.board_id, r.media_type)
+        target["votes"] = r.votes
+        target["unique_voters"] = r.unique_voters
+
+    for r in (await db.execute(_upload_query(start, end))).all():
+        row(r.day, r.board_id, r.media_type)["uploads"] = r.uploads
+        row(r.day, 0, ALL)["uploads"] += r.uploads
+
+    return list(rows.values())
+
+
+async def refresh(db: AsyncSession, start: date, end: date) -> int:
+    """Replace the rollups for days in [start, end); the caller commits"""
+    rows = await compute(db, start, end)
+    await db.execute(delete(DailyRollup).where(DailyRollup.day >= start, DailyRollup.day < end))
+    if rows:
+        await db.execute(insert(DailyRollup), rows)
+    return len(rows)
+
+
+async def _first_day(db: AsyncSession) -> Optional[date]:
+    candidates = [select(func.min(Vote.created_at))] + [select(func.min(model.created_at)) for _, model in MEDIA_MODELS]
+    earliest = None
+    for query in candidates:
+        value = (await db.execute(query)).scalar()
+        if value is not None and (earliest is None or value < earliest):
+            earliest = value
+    return earliest.astimezone(timezone.utc).date() if earliest else None
+
+
+async def run_rollup_job(db: AsyncSession) -> None:
+    """Scheduler job: backfill once, then keep yesterday and today current"""
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=1)
+    has_rollups = (await db.execute(select(DailyRollup.day).limit(1))).first() is not None
+    if not has_rollups:
+        start = min(start, await _first_day(db) or start)
+    await refresh(db, start, today + timedelta(days=1))
+
+
+async def daily_totals(db: AsyncSession, start: date, end: date) -> List[Dict[str, Any]]:
+    """Site-wide totals per day in [start, end], including days with no activity"""
+    music_uploads = func.sum(DailyRollup.uploads).filter(DailyRollup.media_type == "music")
+    result = await db.execute(
+        select(
+            DailyRollup.day,
+            func.coalesce(music_uploads, 0).label("songs"),
+            func.coalesce(func.sum(DailyRollup.uploads).filter(DailyRollup.media_type == ALL), 0).label("uploads"),
+            func.coalesce(func.sum(DailyRollup.votes).filter(DailyRollup.media_type == ALL), 0).label("votes"),
+            func.coalesce(func.sum(DailyRollup.unique_voters).filter(DailyRollup.media_type == ALL), 0).label("unique_voters"),
+        )
+        .where(DailyRollup.day >= start, DailyRollup.day <= end)
+        .group_by(DailyRollup.day)
+    )
+    by_day = {r.day: r for r in result.all()}
+    totals = []
+    day = start
+    while day <= end:
+        r = by_day.get(day)
+        totals.append({
+            "date": day.isoformat(),
+            "songs": r.songs if r else 0,
+            "uploads": r.uploads if r else 0,
+            "votes": r.votes if r else 0,
+            "unique_voters": r.unique_voters if r else 0,
+        })
+        day += timedelta(days=1)
+    return totals
+
+
+async def breakdown(
+    db: AsyncSession,
+    start: date,
+    end: date,
+    board_id: Optional[int] = None,
+    media_type: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Per-day, per-board, per-media-type rows in [start, end]
+
+    unique_voters is per row and day; voters active on several days or boards
+    are counted once for each.
+    """
+    query = (
+        select(DailyRollup)
+        .where(DailyRollup.day >= start, DailyRollup.day <= end, DailyRollup.media_type != ALL)
+        .order_by(DailyRollup.day, DailyRollup.board_id, DailyRollup.media_type)
+    )
+    if board_id is not None:
+        query = query.where(DailyRollup.board_id == board_id)
+    if media_type is not None:
+        query = query.where(DailyRollup.media_type == media_type)
+    result = await db.execute(query)
+    return [
+        {
+            "date": r.day.isoformat(),
+            "board_id": r.board_id,
+            "media_type": r.media_type,
+            "uploads": r.uploads,
+            "votes": r.votes,
+            "unique_voters": r.unique_voters,
+        }
+        for r in result.scalars().all()
+    ]
+
+
+async def total_votes(db: AsyncSession) -> int:
+    result = await db.execute(select(func.coalesce(func.sum(DailyRollup.votes), 0)).where(DailyRollup.media_type == ALL))
+    return result.scalar()
@@ -1,20 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from ..database import get_db
-from ..models import User, Song, Vote, Contest
+from ..models import User, Song, Vote, Contest, Board
 from ..schemas import SongApproval
 from ..auth import get_current_admin_user
 from ..config import settings
+from ..templating import templates
+from .. import board_cache, exports, fraud, rollups, user_cache, vote_archive
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/", response_class=HTMLResponse)
 async def admin_dashboard(
@@ -78,6 +78,7 @@ async def approve_song_api(
         song.rejection_reason = approval.rejection_reason
     
     await db.commit()
+    await board_cache.bump_content(song.board_id)
     
     return {
         "message": f"Song {'approved' if approval.is_approved else 'rejected'} successfully",
@@ -98,8 +99,8 @@ async def get_admin_stats(
     total_songs = await db.execute(select(func.count(Song.id)))
     total_songs = total_songs.scalar()
     
-    total_votes = await db.execute(select(func.count(Vote.id)))
-    total_votes = total_votes.scalar()
+    # From the rollups, so the dashboard never counts the votes table
+    total_votes = await rollups.total_votes(db)
     
     # Pending approvals
     pending_songs = await db.execute(
@@ -120,34 +121,10 @@ async def get_admin_stats(
     )
     recent_votes = recent_votes.scalars().all()
     
-    # Daily stats for the last 7 days
-    daily_stats = []
-    for i in range(7):
-        date = datetime.utcnow() - timedelta(days=i)
-        start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = start_of_day + timedelta(days=1)
-        
-        # Songs submitted
-        songs_count = await db.execute(
-            select(func.count(Song.id)).where(
-                and_(Song.created_at >= start_of_day, Song.created_at < end_of_day)
-            )
-        )
-        songs_count = songs_count.scalar()
-        
-        # Votes cast
-        votes_count = await db.execute(
-            select(func.count(Vote.id)).where(
-                and_(Vote.created_at >= start_of_day, Vote.created_at < end_of_day)
-            )
-        )
-        votes_count = votes_count.scalar()
-        
-        daily_stats.append({
-            "date": date.strftime("%Y-%m-%d"),
-            "songs": songs_count,
-            "votes": votes_count
-        })
+    # Daily stats for the last 7 days, newest first
+    today = datetime.utcnow().date()
+    daily_stats = await rollups.daily_totals(db, today - timedelta(days=6), today)
+    daily_stats.reverse()
     
     return {
         "overview": {
@@ -161,6 +138,97 @@ async def get_admin_stats(
         "daily_stats": daily_stats
     }
 
+@router.get("/api/stats/daily")
+async def get_daily_stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    board_id: Optional[int] = None,
+    media_type: Optional[str] = None,
+    breakdown: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Uploads, votes and unique voters per day for a date range (default: last 30 days)
+    
+    Site-wide totals by default; breakdown=true (or a board/media filter) returns
+    one row per day, board and media type instead.
+    """
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days > 3660:
+        raise HTTPException(status_code=400, detail="Date range is limited to 10 years")
+    
+    if breakdown or board_id is not None or media_type is not None:
+        days = await rollups.breakdown(db, start, end, board_id=board_id, media_type=media_type)
+    else:
+        days = await rollups.daily_totals(db, start, end)
+    return {"start": start.isoformat(), "end": end.isoformat(), "days": days}
+
+@router.get("/api/analytics/votes-by-country")
+async def get_archived_votes_by_country(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    board_id: Optional[int] = None,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Votes and distinct voters per country over archived (ended) months
+    
+    Reads the Parquet vote archive, not the live votes table.
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    try:
+        countries = await vote_archive.votes_by_country(start, end, board_id=board_id)
+    except vote_archive.ArchiveUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"start": start, "end": end, "board_id": board_id, "countries": countries}
+
+@router.get("/api/analytics/voter-overlap")
+async def get_archived_voter_overlap(
+    board_a: int,
+    board_b: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """How many voters voted on both boards, over archived (ended) months"""
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    try:
+        overlap = await vote_archive.voter_overlap(board_a, board_b, start, end)
+    except vote_archive.ArchiveUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"start": start, "end": end, **overlap}
+
+@router.get("/api/fraud/rings")
+async def get_vote_rings(
+    board_id: Optional[int] = None,
+    contest_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    min_size: Optional[int] = Query(None, ge=2),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Clusters of voters on a board or contest linked by shared devices, IPs or email domains
+    
+    Reads every matching vote, so a large board can take a while; for
+    millions of votes prefer `python -m app.fraud`.
+    """
+    if (board_id is None) == (contest_id is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of board_id or contest_id")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if board_id is not None and await db.get(Board, board_id) is None:
+        raise HTTPException(status_code=404, detail="Board not found")
+    if contest_id is not None and await db.get(Contest, contest_id) is None:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    return await fraud.find_rings(
+        db, board_id=board_id, contest_id=contest_id, start=start, end=end, min_size=min_size
+    )
+
 @router.get("/api/users")
 async def get_users(
     limit: int = 50,
@@ -200,6 +268,7 @@ async def toggle_user_status(
     
     user.is_active = not user.is_active
     await db.commit()
+    await user_cache.invalidate_user(user_id)
     
     return {
         "message": f"User {'activated' if user.is_active else 'deactivated'} successfully",
@@ -209,32 +278,27 @@ async def toggle_user_status(
 
 @router.get("/api/export/voters")
 async def export_voters(
+    format: str = Query("json", pattern="^(csv|ndjson|json)$"),
+    board_id: Optional[int] = None,
+    media_type: Optional[str] = Query(None, pattern="^(music|video|visuals)$"),
+    media_id: Optional[int] = None,
     song_id: Optional[int] = None,
-    db: AsyncSession = Depends(get_db),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
     current_user: User = Depends(get_current_admin_user)
 ):
-    """Export voter information for marketing purposes"""
+    """Export voter information for marketing purposes
     
-    if song_id:
-        # Export voters for specific song
-        result = await db.execute(
-            select(Vote).where(Vote.song_id == song_id)
-        )
-        votes = result.scalars().all()
-    else:
-        # Export all voters
-        result = await db.execute(select(Vote))
-        votes = result.scalars().all()
-    
-    # Format for export
-    export_data = []
-    for vote in votes:
-        export_data.append({
-            "email": vote.voter.email if vote.voter else "Unknown",
-            "ip_address": vote.ip_address,
-            "country": vote.country_code,
-            "voted_at": vote.created_at.isoformat(),
-            "song_id": vote.song_id
-        })
-    
-    return export_data
+    Streams every matching vote (one query, constant memory) as CSV, NDJSON
+    or a JSON array.
+    """
+    query = exports.voters_query(
+        board_id=board_id, media_type=media_type, media_id=media_id,
+        song_id=song_id, start=start, end=end,
+    )
+    filename = f"voters-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        exports.stream_voters(query, format),
+        media_type=exports.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
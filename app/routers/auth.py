@@ -1,20 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
 from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
 from fastapi.security import HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.database import get_db
 from app.models import User
 from app.schemas import UserCreate, UserLogin, UserResponse
-from app.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from app.auth import hash_password_async, check_password, create_access_token, get_current_user
 from app.config import settings
+from app.rate_limit import rate_limit
+from app import user_cache
 from datetime import datetime
 import secrets
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
-@router.post("/register", response_model=dict)
+@router.post("/register", response_model=dict, dependencies=[Depends(rate_limit("signup"))])
 async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     # Check if user already exists
@@ -32,7 +33,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         )
     # Create new user with appropriate permissions based on user_type
     verification_token = secrets.token_urlsafe(32)
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     
     # Set permissions based on user type
     if user_data.user_type == "board_owner":
@@ -64,7 +65,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         "user_id": new_user.id
     }
 
-@router.post("/register-form", response_class=HTMLResponse)
+@router.post("/register-form", response_class=HTMLResponse, dependencies=[Depends(rate_limit("signup"))])
 async def register_form(
     request: Request,
     email: str = Form(...),
@@ -112,7 +113,7 @@ async def register_form(
         
         # Create new user with appropriate permissions
         verification_token = secrets.token_urlsafe(32)
-        hashed_password = get_password_hash(password)
+        hashed_password = await hash_password_async(password)
         
         # Set permissions based on user type
         if user_type == "board_owner":
@@ -144,6 +145,7 @@ async def register_form(
         access_token = create_access_token(data={"sub": str(new_user.id)})
         
         # Store user info in session
+        request.session.regenerate()
         request.session["user_id"] = new_user.id
         request.session["user_email"] = new_user.email
         request.session["user_type"] = new_user.user_type
@@ -167,13 +169,13 @@ async def register_form(
             status_code=500
         )
 
-@router.post("/login", response_model=dict)
+@router.post("/login", response_model=dict, dependencies=[Depends(rate_limit("login"))])
 async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login user and return access token"""
     # Find user by email
     result = await db.execute(select(User).where(User.email == user_data.email))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    if not user or not await check_password(db, user, user_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -199,6 +201,7 @@ async def set_session(
     user_type: str
 ):
     """Set user session data"""
+    request.session.regenerate()
     request.session["user_id"] = user_id
     request.session["user_email"] = email
     request.session["user_type"] = user_type
@@ -211,8 +214,7 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await user_cache.get_user(db, user_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -243,6 +245,7 @@ async def verify_email(token: str, db: AsyncSession = Depends(get_db)):
 @router.post("/session")
 async def set_session(request: Request, user_data: dict):
     """Store user info in session for server-side access"""
+    request.session.regenerate()
     request.session["user_id"] = user_data.get("user_id")
     request.session["user_email"] = user_data.get("email")
     request.session["user_type"] = user_data.get("user_type")
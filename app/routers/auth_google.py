@@ -2,69 +2,29 @@ from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from google.auth.transport import requests
-from google.oauth2 import id_token
-from google_auth_oauthlib.flow import Flow
-import os
-import json
-from urllib.parse import urlencode
+import secrets
 
 from ..database import get_db
 from ..models import User
 from ..config import settings
+from .. import google_oauth, user_cache
 from ..utils.main import generate_jwt_token
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
-# Google OAuth configuration
-GOOGLE_CLIENT_ID = settings.google_client_id
-GOOGLE_CLIENT_SECRET = settings.google_client_secret
-GOOGLE_REDIRECT_URI = settings.google_redirect_uri
-
-# OAuth scopes
-SCOPES = [
-    "https://www.googleapis.com/auth/userinfo.email",
-    "https://www.googleapis.com/auth/userinfo.profile", 
-    "openid"
-]
-
-def get_google_flow():
-    """Create Google OAuth flow"""
-    if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
-        raise HTTPException(status_code=500, detail="Google OAuth not configured")
-    
-    flow = Flow.from_client_config(
-        {
-            "web": {
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-                "redirect_uris": [GOOGLE_REDIRECT_URI]
-            }
-        },
-        scopes=SCOPES
-    )
-    flow.redirect_uri = GOOGLE_REDIRECT_URI
-    return flow
-
 @router.get("/google")
 async def google_login(request: Request, redirect_url: str = "/"):
     """Initiate Google OAuth login"""
-    try:
-        flow = get_google_flow()
-        authorization_url, state = flow.authorization_url(
-            access_type='offline',
-            include_granted_scopes='true'
-        )
-        
-        # Store state and redirect URL in session for security
-        request.session["oauth_state"] = state
-        request.session["redirect_after_login"] = redirect_url
-        
-        return RedirectResponse(authorization_url)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OAuth setup failed: {str(e)}")
+    if not google_oauth.is_configured():
+        raise HTTPException(status_code=500, detail="Google OAuth not configured")
+    
+    state = secrets.token_urlsafe(32)
+    
+    # Store state and redirect URL in session for security
+    request.session["oauth_state"] = state
+    request.session["redirect_after_login"] = redirect_url
+    
+    return RedirectResponse(google_oauth.authorization_url(state))
 
 @router.get("/google/callback")
 async def google_callback(request: Request, db: AsyncSession = Depends(get_db)):
@@ -78,17 +38,12 @@ async def google_callback(request: Request, db: AsyncSession = Depends(get_db)):
         if not state or state != request.session.get("oauth_state"):
             raise HTTPException(status_code=400, detail="Invalid state parameter")
         
-        # Exchange code for token
-        flow = get_google_flow()
-        flow.fetch_token(code=code)
+        if not code:
+            raise HTTPException(status_code=400, detail="Missing authorization code")
         
-        # Get user info from Google
-        credentials = flow.credentials
-        idinfo = id_token.verify_oauth2_token(
-            credentials.id_token, 
-            requests.Request(), 
-            GOOGLE_CLIENT_ID
-        )
+        # Exchange code for token, then verify the ID token against cached keys
+        tokens = await google_oauth.exchange_code(code)
+        idinfo = await google_oauth.verify_id_token(tokens.get("id_token", ""))
         
         email = idinfo.get('email')
         name = idinfo.get('name')
@@ -128,6 +83,7 @@ async def google_callback(request: Request, db: AsyncSession = Depends(get_db)):
         token = generate_jwt_token(user.id, user.email, user.user_type)
         
         # Store token in session
+        request.session.regenerate()
         request.session["access_token"] = token
         request.session["user_id"] = user.id
         request.session["user_email"] = user.email
@@ -156,8 +112,7 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await user_cache.get_user(db, user_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Request
 from app.dependencies import get_current_board_owner
-from .. import templates
+from ..templating import templates
 
 router = APIRouter(
     prefix="/board-owner",
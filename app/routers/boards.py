@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Form, UploadFile, File, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Form, UploadFile, File, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Optional
 from app.database import get_db
 from app.models import Board, User, Song, Video, Visual, Vote
+from app.rate_limit import rate_limit
+from app import board_cache, board_stats, leaderboard, trending
 import os
 import uuid
 import hashlib
@@ -25,9 +28,19 @@ async def get_board_content(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     content_type: Optional[str] = Query(None, description="Filter by content type: music, video, visuals"),
+    fields: Optional[str] = Query(None, description="Comma-separated item fields to return, e.g. id,title,upvotes"),
+    sort: str = Query("newest", pattern="^(newest|trending)$", description="newest, or trending (recent likes, decayed)"),
+    request: Request = None,
     db: AsyncSession = Depends(get_db)
 ):
     """Get content for a specific Media Board"""
+    # Pollers with an up-to-date copy get a 304 before any content query
+    # Trending scores decay with time, not only with votes
+    extra = request.url.query + (trending.time_bucket() if sort == "trending" else "")
+    etag = await board_cache.board_etag(board_id, extra)
+    if etag and board_cache.etag_matches(request, etag):
+        return board_cache.not_modified(etag)
+    
     try:
         # First check if board exists
         board_res = await db.execute(select(Board).where(Board.id == board_id))
@@ -39,6 +52,12 @@ async def get_board_content(
         # Build content query based on board's media type preferences
         content_items = []
         
+        # Likes/dislikes for every item on the board in one query
+        tallies = await board_stats.item_tallies(
+            db, board_id,
+            [t for t in board_stats.allowed_media_types(board) if not content_type or t == content_type]
+        )
+        
         # Get music content if board allows it
         if board.allow_music:
             music_query = select(Song).where(Song.board_id == board_id)
@@ -49,21 +68,7 @@ async def get_board_content(
             music_items = music_res.scalars().all()
             
             for song in music_items:
-                # Get vote counts for this song
-                upvotes_res = await db.execute(
-                    select(func.count(Vote.id)).where(
-                        Vote.media_type == "music",
-                        Vote.media_id == song.id,
-                        Vote.vote_type == "like"
-                    )
-                )
-                downvotes_res = await db.execute(
-                    select(func.count(Vote.id)).where(
-                        Vote.media_type == "music",
-                        Vote.media_id == song.id,
-                        Vote.vote_type == "dislike"
-                    )
-                )
+                upvotes, downvotes = tallies.get(("music", song.id), (0, 0))
                 
                 content_items.append({
                     "id": song.id,
@@ -75,8 +80,8 @@ async def get_board_content(
                     "file_path": song.file_path,
                     "external_link": song.external_link,
                     "content_type": "music",
-                    "upvotes": upvotes_res.scalar() or 0,
-                    "downvotes": downvotes_res.scalar() or 0,
+                    "upvotes": upvotes,
+                    "downvotes": downvotes,
                     "created_at": song.created_at,
                     "content_source": song.content_source,
                     "creator_website": song.creator_website,
@@ -97,21 +102,7 @@ async def get_board_content(
             video_items = video_res.scalars().all()
             
             for video in video_items:
-                # Get vote counts for this video
-                upvotes_res = await db.execute(
-                    select(func.count(Vote.id)).where(
-                        Vote.media_type == "video",
-                        Vote.media_id == video.id,
-                        Vote.vote_type == "like"
-                    )
-                )
-                downvotes_res = await db.execute(
-                    select(func.count(Vote.id)).where(
-                        Vote.media_type == "video",
-                        Vote.media_id == video.id,
-                        Vote.vote_type == "dislike"
-                    )
-                )
+                upvotes, downvotes = tallies.get(("video", video.id), (0, 0))
                 
                 content_items.append({
                     "id": video.id,
@@ -122,8 +113,8 @@ async def get_board_content(
                     "file_path": video.file_path,
                     "external_link": video.external_link,
                     "content_type": "video",
-                    "upvotes": upvotes_res.scalar() or 0,
-                    "downvotes": downvotes_res.scalar() or 0,
+                    "upvotes": upvotes,
+                    "downvotes": downvotes,
                     "created_at": video.created_at,
                     "content_source": video.content_source,
                     "creator_website": video.creator_website,
@@ -144,21 +135,7 @@ async def get_board_content(
             visual_items = visual_res.scalars().all()
             
             for visual in visual_items:
-                # Get vote counts for this visual
-                upvotes_res = await db.execute(
-                    select(func.count(Vote.id)).where(
-                        Vote.media_type == "visuals",
-                        Vote.media_id == visual.id,
-                        Vote.vote_type == "like"
-                    )
-                )
-                downvotes_res = await db.execute(
-                    select(func.count(Vote.id)).where(
-                        Vote.media_type == "visuals",
-                        Vote.media_id == visual.id,
-                        Vote.vote_type == "dislike"
-                    )
-                )
+                upvotes, downvotes = tallies.get(("visuals", visual.id), (0, 0))
                 
                 content_items.append({
                     "id": visual.id,
@@ -169,8 +146,8 @@ async def get_board_content(
                     "file_path": visual.file_path,
                     "external_link": visual.external_link,
                     "content_type": "visuals",
-                    "upvotes": upvotes_res.scalar() or 0,
-                    "downvotes": downvotes_res.scalar() or 0,
+                    "upvotes": upvotes,
+                    "downvotes": downvotes,
                     "created_at": visual.created_at,
                     "content_source": visual.content_source,
                     "creator_website": visual.creator_website,
@@ -184,18 +161,37 @@ async def get_board_content(
         # Sort by creation date (newest first)
         content_items.sort(key=lambda x: x["created_at"], reverse=True)
         
+        if sort == "trending":
+            # Stable sort: items with equal (or no) momentum stay newest first
+            scores = await trending.scores(board_id)
+            for item in content_items:
+                item["trending_score"] = round(scores.get((item["content_type"], item["id"]), 0.0), 3)
+            content_items.sort(key=lambda x: x["trending_score"], reverse=True)
+        
         # Apply pagination
         start_idx = (page - 1) * limit
         end_idx = start_idx + limit
         paginated_content = content_items[start_idx:end_idx]
         
-        return {
+        # Sparse fieldsets: only send the columns the client renders
+        if fields:
+            wanted = {"id"} | {f.strip() for f in fields.split(",") if f.strip()}
+            paginated_content = [
+                {key: value for key, value in item.items() if key in wanted}
+                for item in paginated_content
+            ]
+        
+        # orjson serializes the item dicts (and datetimes) directly,
+        # skipping FastAPI's jsonable_encoder pass
+        response = ORJSONResponse({
             "content": paginated_content,
             "total": len(content_items),
             "page": page,
             "limit": limit,
             "has_more": end_idx < len(content_items)
-        }
+        })
+        board_cache.set_cache_headers(response, etag)
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching content: {str(e)}")
@@ -205,7 +201,7 @@ from pydantic import BaseModel
 class VoteRequest(BaseModel):
     vote_type: str
 
-@router.post("/{board_id}/content/{content_id}/vote")
+@router.post("/{board_id}/content/{content_id}/vote", dependencies=[Depends(rate_limit("vote"))])
 async def vote_on_content(
     board_id: int,
     content_id: int,
@@ -247,12 +243,24 @@ async def vote_on_content(
                 print(f"DEBUG: Removing existing vote")
                 await db.delete(existing_vote)
                 await db.commit()
+                await board_cache.bump_tally(board_id)
+                if vote_type == "like":
+                    await trending.record(
+                        board_id, existing_vote.media_type, existing_vote.media_id, -1, at=existing_vote.created_at
+                    )
                 return {"message": "Vote removed", "action": "removed"}
             else:
                 # Change vote type
                 print(f"DEBUG: Updating existing vote from {existing_vote.vote_type} to {vote_type}")
                 existing_vote.vote_type = vote_type
                 await db.commit()
+                await board_cache.bump_tally(board_id)
+                if vote_type == "like":
+                    await trending.record(board_id, existing_vote.media_type, existing_vote.media_id)
+                else:
+                    await trending.record(
+                        board_id, existing_vote.media_type, existing_vote.media_id, -1, at=existing_vote.created_at
+                    )
                 return {"message": "Vote updated", "action": "updated"}
         else:
             # Create new vote - determine media type by checking which table has this content_id
@@ -297,6 +305,9 @@ async def vote_on_content(
             
             db.add(new_vote)
             await db.commit()
+            await board_cache.bump_tally(board_id)
+            if vote_type == "like":
+                await trending.record(board_id, media_type, content_id)
             print(f"DEBUG: Vote saved successfully with ID: {new_vote.id}")
             
             return {"message": "Vote added", "action": "added"}
@@ -405,9 +416,17 @@ async def get_upload_limits():
 @router.get("/{board_id}/stats")
 async def get_board_stats(
     board_id: int,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db)
 ):
     """Get statistics for a Media Board"""
+    # trending_content decays with time, not only with votes
+    etag = await board_cache.board_etag(board_id, trending.time_bucket())
+    if etag and board_cache.etag_matches(request, etag):
+        return board_cache.not_modified(etag)
+    board_cache.set_cache_headers(response, etag)
+    
     try:
         # Check if board exists
         board_res = await db.execute(select(Board).where(Board.id == board_id))
@@ -416,43 +435,18 @@ async def get_board_stats(
         if not board:
             raise HTTPException(status_code=404, detail="Board not found")
         
-        # Count content by type
-        music_count = 0
-        video_count = 0
-        visuals_count = 0
-        
-        if board.allow_music:
-            music_res = await db.execute(select(func.count(Song.id)).where(Song.board_id == board_id))
-            music_count = music_res.scalar() or 0
-        
-        if board.allow_video:
-            video_res = await db.execute(select(func.count(Video.id)).where(Video.board_id == board_id))
-            video_count = video_res.scalar() or 0
-        
-        if board.allow_visuals:
-            visual_res = await db.execute(select(func.count(Visual.id)).where(Visual.board_id == board_id))
-            visuals_count = visual_res.scalar() or 0
-        
-        total_content = music_count + video_count + visuals_count
-        
-        # Count total votes
-        votes_res = await db.execute(select(func.count(Vote.id)).where(Vote.media_id.in_(
-            select(Song.id).where(Song.board_id == board_id).union(
-                select(Video.id).where(Video.board_id == board_id)
-            ).union(
-                select(Visual.id).where(Visual.board_id == board_id)
-            )
-        )))
-        total_votes = votes_res.scalar() or 0
+        # Content counts and vote totals in one pass
+        stats = await board_stats.board_stats(db, board, top_n=0)
+        counts = stats["content_counts"]
         
         return {
-            "total_content": total_content,
-            "music_count": music_count,
-            "video_count": video_count,
-            "visuals_count": visuals_count,
-            "total_votes": total_votes,
+            "total_content": stats["total_content"],
+            "music_count": counts["music"],
+            "video_count": counts["video"],
+            "visuals_count": counts["visuals"],
+            "total_votes": stats["total_upvotes"] + stats["total_downvotes"],
             "community_members": 1,  # Placeholder - could be enhanced
-            "trending_content": 0    # Placeholder - could be enhanced
+            "trending_content": await trending.trending_count(board_id)
         }
         
     except Exception as e:
@@ -562,7 +556,7 @@ async def create_media_board(
         print(f"DEBUG: Session data: {dict(request.session)}")
         raise HTTPException(status_code=500, detail=f"Error creating board: {str(e)}")
 
-@router.post("/{board_id}/upload/music")
+@router.post("/{board_id}/upload/music", dependencies=[Depends(rate_limit("upload"))])
 async def upload_music(
     board_id: int,
     title: str = Form(...),
@@ -692,6 +686,7 @@ async def upload_music(
         db.add(new_music)
         await db.commit()
         await db.refresh(new_music)
+        await board_cache.bump_content(board_id)
         print(f"DEBUG: Song saved to database with ID: {new_music.id}")
         
         return {
@@ -707,7 +702,7 @@ async def upload_music(
         print(f"DEBUG: Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error uploading music: {str(e)}")
 
-@router.post("/{board_id}/upload/video")
+@router.post("/{board_id}/upload/video", dependencies=[Depends(rate_limit("upload"))])
 async def upload_video(
     board_id: int,
     title: str = Form(...),
@@ -830,6 +825,7 @@ async def upload_video(
         db.add(new_video)
         await db.commit()
         await db.refresh(new_video)
+        await board_cache.bump_content(board_id)
         
         return {
             "success": True,
@@ -840,7 +836,7 @@ async def upload_video(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading video: {str(e)}")
 
-@router.post("/{board_id}/upload/visuals")
+@router.post("/{board_id}/upload/visuals", dependencies=[Depends(rate_limit("upload"))])
 async def upload_visuals(
     board_id: int,
     title: str = Form(...),
@@ -963,6 +959,7 @@ async def upload_visuals(
         db.add(new_visual)
         await db.commit()
         await db.refresh(new_visual)
+        await board_cache.bump_content(board_id)
         
         return {
             "success": True,
@@ -976,9 +973,16 @@ async def upload_visuals(
 @router.get("/{board_id}/vote-stats")
 async def get_board_vote_stats(
     board_id: int,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db)
 ):
     """Get voting statistics for a specific Media Board"""
+    etag = await board_cache.board_etag(board_id)
+    if etag and board_cache.etag_matches(request, etag):
+        return board_cache.not_modified(etag)
+    board_cache.set_cache_headers(response, etag)
+    
     try:
         # First check if board exists
         board_res = await db.execute(select(Board).where(Board.id == board_id))
@@ -987,138 +991,57 @@ async def get_board_vote_stats(
         if not board:
             raise HTTPException(status_code=404, detail="Board not found")
         
-        # Get total vote counts by joining through content tables
-        # Get upvotes for music
-        music_upvotes_res = await db.execute(
-            select(func.count(Vote.id)).join(Song, Vote.media_id == Song.id).where(
-                Vote.media_type == "music",
-                Vote.vote_type == "like",
-                Song.board_id == board_id
-            )
-        )
-        music_upvotes = music_upvotes_res.scalar() or 0
-        
-        # Get upvotes for videos
-        video_upvotes_res = await db.execute(
-            select(func.count(Vote.id)).join(Video, Vote.media_id == Video.id).where(
-                Vote.media_type == "video",
-                Vote.vote_type == "like",
-                Video.board_id == board_id
-            )
-        )
-        video_upvotes = video_upvotes_res.scalar() or 0
-        
-        # Get upvotes for visuals
-        visual_upvotes_res = await db.execute(
-            select(func.count(Vote.id)).join(Visual, Vote.media_id == Visual.id).where(
-                Vote.media_type == "visuals",
-                Vote.vote_type == "like",
-                Visual.board_id == board_id
-            )
-        )
-        visual_upvotes = visual_upvotes_res.scalar() or 0
-        
-        total_upvotes = music_upvotes + video_upvotes + visual_upvotes
-        
-        # Get downvotes for music
-        music_downvotes_res = await db.execute(
-            select(func.count(Vote.id)).join(Song, Vote.media_id == Song.id).where(
-                Vote.media_type == "music",
-                Vote.vote_type == "dislike",
-                Song.board_id == board_id
-            )
-        )
-        music_downvotes = music_downvotes_res.scalar() or 0
-        
-        # Get downvotes for videos
-        video_downvotes_res = await db.execute(
-            select(func.count(Vote.id)).join(Video, Vote.media_id == Video.id).where(
-                Vote.media_type == "video",
-                Vote.vote_type == "dislike",
-                Video.board_id == board_id
-            )
-        )
-        video_downvotes = video_downvotes_res.scalar() or 0
-        
-        # Get downvotes for visuals
-        visual_downvotes_res = await db.execute(
-            select(func.count(Vote.id)).join(Visual, Vote.media_id == Visual.id).where(
-                Vote.media_type == "visuals",
-                Vote.vote_type == "dislike",
-                Visual.board_id == board_id
-            )
-        )
-        visual_downvotes = visual_downvotes_res.scalar() or 0
-        
-        total_downvotes = music_downvotes + video_downvotes + visual_downvotes
-        
-        total_votes = total_upvotes + total_downvotes
-        
-        # Get top performing content (by upvotes)
-        top_content = []
-        
-        # Get top music
-        if board.allow_music:
-            music_query = select(Song, func.count(Vote.id).label('upvotes')).join(
-                Vote, (Vote.media_type == "music") & (Vote.media_id == Song.id) & (Vote.vote_type == "like")
-            ).where(Song.board_id == board_id).group_by(Song.id).order_by(func.count(Vote.id).desc()).limit(5)
-            music_res = await db.execute(music_query)
-            music_items = music_res.all()
-            for song, upvotes in music_items:
-                top_content.append({
-                    "id": song.id,
-                    "title": song.title,
-                    "artist_name": song.artist_name,
-                    "content_type": "music",
-                    "upvotes": upvotes
-                })
-        
-        # Get top videos
-        if board.allow_video:
-            video_query = select(Video, func.count(Vote.id).label('upvotes')).join(
-                Vote, (Vote.media_type == "video") & (Vote.media_id == Video.id) & (Vote.vote_type == "like")
-            ).where(Video.board_id == board_id).group_by(Video.id).order_by(func.count(Vote.id).desc()).limit(5)
-            video_res = await db.execute(video_query)
-            video_items = video_res.all()
-            for video, upvotes in video_items:
-                top_content.append({
-                    "id": video.id,
-                    "title": video.title,
-                    "artist_name": video.artist_name,
-                    "content_type": "video",
-                    "upvotes": upvotes
-                })
-        
-        # Get top visuals
-        if board.allow_visuals:
-            visual_query = select(Visual, func.count(Vote.id).label('upvotes')).join(
-                Vote, (Vote.media_type == "visuals") & (Vote.media_id == Visual.id) & (Vote.vote_type == "like")
-            ).where(Visual.board_id == board_id).group_by(Visual.id).order_by(func.count(Vote.id).desc()).limit(5)
-            visual_res = await db.execute(visual_query)
-            visual_items = visual_res.all()
-            for visual, upvotes in visual_items:
-                top_content.append({
-                    "id": visual.id,
-                    "title": visual.title,
-                    "artist_name": visual.artist_name,
-                    "content_type": "visuals",
-                    "upvotes": upvotes
-                })
-        
-        # Sort all content by upvotes and take top 5
-        top_content.sort(key=lambda x: x['upvotes'], reverse=True)
-        top_content = top_content[:5]
+        # Vote totals and the top 5 across media types in one query
+        stats = await board_stats.board_stats(db, board, top_n=5)
         
         return {
-            "total_upvotes": total_upvotes,
-            "total_downvotes": total_downvotes,
-            "total_votes": total_votes,
-            "top_content": top_content
+            "total_upvotes": stats["total_upvotes"],
+            "total_downvotes": stats["total_downvotes"],
+            "total_votes": stats["total_upvotes"] + stats["total_downvotes"],
+            "top_content": stats["top_content"]
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting vote stats: {str(e)}")
 
+@router.get("/{board_id}/leaderboard")
+async def get_board_leaderboard(
+    board_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=100),
+    content_type: Optional[str] = Query(None, pattern="^(music|video|visuals)$", description="Rank only one content type"),
+    around_type: Optional[str] = Query(None, pattern="^(music|video|visuals)$", description="Content type of the item to show neighbours for"),
+    around_id: Optional[int] = Query(None, description="Id of the item to show neighbours for"),
+    radius: int = Query(2, ge=1, le=25),
+    db: AsyncSession = Depends(get_db)
+):
+    """Board content ranked by likes across media types, with an optional "around me" window"""
+    if (around_type is None) != (around_id is None):
+        raise HTTPException(status_code=400, detail="around_type and around_id must be given together")
+    etag = await board_cache.board_etag(board_id, request.url.query)
+    if etag and board_cache.etag_matches(request, etag):
+        return board_cache.not_modified(etag)
+    board_cache.set_cache_headers(response, etag)
+    
+    board_res = await db.execute(select(Board).where(Board.id == board_id))
+    board = board_res.scalar_one_or_none()
+    if not board:
+        raise HTTPException(status_code=404, detail="Board not found")
+    
+    ranking = await leaderboard.board_leaderboard(
+        db, board,
+        limit=limit,
+        media_types=[content_type] if content_type else None,
+        around=(around_type, around_id) if around_type else None,
+        radius=radius,
+    )
+    return {
+        "board_id": board_id,
+        "leaderboard": ranking["top"],
+        "around": ranking["around"]
+    }
+
 @router.get("/{board_id}/debug-votes")
 async def debug_votes(board_id: int, db: AsyncSession = Depends(get_db)):
     """Debug endpoint to check all votes for a board"""
@@ -1,6 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from ..brevo_config import send_test_email, send_welcome_email
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..brevo_config import BrevoError, send_transactional, test_email, welcome_email
+from ..config import settings
+from ..database import get_db
+from ..email_outbox import enqueue_email
+from ..models import EmailOutbox
 
 router = APIRouter(prefix="/brevo", tags=["brevo"])
 
@@ -15,62 +22,51 @@ class WelcomeEmailRequest(BaseModel):
 
 @router.post("/test-email")
 async def test_brevo_integration(request: TestEmailRequest):
-    """Test Brevo email integration by sending a test email"""
+    """Test Brevo email integration by sending a test email (directly, not via the outbox)"""
     try:
-        result = send_test_email(request.email)
-        
-        if result["success"]:
-            return {
-                "success": True,
-                "message": "Test email sent successfully",
-                "message_id": result["message_id"]
-            }
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to send test email: {result['error']}"
-            )
-            
-    except Exception as e:
+        message_id = await send_transactional(test_email(request.email))
+    except BrevoError as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error testing Brevo integration: {str(e)}"
+            detail=f"Failed to send test email: {str(e)}"
         )
+    
+    return {
+        "success": True,
+        "message": "Test email sent successfully",
+        "message_id": message_id
+    }
 
 @router.post("/welcome-email")
-async def send_welcome_email_endpoint(request: WelcomeEmailRequest):
-    """Send welcome email to media board purchaser"""
+async def send_welcome_email_endpoint(request: WelcomeEmailRequest, db: AsyncSession = Depends(get_db)):
+    """Queue welcome email to media board purchaser"""
     try:
-        result = send_welcome_email(
+        row = await enqueue_email(db, welcome_email(
             user_email=request.user_email,
             user_name=request.user_name,
             media_board_name=request.media_board_name,
             media_board_slug=request.media_board_slug
-        )
-        
-        if result["success"]:
-            return {
-                "success": True,
-                "message": "Welcome email sent successfully",
-                "message_id": result["message_id"]
-            }
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to send welcome email: {result['error']}"
-            )
-            
+        ))
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error sending welcome email: {str(e)}"
+            detail=f"Error queueing welcome email: {str(e)}"
         )
+    
+    return {
+        "success": True,
+        "message": "Welcome email queued",
+        "outbox_id": row.id
+    }
 
 @router.get("/health")
-async def brevo_health_check():
-    """Health check for Brevo integration"""
+async def brevo_health_check(db: AsyncSession = Depends(get_db)):
+    """Health check for Brevo integration, including the outbox backlog"""
+    result = await db.execute(
+        select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)
+    )
     return {
-        "status": "healthy",
+        "status": "healthy" if settings.brevo_api_key else "not configured",
         "service": "Brevo Email Integration",
-        "message": "Brevo API is configured and ready"
+        "outbox": dict(result.all())
     }
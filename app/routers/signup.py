@@ -1,18 +1,16 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.database import get_db
 from app.models import User, Client, Contest
+from app.rate_limit import rate_limit
+from app.passwords import hash_password_async
+from app.templating import templates
 from app.themes import get_theme_by_name, get_theme_by_keywords, apply_theme_to_campaign
 from datetime import datetime, timedelta
-import hashlib
 import secrets
-from pathlib import Path
 
-# Create templates instance
-templates = Jinja2Templates(directory=str(Path(__file__).parent.parent / "templates"))
 
 router = APIRouter()
 
@@ -23,7 +21,7 @@ async def signup_page(request: Request):
 
 # Removed duplicate pricing route - now handled by main.py
 
-@router.post("/signup/process")
+@router.post("/signup/process", dependencies=[Depends(rate_limit("signup"))])
 async def process_signup(
     request: Request,
     db: AsyncSession = Depends(get_db)
@@ -66,7 +64,7 @@ async def process_signup(
             raise HTTPException(status_code=400, detail="Creator name already taken")
         
         # Create user
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
+        hashed_password = await hash_password_async(password)
         username = f"{first_name.lower()}{last_name.lower()}{datetime.utcnow().strftime('%Y%m%d')}"
         
         # Ensure username is unique
@@ -5,18 +5,18 @@ from typing import Any, Dict, List, Optional
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import Client, Contest, Song, Vote
 from app.dependencies import get_current_board_owner
+from app.templating import templates
+from app.site_stats import get_site_stats
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["songboards"])
-templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("/board-owner-area")
@@ -31,14 +31,35 @@ async def songboards_page(request: Request, db: AsyncSession = Depends(get_db)):
     Shows active contests, pins PayPortPro first, and renders site-wide stats.
     """
     try:
-        # Active contests + clients
+        # Active contests + clients, with song and vote counts for all of them in one query
+        song_counts = (
+            select(Song.contest_id, func.count(Song.id).label("song_count"))
+            .where(Song.contest_id.is_not(None))
+            .group_by(Song.contest_id)
+            .subquery()
+        )
+        vote_counts = (
+            select(Song.contest_id, func.count(Vote.id).label("vote_count"))
+            .select_from(Vote)
+            .join(Song, Song.id == Vote.song_id)
+            .where(Song.contest_id.is_not(None))
+            .group_by(Song.contest_id)
+            .subquery()
+        )
         result = await db.execute(
-            select(Contest, Client)
+            select(
+                Contest,
+                Client,
+                func.coalesce(song_counts.c.song_count, 0),
+                func.coalesce(vote_counts.c.vote_count, 0),
+            )
             .join(Client, Contest.client_id == Client.id)
+            .outerjoin(song_counts, song_counts.c.contest_id == Contest.id)
+            .outerjoin(vote_counts, vote_counts.c.contest_id == Contest.id)
             .where(Contest.is_active.is_(True))
             .order_by(Contest.created_at.desc())
         )
-        contests_with_clients: List[tuple[Contest, Client]] = list(result.all())
+        contests_with_clients: List[tuple[Contest, Client, int, int]] = list(result.all())
 
         # Sort: PayPortPro first, then by created_at
         contests_with_clients.sort(
@@ -46,22 +67,7 @@ async def songboards_page(request: Request, db: AsyncSession = Depends(get_db)):
         )
 
         songboards: List[Dict[str, Any]] = []
-        for contest, client in contests_with_clients:
-            # Song count
-            songs_result = await db.execute(
-                select(func.count(Song.id)).where(Song.contest_id == contest.id)
-            )
-            song_count = songs_result.scalar() or 0
-
-            # Vote count (JOIN instead of IN-subquery)
-            votes_result = await db.execute(
-                select(func.count(Vote.id))
-                .select_from(Vote)
-                .join(Song, Song.id == Vote.song_id)
-                .where(Song.contest_id == contest.id)
-            )
-            vote_count = votes_result.scalar() or 0
-
+        for contest, client, song_count, vote_count in contests_with_clients:
             # Per-client configuration
             if client.slug == "payportpro":
                 songboard_type = "patriotic"
@@ -134,12 +140,11 @@ async def songboards_page(request: Request, db: AsyncSession = Depends(get_db)):
                 # ... add any other demo entries as needed ...
             ]
 
-        # Site-wide stats
+        # Site-wide stats (cached)
         try:
-            total_songs = (await db.execute(select(func.count(Song.id)))).scalar() or 0
-            total_votes = (
-                await db.execute(select(func.count(Vote.id)).select_from(Vote))
-            ).scalar() or 0
+            site = await get_site_stats(db)
+            total_songs = site["total_songs"]
+            total_votes = site["total_votes"]
             total_songboards = len(songboards)
         except Exception as e:
             logger.warning("Stats fallback due to error: %s", e)
@@ -165,8 +170,10 @@ async def songboards_page(request: Request, db: AsyncSession = Depends(get_db)):
         logger.exception("Error loading songboards: %s", e)
         # Try to still show stats
         try:
-            total_songs = (await db.execute(select(func.count(Song.id)))).scalar() or 0
-            total_votes = (await db.execute(select(func.count(Vote.id)))).scalar() or 0
+            await db.rollback()
+            site = await get_site_stats(db)
+            total_songs = site["total_songs"]
+            total_votes = site["total_votes"]
         except Exception:
             total_songs = 0
             total_votes = 0
@@ -15,6 +15,8 @@ from ..models import Song, User, Vote
 from ..schemas import SongCreate, SongResponse, SongApproval
 from ..auth import get_current_admin_user, get_current_user
 from ..config import settings
+from ..rate_limit import rate_limit
+from .. import board_cache
 
 router = APIRouter(prefix="/songs", tags=["songs"])
 
@@ -139,7 +141,7 @@ async def upload_song_logic(
     
     return new_song
 
-@router.post("/upload")
+@router.post("/upload", dependencies=[Depends(rate_limit("upload"))])
 async def upload_song(
     title: str = Form(...),
     artist_name: str = Form(...),
@@ -237,6 +239,7 @@ async def approve_song(
         song.rejection_reason = approval.rejection_reason
     
     await db.commit()
+    await board_cache.bump_content(song.board_id)
     
     return {
         "message": f"Song {'approved' if approval.is_approved else 'rejected'} successfully",
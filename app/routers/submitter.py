@@ -4,7 +4,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import Song, User
 from ..auth import get_current_user
-from .. import templates
+from ..templating import templates
+from ..rate_limit import rate_limit
 from ..routers.songs import upload_song_logic  # Import your upload logic
 
 router = APIRouter(
@@ -16,7 +17,7 @@ router = APIRouter(
 async def upload_form(request: Request):
     return templates.TemplateResponse("submitter/upload.html", {"request": request})
 
-@router.post("/upload", response_class=HTMLResponse)
+@router.post("/upload", response_class=HTMLResponse, dependencies=[Depends(rate_limit("upload"))])
 async def handle_upload_form(
     request: Request,
     title: str = Form(...),
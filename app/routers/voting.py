@@ -2,14 +2,16 @@ from fastapi import APIRouter, Request, Depends, HTTPException, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import hashlib
 import re
 from ..database import get_db
 from ..models import Vote, Song, Video, Visual, Board
 from ..utils import is_disposable_email, verify_recaptcha, is_suspicious_vote
 from ..auth import get_current_user
-from .. import templates
+from ..rate_limit import rate_limit
+from .. import board_cache, board_stats, leaderboard, trending, vote_filter
+from ..templating import templates
 
 router = APIRouter(prefix="/voting", tags=["voting"])
 
@@ -28,7 +30,7 @@ class AnonymousVoteRequest:
         self.voter_name = voter_name
         self.recaptcha_token = recaptcha_token
 
-@router.post("/vote/anonymous")
+@router.post("/vote/anonymous", dependencies=[Depends(rate_limit("vote"))])
 async def cast_anonymous_vote(
     request: Request,
     media_type: str = Form(...),
@@ -63,21 +65,22 @@ async def cast_anonymous_vote(
         if is_suspicious_vote(client_ip, user_agent, recaptcha_score):
             raise HTTPException(status_code=400, detail="Vote rejected due to suspicious activity")
         
-        # Check if user already voted today
+        # Check if user already voted today (the Bloom filter skips the query for first-time voters)
         today = datetime.now().date()
-        existing_vote = await db.execute(
-            select(Vote).where(
-                and_(
-                    Vote.voter_email == voter_email,
-                    Vote.media_type == media_type,
-                    Vote.media_id == media_id,
-                    func.date(Vote.created_at) == today
+        if await vote_filter.might_have_voted(db, voter_email, media_type, media_id, today):
+            existing_vote = await db.execute(
+                select(Vote).where(
+                    and_(
+                        Vote.voter_email == voter_email,
+                        Vote.media_type == media_type,
+                        Vote.media_id == media_id,
+                        func.date(Vote.created_at) == today
+                    )
                 )
             )
-        )
-        
-        if existing_vote.scalar_one_or_none():
-            raise HTTPException(status_code=400, detail="You have already voted on this content today")
+            
+            if existing_vote.scalar_one_or_none():
+                raise HTTPException(status_code=400, detail="You have already voted on this content today")
         
         # Verify the content exists and is approved
         content = None
@@ -88,7 +91,8 @@ async def cast_anonymous_vote(
         elif media_type == "visuals":
             content = await db.execute(select(Visual).where(Visual.id == media_id, Visual.is_approved == True))
         
-        if not content.scalar_one_or_none():
+        content_item = content.scalar_one_or_none() if content is not None else None
+        if not content_item:
             raise HTTPException(status_code=404, detail="Content not found or not approved")
         
         # Generate device fingerprint
@@ -111,9 +115,13 @@ async def cast_anonymous_vote(
             votes_per_email_per_day=1
         )
         
+        # Into the filter before the commit, so it never misses a committed vote
+        await vote_filter.record_vote(voter_email, media_type, media_id, today)
         db.add(new_vote)
         await db.commit()
         await db.refresh(new_vote)
+        await board_cache.bump_tally(content_item.board_id)
+        await trending.record(content_item.board_id, media_type, media_id)
         
         return {
             "success": True,
@@ -134,90 +142,30 @@ async def get_leaderboard(
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Get leaderboard for a specific board
+    Get leaderboard for a specific board. media_type "all" ranks music,
+    videos and visuals together.
     """
+    if media_type not in ("music", "video", "visuals", "all"):
+        raise HTTPException(status_code=400, detail="Invalid media type")
     try:
         # Verify board exists
-        board = await db.execute(select(Board).where(Board.id == board_id))
-        if not board.scalar_one_or_none():
+        board = (await db.execute(select(Board).where(Board.id == board_id))).scalar_one_or_none()
+        if not board:
             raise HTTPException(status_code=404, detail="Board not found")
         
-        # Get content with vote counts
-        if media_type == "music":
-            query = select(
-                Song.id,
-                Song.title,
-                Song.artist_name,
-                Song.file_path,
-                Song.external_link,
-                func.count(Vote.id).label("vote_count")
-            ).select_from(
-                Song.outerjoin(Vote, and_(
-                    Vote.media_type == "music",
-                    Vote.media_id == Song.id
-                ))
-            ).where(
-                Song.board_id == board_id,
-                Song.is_approved == True
-            ).group_by(Song.id).order_by(func.count(Vote.id).desc()).limit(limit)
-        
-        elif media_type == "video":
-            query = select(
-                Video.id,
-                Video.title,
-                Video.artist_name,
-                Video.file_path,
-                Video.external_link,
-                func.count(Vote.id).label("vote_count")
-            ).select_from(
-                Video.outerjoin(Vote, and_(
-                    Vote.media_type == "video",
-                    Vote.media_id == Video.id
-                ))
-            ).where(
-                Video.board_id == board_id,
-                Video.is_approved == True
-            ).group_by(Video.id).order_by(func.count(Vote.id).desc()).limit(limit)
-        
-        elif media_type == "visuals":
-            query = select(
-                Visual.id,
-                Visual.title,
-                Visual.artist_name,
-                Visual.file_path,
-                Visual.external_link,
-                func.count(Vote.id).label("vote_count")
-            ).select_from(
-                Visual.outerjoin(Vote, and_(
-                    Vote.media_type == "visuals",
-                    Vote.media_id == Visual.id
-                ))
-            ).where(
-                Visual.board_id == board_id,
-                Visual.is_approved == True
-            ).group_by(Visual.id).order_by(func.count(Vote.id).desc()).limit(limit)
-        
-        else:
-            raise HTTPException(status_code=400, detail="Invalid media type")
-        
-        result = await db.execute(query)
-        leaderboard = result.fetchall()
+        # Approved content with its likes, ranked in one query
+        ranking = await leaderboard.board_leaderboard(
+            db, board,
+            limit=limit,
+            media_types=None if media_type == "all" else [media_type],
+            approved_only=True,
+        )
         
         return {
             "success": True,
             "board_id": board_id,
             "media_type": media_type,
-            "leaderboard": [
-                {
-                    "id": row.id,
-                    "title": row.title,
-                    "artist_name": row.artist_name,
-                    "file_path": row.file_path,
-                    "external_link": row.external_link,
-                    "vote_count": row.vote_count
-                }
-                for row in leaderboard
-            ]
+            "leaderboard": ranking["top"]
         }
         
     except HTTPException:
@@ -228,47 +176,35 @@ async def get_leaderboard(
 @router.get("/stats/{board_id}")
 async def get_voting_stats(
     board_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Get voting statistics for a board
+    Get voting statistics for a board, optionally for votes cast between
+    start and end (inclusive dates, UTC)
     """
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
     try:
-        # Get total votes
-        total_votes = await db.execute(
-            select(func.count(Vote.id)).where(Vote.media_id.in_(
-                select(Song.id).where(Song.board_id == board_id)
-            ))
-        )
-        
-        # Get unique voters
-        unique_voters = await db.execute(
-            select(func.count(func.distinct(Vote.voter_email))).where(Vote.media_id.in_(
-                select(Song.id).where(Song.board_id == board_id)
-            ))
-        )
+        board = (await db.execute(select(Board).where(Board.id == board_id))).scalar_one_or_none()
+        if not board:
+            raise HTTPException(status_code=404, detail="Board not found")
         
-        # Get votes by country
-        country_stats = await db.execute(
-            select(
-                Vote.country_code,
-                func.count(Vote.id).label("vote_count")
-            ).where(Vote.media_id.in_(
-                select(Song.id).where(Song.board_id == board_id)
-            )).group_by(Vote.country_code).order_by(func.count(Vote.id).desc())
-        )
+        # Totals, unique voters and per-country counts in one scan of the
+        # board's votes, matched on (media_type, media_id)
+        stats = await board_stats.voting_stats(db, board, start=start, end=end)
         
         return {
             "success": True,
             "board_id": board_id,
-            "total_votes": total_votes.scalar(),
-            "unique_voters": unique_voters.scalar(),
-            "votes_by_country": [
-                {"country": row.country_code, "votes": row.vote_count}
-                for row in country_stats.fetchall()
-            ]
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None,
+            **stats
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching stats: {str(e)}")
 
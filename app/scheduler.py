@@ -0,0 +1,70 @@
+"""
+Periodic background jobs.
+
+Jobs are registered in JOBS and run from the app lifespan on every worker.
+Each run opens its own session and first takes a transaction-scoped Postgres
+advisory lock named after the job, so when several workers are due at once
+exactly one does the work and the others skip that round. The job's writes
+are committed together with releasing the lock.
+"""
+import asyncio
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .database import AsyncSessionLocal
+from . import geoip, rollups, vote_archive, vote_partitions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    name: str
+    interval: float  # seconds between runs
+    func: Callable[[AsyncSession], Awaitable[None]]
+    initial_delay: float = 5.0
+
+
+JOBS: List[Job] = [
+    Job("daily_rollups", settings.rollup_interval, rollups.run_rollup_job),
+    Job("geoip", settings.geoip_interval, geoip.run_geoip_job),
+    Job("vote_archive", settings.vote_archive_interval, vote_archive.run_archive_job),
+    Job("vote_partitions", settings.vote_partition_interval, vote_partitions.run_partition_job),
+]
+
+
+def _lock_key(name: str) -> int:
+    # Fits in a signed bigint, as pg_try_advisory_xact_lock expects
+    return zlib.crc32(f"urvote:job:{name}".encode())
+
+
+async def run_once(job: Job) -> bool:
+    """Run a job now unless another worker holds it; True if it ran"""
+    async with AsyncSessionLocal() as db:
+        locked = (await db.execute(select(func.pg_try_advisory_xact_lock(_lock_key(job.name))))).scalar()
+        if not locked:
+            return False
+        await job.func(db)
+        await db.commit()
+        return True
+
+
+async def _run_periodically(job: Job) -> None:
+    await asyncio.sleep(job.initial_delay)
+    while True:
+        try:
+            await run_once(job)
+        except Exception:
+            logger.exception("Scheduled job %s failed", job.name)
+        await asyncio.sleep(job.interval)
+
+
+async def run() -> None:
+    """Run every registered job for the lifetime of the app"""
+    await asyncio.gather(*(_run_periodically(job) for job in JOBS))
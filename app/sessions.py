@@ -0,0 +1,216 @@
+"""
+Server-side sessions.
+
+Starlette's SessionMiddleware keeps the whole session (access token, email,
+OAuth state, ...) in a signed cookie. That cookie is sent with every request,
+including static files and media, and has to be verified every time. Here the
+cookie holds only an opaque random id and the data lives in a backend:
+Redis, or per-process memory when Redis is unavailable. Memory sessions are
+only visible to the worker that wrote them, so they are a degraded mode, not
+a deployment option.
+
+``request.session`` behaves as before. The middleware does no I/O for:
+  * requests without a session cookie (most anonymous traffic),
+  * paths that never use the session (/static, /uploads, /health, ...).
+Otherwise the session is loaded with a single GET, and it is written back
+only if the route modified it.
+
+Logins call ``request.session.regenerate()``: the data moves to a fresh id
+and the old one is deleted, so an id handed out before login (e.g. to hold
+the OAuth state) never becomes an authenticated session.
+"""
+import json
+import logging
+import re
+import secrets
+from typing import Any, Dict, Optional
+
+from redis.exceptions import RedisError
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .cache import TTLCache
+from .config import settings
+from .redis_client import get_redis, mark_redis_down
+
+logger = logging.getLogger(__name__)
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+# Paths that never read or write the session
+SKIP_PREFIXES = ("/static/", "/uploads/", "/health", "/robots.txt", "/sitemap.xml", "/favicon.ico")
+
+# Upper bound on sessions kept by the in-memory fallback
+MAX_LOCAL_SESSIONS = 50_000
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(32)
+
+
+class Session(dict):
+    """A dict that remembers whether it was changed"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.modified = False
+        self.regenerated = False
+
+    def regenerate(self) -> None:
+        """Store the session under a new id when the response is sent"""
+        self.modified = True
+        self.regenerated = True
+
+    def __setitem__(self, key, value):
+        self.modified = True
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.modified = True
+        super().__delitem__(key)
+
+    def clear(self):
+        self.modified = True
+        super().clear()
+
+    def pop(self, *args):
+        self.modified = True
+        return super().pop(*args)
+
+    def popitem(self):
+        self.modified = True
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.modified = True
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self.modified = True
+        super().update(*args, **kwargs)
+
+
+class MemorySessionBackend:
+    """Sessions in this process only"""
+
+    def __init__(self, max_sessions: int = MAX_LOCAL_SESSIONS):
+        self._store = TTLCache(maxsize=max_sessions, ttl=settings.session_max_age)
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = self._store.get(session_id)
+        return None if data is None else json.loads(data)
+
+    async def save(self, session_id: str, data: Dict[str, Any], max_age: int) -> None:
+        self._store.set(session_id, json.dumps(data), ttl=max_age)
+
+    async def delete(self, session_id: str) -> None:
+        self._store.pop(session_id)
+
+
+class RedisSessionBackend:
+    """Sessions in Redis, falling back to memory while Redis is unavailable"""
+
+    prefix = "session:"
+
+    def __init__(self, fallback: Optional[MemorySessionBackend] = None):
+        self.fallback = fallback or MemorySessionBackend()
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        redis = await get_redis()
+        if redis is not None:
+            try:
+                data = await redis.get(self.prefix + session_id)
+                return None if data is None else json.loads(data)
+            except RedisError as e:
+                mark_redis_down(e)
+        return await self.fallback.load(session_id)
+
+    async def save(self, session_id: str, data: Dict[str, Any], max_age: int) -> None:
+        redis = await get_redis()
+        if redis is not None:
+            try:
+                await redis.set(self.prefix + session_id, json.dumps(data), ex=max_age)
+                return
+            except RedisError as e:
+                mark_redis_down(e)
+        await self.fallback.save(session_id, data, max_age)
+
+    async def delete(self, session_id: str) -> None:
+        redis = await get_redis()
+        if redis is not None:
+            try:
+                await redis.delete(self.prefix + session_id)
+            except RedisError as e:
+                mark_redis_down(e)
+        await self.fallback.delete(session_id)
+
+
+def get_session_backend():
+    if settings.session_backend == "memory":
+        return MemorySessionBackend()
+    return RedisSessionBackend()
+
+
+class ServerSessionMiddleware:
+    """Drop-in replacement for SessionMiddleware backed by a session store"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        backend=None,
+        cookie_name: str = "session_id",
+        max_age: int = 14 * 24 * 60 * 60,
+        same_site: str = "lax",
+        https_only: bool = False,
+    ) -> None:
+        self.app = app
+        self.backend = backend or get_session_backend()
+        self.cookie_name = cookie_name
+        self.max_age = max_age
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"].startswith(SKIP_PREFIXES):
+            scope["session"] = Session()
+            await self.app(scope, receive, send)
+            return
+
+        session_id = HTTPConnection(scope).cookies.get(self.cookie_name)
+        data = None
+        if session_id and SESSION_ID_RE.match(session_id):
+            data = await self.backend.load(session_id)
+        if data is None:
+            # Unknown, expired or malformed: a new id is issued if anything is stored
+            session_id = None
+
+        session = Session(data or {})
+        scope["session"] = session
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and session.modified:
+                headers = MutableHeaders(scope=message)
+                sid = session_id
+                if sid and (session.regenerated or not session):
+                    await self.backend.delete(sid)
+                    sid = None
+                if session:
+                    sid = sid or new_session_id()
+                    await self.backend.save(sid, dict(session), self.max_age)
+                    headers.append("Set-Cookie", self._cookie(sid, self.max_age))
+                elif session_id:
+                    headers.append("Set-Cookie", self._cookie("null", 0))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _cookie(self, value: str, max_age: int) -> str:
+        expires = "expires=Thu, 01 Jan 1970 00:00:00 GMT; " if max_age == 0 else ""
+        return f"{self.cookie_name}={value}; path=/; {expires}Max-Age={max_age}; {self.security_flags}"
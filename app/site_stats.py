@@ -0,0 +1,39 @@
+"""
+Cached site-wide totals for public pages.
+
+Exact counts of songs and votes need full scans, and the listings showing
+them don't need to be exact to the second. get_site_stats() fetches both
+in one query and caches them per worker for ``site_stats_ttl`` seconds;
+concurrent misses share one query.
+"""
+import asyncio
+from typing import Dict
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .config import settings
+from .models import Song, Vote, VoteTallyArchive
+
+_cache = TTLCache(maxsize=1, ttl=settings.site_stats_ttl)
+_lock = asyncio.Lock()
+
+
+async def get_site_stats(db: AsyncSession) -> Dict[str, int]:
+    """{"total_songs": ..., "total_votes": ...}"""
+    stats = _cache.get("site")
+    if stats is not None:
+        return stats
+    async with _lock:
+        stats = _cache.get("site")
+        if stats is None:
+            row = (await db.execute(select(
+                select(func.count(Song.id)).scalar_subquery().label("total_songs"),
+                select(func.count(Vote.id)).scalar_subquery().label("total_votes"),
+                # Months of votes retired from the votes table (app/vote_partitions.py)
+                select(func.coalesce(func.sum(VoteTallyArchive.votes), 0)).scalar_subquery().label("archived_votes"),
+            ))).one()
+            stats = {"total_songs": row.total_songs or 0, "total_votes": (row.total_votes or 0) + row.archived_votes}
+            _cache.set("site", stats)
+    return stats
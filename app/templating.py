@@ -0,0 +1,49 @@
+"""
+The one Jinja2 template environment shared by every router.
+
+Each router used to build its own Jinja2Templates, so every worker compiled
+each template separately per instance, lazily, on first hit (board.html
+alone is ~96KB). Now there is a single environment with:
+
+  * a filesystem bytecode cache, so a restarted worker loads compiled code
+    instead of re-parsing templates;
+  * an unbounded template cache, so nothing compiled is ever evicted;
+  * auto_reload only in debug, so production skips the mtime check on every
+    render;
+  * precompile(), run from the app lifespan, which loads every template
+    before the worker takes traffic.
+"""
+import logging
+import time
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+
+templates = Jinja2Templates(
+    directory=str(TEMPLATE_DIR),
+    auto_reload=settings.debug,
+    cache_size=-1,
+    # None means Jinja's per-user temp directory
+    bytecode_cache=FileSystemBytecodeCache(settings.template_bytecode_cache_dir),
+)
+
+
+def precompile() -> int:
+    """Load (and compile, or read from the bytecode cache) every template"""
+    started = time.perf_counter()
+    loaded = 0
+    for name in templates.env.list_templates(extensions=["html", "xml", "txt"]):
+        try:
+            templates.env.get_template(name)
+            loaded += 1
+        except TemplateError as e:
+            logger.error("Template %s failed to compile: %s", name, e)
+    logger.info("Precompiled %d templates in %.0fms", loaded, (time.perf_counter() - started) * 1000)
+    return loaded
@@ -0,0 +1,166 @@
+"""
+Time-decayed trending scores.
+
+Each item's score is its likes, each weighted by exp(-rate * age), so a like
+loses half its weight every ``trending_half_life`` seconds. Scores are kept
+in "forward decay" form: per board there is an epoch, and a like at time t
+adds exp(rate * (t - epoch)) to the stored value. Decaying every stored
+value by the same factor never changes their order, so each vote is one
+ZINCRBY. Reads get current scores by scaling with exp(-rate * (now - epoch)).
+Nothing ever rescans the votes table.
+
+Taking a like back (un-like, or like -> dislike) subtracts the weight it was
+added with, exp(rate * (created_at - epoch)) for the vote's own time, so
+only what is left of that like is removed and other likes are untouched.
+Switching a dislike back to a like counts as a like now.
+
+The stored weights grow with time since the epoch, so a board's scores are
+rebased lazily. Once the epoch is eight half-lives old, the next vote
+folds the elapsed decay into the stored values, drops items that have
+decayed below PRUNE_BELOW and restarts the epoch. Voting and rebasing run in
+one Lua script, so a vote is never weighted against a stale epoch.
+
+Scores live in one Redis sorted set per board (``trending:<board_id>``,
+members "<media_type>:<media_id>") next to its epoch key. Both expire once a
+board has been quiet long enough for every score to have decayed away. When
+Redis is unavailable, votes and reads use a per-worker store with the same
+arithmetic, which only sees this worker's votes until Redis is back.
+
+Scores change with the clock as well as with votes, so responses that
+include them add time_bucket() to their ETag: a cached copy is revalidated
+at least every sixteenth of a half-life (about 6% of decay).
+"""
+import math
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from .config import settings
+from .redis_client import get_redis, mark_redis_down
+
+RATE = math.log(2) / settings.trending_half_life
+REBASE_AFTER = 8 * settings.trending_half_life
+PRUNE_BELOW = 0.01
+KEY_TTL = int(max(86400, 20 * settings.trending_half_life))
+BUCKET_SECONDS = settings.trending_half_life / 16
+
+_RECORD = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[4])
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[2], ARGV[1])
+elseif now - epoch > tonumber(ARGV[5]) then
+    redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', math.exp(-rate * (now - epoch)))
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[6])
+    epoch = now
+    redis.call('SET', KEYS[2], ARGV[1])
+end
+redis.call('ZINCRBY', KEYS[1], tonumber(ARGV[3]) * math.exp(rate * (tonumber(ARGV[8]) - epoch)), ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[7])
+redis.call('EXPIRE', KEYS[2], ARGV[7])
+return 1
+"""
+
+
+class _LocalScores:
+    """One board's scores for when Redis is unavailable"""
+
+    def __init__(self, now: float):
+        self.epoch = now
+        self.stored: Dict[str, float] = {}
+
+    def add(self, member: str, weight: float, now: float, at: float) -> None:
+        if now - self.epoch > REBASE_AFTER:
+            factor = math.exp(-RATE * (now - self.epoch))
+            self.stored = {m: s * factor for m, s in self.stored.items() if s * factor >= PRUNE_BELOW}
+            self.epoch = now
+        self.stored[member] = self.stored.get(member, 0.0) + weight * math.exp(RATE * (at - self.epoch))
+
+
+_local: Dict[int, _LocalScores] = {}
+
+
+def _keys(board_id: int) -> List[str]:
+    return [f"trending:{board_id}", f"trending:{board_id}:epoch"]
+
+
+def _member(media_type: str, media_id: int) -> str:
+    return f"{media_type}:{media_id}"
+
+
+def _parse(member) -> Tuple[str, int]:
+    if isinstance(member, bytes):
+        member = member.decode()
+    media_type, media_id = member.rsplit(":", 1)
+    return media_type, int(media_id)
+
+
+async def record(
+    board_id: Optional[int],
+    media_type: str,
+    media_id: int,
+    likes: float = 1.0,
+    at: Optional[datetime] = None,
+) -> None:
+    """Add (or, with a negative value, take back) likes on an item cast at ``at`` (default now)"""
+    if board_id is None or not likes:
+        return
+    now = time.time()
+    at = min(at.timestamp(), now) if at is not None else now
+    member = _member(media_type, media_id)
+    redis = await get_redis()
+    if redis is not None:
+        try:
+            script = redis.register_script(_RECORD)
+            await script(
+                keys=_keys(board_id),
+                args=[now, member, likes, RATE, REBASE_AFTER, PRUNE_BELOW, KEY_TTL, at],
+            )
+            return
+        except RedisError as e:
+            mark_redis_down(e)
+    scores = _local.get(board_id)
+    if scores is None:
+        scores = _local[board_id] = _LocalScores(now)
+    scores.add(member, likes, now, at)
+
+
+async def scores(board_id: int) -> Dict[Tuple[str, int], float]:
+    """{(media_type, media_id): current score} for the board's scored items"""
+    now = time.time()
+    stored = None
+    epoch = None
+    redis = await get_redis()
+    if redis is not None:
+        zset_key, epoch_key = _keys(board_id)
+        try:
+            pipe = redis.pipeline(transaction=True)
+            pipe.get(epoch_key)
+            pipe.zrange(zset_key, 0, -1, withscores=True)
+            epoch, stored = await pipe.execute()
+            epoch = float(epoch) if epoch is not None else now
+        except RedisError as e:
+            mark_redis_down(e)
+            stored = None
+    if stored is None:
+        local = _local.get(board_id)
+        if local is None:
+            return {}
+        epoch, stored = local.epoch, local.stored.items()
+    decay = math.exp(-RATE * (now - epoch))
+    # A like taken back after it was pruned leaves a tiny negative remainder
+    return {_parse(member): max(0.0, score * decay) for member, score in stored}
+
+
+async def trending_count(board_id: int) -> int:
+    """How many of the board's items score at least ``trending_min_score``"""
+    return sum(1 for score in (await scores(board_id)).values() if score >= settings.trending_min_score)
+
+
+def time_bucket() -> str:
+    """ETag extra for responses with trending data; changes as scores decay"""
+    return f"trending:{int(time.time() // BUCKET_SECONDS)}"
@@ -0,0 +1,93 @@
+"""
+Per-worker cache of authenticated users.
+
+Every authenticated request used to SELECT the user row after decoding the
+token. Users are now cached by (user_id, token iat) for ``user_cache_ttl``
+seconds as plain column snapshots, and handed to routes as detached User
+objects built from them, so the hot path never touches the users table.
+Session-based lookups (/me) use iat=None.
+
+Routes must treat the returned user as read-only; anything that needs to
+change the row should load it through its own session.
+
+Changes that must take effect immediately (deactivation) call
+invalidate_user(), which drops the local entries and publishes the user id on
+a Redis channel; every worker runs listen_for_invalidations() from the app
+lifespan. If that subscription drops, the cache is cleared on reconnect and
+the TTL bounds staleness in the meantime.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .config import settings
+from .models import User
+from .redis_client import get_redis, mark_redis_down, new_pubsub_client
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "user_cache:invalidate"
+
+_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+
+def snapshot(user: User) -> Dict[str, Any]:
+    return {key: getattr(user, key) for key in _COLUMNS}
+
+
+async def get_user(db: AsyncSession, user_id: int, iat: Optional[int] = None) -> Optional[User]:
+    """Return the user as a detached object, from cache when possible"""
+    key = (user_id, iat)
+    data = _cache.get(key) if settings.user_cache_enabled else None
+    if data is None:
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        if user is None:
+            return None
+        data = snapshot(user)
+        if settings.user_cache_enabled:
+            _cache.set(key, data)
+    return User(**data)
+
+
+def forget_user(user_id: int) -> int:
+    """Drop this worker's cached entries for a user"""
+    return _cache.discard_where(lambda key: key[0] == user_id)
+
+
+async def invalidate_user(user_id: int) -> None:
+    """Drop a user from every worker's cache"""
+    forget_user(user_id)
+    redis = await get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.publish(INVALIDATE_CHANNEL, user_id)
+    except RedisError as e:
+        mark_redis_down(e)
+
+
+async def listen_for_invalidations() -> None:
+    """Apply invalidations published by other workers; runs for the app's lifetime"""
+    while settings.user_cache_enabled and settings.redis_enabled:
+        client = new_pubsub_client()
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(INVALIDATE_CHANNEL)
+            # Anything published while we weren't subscribed was missed
+            _cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    forget_user(int(message["data"]))
+        except (RedisError, OSError) as e:
+            logger.warning("User cache invalidation feed lost, clearing cache: %s", e)
+            _cache.clear()
+        finally:
+            await client.aclose()
+        await asyncio.sleep(settings.redis_retry_seconds)
@@ -178,7 +178,8 @@ def generate_jwt_token(user_id: int, email: str, user_type: str) -> str:
         "sub": str(user_id),
         "email": email,
         "user_type": user_type,
-        "exp": expire
+        "exp": expire,
+        "iat": datetime.utcnow()
     }
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
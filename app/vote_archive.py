@@ -0,0 +1,262 @@
+"""
+Columnar archive of closed months of votes, for offline analytics.
+
+Once a UTC month has ended, its votes are streamed out of Postgres through
+a server-side cursor in batches of ``ARCHIVE_BATCH`` rows and written as
+zstd-compressed Parquet, one file per month:
+
+    <vote_archive_path>/month=YYYY-MM/votes.parquet
+
+on local disk or in the Spaces bucket (``vote_archive_storage``). Rows are
+sorted by time, so row-group statistics let scans skip whatever falls
+outside a date filter. The file is written under a temporary name (which
+scans ignore) and moved into place when complete, so a month is either
+fully archived or not at all.
+
+Voters are stored as a keyed hash of their email (or user id), never the
+email itself, and IPs and user agents are left out. That is enough for
+counting and overlap questions without copying PII into a second store.
+
+votes_by_country() and voter_overlap() answer questions over the archive
+with pyarrow's vectorized dataset scans, off the primary database. When
+retention is on (app/vote_partitions.py), a month's raw votes are only
+retired after the month has been archived.
+
+pyarrow is optional. Without it, or with ``vote_archive_enabled`` off, the
+job does nothing and the query functions raise ArchiveUnavailable.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import vote_media
+from .config import settings
+from .models import Vote
+from .vote_partitions import add_months
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH = 50_000
+
+COLUMNS = [
+    ("vote_id", "int64"),
+    ("voted_at", "timestamp"),
+    ("board_id", "int64"),
+    ("media_type", "string"),
+    ("media_id", "int64"),
+    ("vote_type", "string"),
+    ("voter_type", "string"),
+    ("voter", "string"),  # keyed hash of the voter's email or user id
+    ("country", "string"),
+]
+
+
+class ArchiveUnavailable(Exception):
+    """pyarrow isn't installed or the archive is disabled"""
+
+
+def available() -> bool:
+    return pa is not None and settings.vote_archive_enabled
+
+
+def _schema():
+    types = {"int64": pa.int64(), "string": pa.string(), "timestamp": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+
+
+def _filesystem():
+    """(filesystem, root directory) for the configured storage"""
+    if settings.vote_archive_storage == "spaces":
+        fs = pafs.S3FileSystem(
+            access_key=settings.spaces_access_key,
+            secret_key=settings.spaces_secret_key,
+            region=settings.spaces_region,
+            endpoint_override=settings.spaces_endpoint,
+        )
+        return fs, f"{settings.spaces_bucket}/{settings.vote_archive_path.strip('/')}"
+    return pafs.LocalFileSystem(), os.path.abspath(settings.vote_archive_path)
+
+
+def _month_path(root: str, month: date) -> str:
+    return f"{root}/month={month:%Y-%m}/votes.parquet"
+
+
+def _voter_hash(voter: Optional[str]) -> Optional[str]:
+    if voter is None:
+        return None
+    digest = hashlib.blake2b(voter.encode(), key=settings.secret_key.encode()[:64], digest_size=8)
+    return digest.hexdigest()
+
+
+def is_archived(month: date) -> bool:
+    """Whether the month's file exists (blocking; call from a thread)"""
+    fs, root = _filesystem()
+    return fs.get_file_info(_month_path(root, month)).type != pafs.FileType.NotFound
+
+
+def _record_batch(rows, schema):
+    columns = [list(column) for column in zip(*rows)]
+    voter = [name for name, _ in COLUMNS].index("voter")
+    columns[voter] = [_voter_hash(value) for value in columns[voter]]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+async def export_month(db: AsyncSession, month: date) -> int:
+    """Write one month of votes to the archive; returns the number of rows"""
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    next_month = add_months(month, 1)
+    end = datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc)
+    query = (
+        vote_media.join_media(
+            select(
+                Vote.id,
+                Vote.created_at,
+                vote_media.board_id,
+                vote_media.media_type,
+                vote_media.media_id,
+                Vote.vote_type,
+                Vote.voter_type,
+                vote_media.voter_key,
+                Vote.country_code,
+            ).select_from(Vote)
+        )
+        .where(Vote.created_at >= start, Vote.created_at < end)
+        .order_by(Vote.created_at)
+    )
+
+    fs, root = _filesystem()
+    path = _month_path(root, month)
+    # Dataset scans skip names starting with "_", so readers never see a partial file
+    tmp = f"{os.path.dirname(path)}/_votes.parquet.tmp"
+    schema = _schema()
+    await asyncio.to_thread(fs.create_dir, os.path.dirname(path), recursive=True)
+    writer = await asyncio.to_thread(pq.ParquetWriter, tmp, schema, filesystem=fs, compression="zstd")
+    written = 0
+    try:
+        result = await db.stream(query.execution_options(yield_per=ARCHIVE_BATCH))
+        async for rows in result.partitions():
+            batch = _record_batch(rows, schema)
+            await asyncio.to_thread(writer.write_batch, batch)
+            written += len(rows)
+    finally:
+        await asyncio.to_thread(writer.close)
+    await asyncio.to_thread(fs.move, tmp, path)
+    return written
+
+
+async def run_archive_job(db: AsyncSession) -> None:
+    """Scheduler job: archive every ended month that has votes and no file yet"""
+    if not available():
+        return
+    first = (await db.execute(select(func.min(Vote.created_at)))).scalar()
+    if first is None:
+        return
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    month = first.astimezone(timezone.utc).date().replace(day=1)
+    while month < this_month:
+        if not await asyncio.to_thread(is_archived, month):
+            rows = await export_month(db, month)
+            logger.info("Archived %s votes for %s", rows, month.strftime("%Y-%m"))
+        month = add_months(month, 1)
+
+
+def _scan(filter, columns: List[str]):
+    """Read the given columns of matching archived votes (blocking)"""
+    fs, root = _filesystem()
+    if fs.get_file_info(root).type == pafs.FileType.NotFound:
+        return _schema().empty_table().select(columns)
+    dataset = ds.dataset(
+        root,
+        filesystem=fs,
+        format="parquet",
+        schema=_schema().append(pa.field("month", pa.string())),
+        partitioning=ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive"),
+    )
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def _timestamp(day: date):
+    return pa.scalar(datetime(day.year, day.month, day.day, tzinfo=timezone.utc), pa.timestamp("us", tz="UTC"))
+
+
+def _window(start: Optional[date], end: Optional[date]):
+    """Filter on month (skips files) and voted_at (skips row groups) for days in [start, end]"""
+    expr = ds.scalar(True)
+    if start is not None:
+        expr &= (ds.field("month") >= start.strftime("%Y-%m")) & (ds.field("voted_at") >= _timestamp(start))
+    if end is not None:
+        expr &= (ds.field("month") <= end.strftime("%Y-%m")) & (ds.field("voted_at") < _timestamp(end + timedelta(days=1)))
+    return expr
+
+
+def _require_archive() -> None:
+    if not available():
+        raise ArchiveUnavailable("The vote archive needs pyarrow and vote_archive_enabled")
+
+
+async def votes_by_country(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    board_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Archived votes and distinct voters per country, most votes first"""
+    _require_archive()
+
+    def run():
+        expr = _window(start, end)
+        if board_id is not None:
+            expr &= ds.field("board_id") == board_id
+        table = _scan(expr, ["country", "voter"])
+        grouped = table.group_by("country").aggregate([([], "count_all"), ("voter", "count_distinct")])
+        return grouped.sort_by([("count_all", "descending")]).to_pylist()
+
+    rows = await asyncio.to_thread(run)
+    return [
+        {"country": row["country"], "votes": row["count_all"], "unique_voters": row["voter_count_distinct"]}
+        for row in rows
+    ]
+
+
+async def voter_overlap(
+    board_a: int,
+    board_b: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> Dict[str, Any]:
+    """How many archived voters voted on each board, and on both"""
+    _require_archive()
+
+    def run():
+        expr = _window(start, end) & ds.field("board_id").isin([board_a, board_b]) & ds.field("voter").is_valid()
+        table = _scan(expr, ["board_id", "voter"])
+        voters_a = pc.unique(table.filter(pc.equal(table["board_id"], board_a))["voter"])
+        voters_b = pc.unique(table.filter(pc.equal(table["board_id"], board_b))["voter"])
+        both = pc.sum(pc.is_in(voters_a, value_set=voters_b)).as_py() or 0
+        return len(voters_a), len(voters_b), both
+
+    count_a, count_b, both = await asyncio.to_thread(run)
+    either = count_a + count_b - both
+    return {
+        "board_a": {"board_id": board_a, "voters": count_a},
+        "board_b": {"board_id": board_b, "voters": count_b},
+        "voters_on_both": both,
+        "jaccard": round(both / either, 4) if either else 0.0,
+    }
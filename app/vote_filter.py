@@ -0,0 +1,164 @@
+"""
+Daily Bloom filter for the "already voted on this today" check.
+
+Every anonymous vote used to SELECT from votes by (email, media, date) even
+though most voters have never voted on that item. The filter keeps one Redis
+bitmap per day containing (voter, media_type, media_id); if any bit is unset
+the voter definitely hasn't voted today and the SELECT is skipped. A possible
+hit (or any doubt) still falls back to the database, so a false positive only
+costs the query it would have cost anyway.
+
+A day's filter is trusted only once it has been warmed from the votes table
+(one query per day across all workers, guarded by a Redis lock) and its ready
+bit is set; each new vote is added before it is committed, so the filter is
+never behind the table (a vote that then fails to commit only costs a
+SELECT). If Redis loses the key, the ready bit goes with it and the filter is
+rebuilt. When Redis is unavailable the check always returns "maybe" - a
+per-worker filter would miss votes recorded by other workers.
+
+If a vote can't be added, the same request deletes the day's filter before
+committing, so every worker rebuilds it from the table. Only when that fails
+too (or this worker has marked Redis down) can a ready filter miss a
+committed vote: this worker then remembers the day as dirty, stops taking the
+shortcut and deletes the filter once Redis is reachable, but until then other
+workers may let a same-day repeat vote through without the query. A rebuild
+already running when the filter is deleted can likewise miss a vote not yet
+committed. The filter narrows duplicates to these windows; it doesn't rule
+them out.
+"""
+import hashlib
+import logging
+import math
+from datetime import date
+from typing import List, Set
+
+from redis.exceptions import RedisError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .models import Vote
+from .redis_client import get_redis, mark_redis_down
+
+logger = logging.getLogger(__name__)
+
+# Keep yesterday's filter around briefly for requests straddling midnight
+FILTER_TTL = 2 * 86400
+WARM_LOCK_TTL = 60
+
+# Days with a committed vote missing from their filter (this worker only)
+_dirty_days: Set[date] = set()
+
+
+def filter_size(capacity: int, error_rate: float):
+    """Optimal bit count and hash count for the expected number of daily votes"""
+    bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+BLOOM_BITS, BLOOM_HASHES = filter_size(settings.vote_bloom_capacity, settings.vote_bloom_error_rate)
+# Stored in the bitmap itself so an evicted filter is never mistaken for a warm one
+READY_BIT = BLOOM_BITS
+
+
+def bit_offsets(voter: str, media_type: str, media_id: int) -> List[int]:
+    """Bit positions for a vote, via double hashing of one blake2b digest"""
+    digest = hashlib.blake2b(f"{voter}|{media_type}|{media_id}".encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % BLOOM_BITS for i in range(BLOOM_HASHES)]
+
+
+def _key(day: date) -> str:
+    return f"vote_bloom:{day.isoformat()}"
+
+
+async def _set_bits(redis, day: date, members) -> None:
+    key = _key(day)
+    pipe = redis.pipeline(transaction=False)
+    for voter, media_type, media_id in members:
+        for offset in bit_offsets(voter, media_type, media_id):
+            pipe.setbit(key, offset, 1)
+    pipe.expire(key, FILTER_TTL)
+    await pipe.execute()
+
+
+async def _invalidate_dirty(redis) -> None:
+    """Delete the filters of days this worker failed to record a vote for"""
+    if _dirty_days:
+        days = list(_dirty_days)
+        await redis.delete(*(_key(day) for day in days))
+        _dirty_days.difference_update(days)
+        logger.info("Dropped vote filters for %s after a missed update", ", ".join(map(str, days)))
+
+
+async def _warm(redis, db: AsyncSession, day: date) -> None:
+    """Load the day's existing votes into the filter, then set its ready bit"""
+    # Another worker is already warming it; this request just uses the database
+    if not await redis.set(f"{_key(day)}:lock", 1, nx=True, ex=WARM_LOCK_TTL):
+        return
+
+    result = await db.execute(
+        select(Vote.voter_email, Vote.media_type, Vote.media_id).where(
+            Vote.voter_email.isnot(None),
+            func.date(Vote.created_at) == day,
+        ).distinct()
+    )
+    members = result.all()
+    await _set_bits(redis, day, members)
+    await redis.setbit(_key(day), READY_BIT, 1)
+    logger.info("Warmed vote filter for %s with %d entries", day, len(members))
+
+
+async def might_have_voted(
+    db: AsyncSession,
+    voter: str,
+    media_type: str,
+    media_id: int,
+    day: date,
+) -> bool:
+    """
+    False only if the voter definitely hasn't voted on this item today.
+    True means "check the database".
+    """
+    if not settings.vote_bloom_enabled:
+        return True
+    redis = await get_redis()
+    if redis is None:
+        return True
+    try:
+        await _invalidate_dirty(redis)
+        key = _key(day)
+        pipe = redis.pipeline(transaction=False)
+        pipe.getbit(key, READY_BIT)
+        for offset in bit_offsets(voter, media_type, media_id):
+            pipe.getbit(key, offset)
+        ready, *bits = await pipe.execute()
+        if ready:
+            return all(bits)
+        await _warm(redis, db, day)
+        return True
+    except RedisError as e:
+        mark_redis_down(e)
+        return True
+
+
+async def record_vote(voter: str, media_type: str, media_id: int, day: date) -> None:
+    """Add a vote to the day's filter; call before committing it"""
+    if not settings.vote_bloom_enabled:
+        return
+    redis = await get_redis()
+    if redis is None:
+        _dirty_days.add(day)
+        return
+    try:
+        await _invalidate_dirty(redis)
+        await _set_bits(redis, day, [(voter, media_type, media_id)])
+    except RedisError as e:
+        mark_redis_down(e)
+        # Don't leave other workers a ready filter that is missing this vote
+        try:
+            await redis.delete(_key(day))
+        except RedisError:
+            _dirty_days.add(day)
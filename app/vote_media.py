@@ -0,0 +1,27 @@
+"""
+Column expressions for the media a vote is for.
+
+Votes point at their content generically (media_type, media_id); older
+votes only have song_id. join_media() outer-joins the three content tables
+so board_id resolves in the same query, without a lookup per vote.
+"""
+from sqlalchemy import String, and_, cast, func
+
+from .models import Song, Video, Visual, Vote
+
+media_type = func.coalesce(Vote.media_type, "music")
+media_id = func.coalesce(Vote.media_id, Vote.song_id)
+# 0 when the content has no board or no longer exists
+board_id = func.coalesce(Song.board_id, Video.board_id, Visual.board_id, 0)
+# A voter is their email, or their user id when no email was given
+voter_key = func.coalesce(Vote.voter_email, cast(Vote.voter_id, String))
+
+
+def join_media(query):
+    """Outer-join Song, Video and Visual to a query selecting from Vote"""
+    return (
+        query
+        .outerjoin(Song, and_(media_type == "music", Song.id == media_id))
+        .outerjoin(Video, and_(media_type == "video", Video.id == media_id))
+        .outerjoin(Visual, and_(media_type == "visuals", Visual.id == media_id))
+    )
@@ -0,0 +1,195 @@
+"""
+Monthly partitions of the votes table.
+
+In Postgres, votes is range-partitioned on created_at: one partition per UTC
+month named votes_pYYYYMM, plus votes_default to catch anything outside
+them (the table is converted by the partition_votes migration). Queries
+bounded by time only read the months they cover.
+
+The scheduler keeps ``vote_partitions_ahead`` months of partitions created
+in advance. If it ever fell behind, a month's votes may already be in
+votes_default, and Postgres refuses to create the month's partition while
+they are. The default partition is then detached, the partition created,
+those votes moved into it and the default reattached, in one transaction.
+A month that still can't be created is logged and skipped. When ``vote_retention_months`` is set, months older than that
+are retired. Each month's per-item tallies are first added to
+vote_tally_archive. Then the partition is detached and dropped in the same
+transaction, so the archive and the raw votes never both hold, or both miss,
+a month. With the columnar archive enabled (app/vote_archive.py), a month
+is only retired once its Parquet file exists. Dropping a partition is a
+metadata operation rather than a DELETE of every row. The IP addresses,
+user agents, emails and GeoIP fields go with it.
+
+Tallies (board_stats, leaderboards, site stats) add the archive to the live
+votes. Per-voter and per-country statistics only cover votes still retained.
+
+On a database where votes isn't partitioned (e.g. created by create_all)
+the job does nothing.
+"""
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import List
+
+from sqlalchemy import Date, func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import vote_media
+from .config import settings
+from .models import Vote, VoteTallyArchive
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"^votes_p(\d{4})(\d{2})$")
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _start(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: date) -> str:
+    return f"votes_p{month:%Y%m}"
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    result = await db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('votes'))"
+    ))
+    return bool(result.scalar())
+
+
+async def partition_months(db: AsyncSession) -> List[date]:
+    """Months that currently have a partition, oldest first"""
+    result = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('votes')"
+    ))
+    months = []
+    for name in result.scalars():
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+async def _create_partition(db: AsyncSession, month: date) -> None:
+    """Create a month's partition, moving any of its votes out of votes_default first"""
+    # Names and bounds come from dates, never from input
+    name = partition_name(month)
+    bounds = {"start": _start(month), "end": _start(add_months(month, 1))}
+    create = text(
+        f"CREATE TABLE {name} PARTITION OF votes "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+    )
+    has_default = (await db.execute(text("SELECT to_regclass('votes_default') IS NOT NULL"))).scalar()
+    misplaced = 0
+    if has_default:
+        misplaced = (await db.execute(text(
+            "SELECT count(*) FROM votes_default WHERE created_at >= :start AND created_at < :end"
+        ), bounds)).scalar()
+    if not misplaced:
+        await db.execute(create)
+        return
+
+    logger.warning("Moving %s votes for %s out of votes_default", misplaced, month.isoformat())
+    # Votes is locked until commit; don't queue behind long readers
+    await db.execute(text("SET LOCAL lock_timeout = '5s'"))
+    await db.execute(text("ALTER TABLE votes DETACH PARTITION votes_default"))
+    await db.execute(create)
+    await db.execute(text(
+        f"INSERT INTO {name} SELECT * FROM votes_default WHERE created_at >= :start AND created_at < :end"
+    ), bounds)
+    await db.execute(text("DELETE FROM votes_default WHERE created_at >= :start AND created_at < :end"), bounds)
+    await db.execute(text("ALTER TABLE votes ATTACH PARTITION votes_default DEFAULT"))
+
+
+async def create_partitions(db: AsyncSession, months_ahead: int) -> List[date]:
+    """Create any missing partitions from this month to ``months_ahead`` ahead"""
+    existing = set(await partition_months(db))
+    month = datetime.now(timezone.utc).date().replace(day=1)
+    created = []
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            try:
+                async with db.begin_nested():
+                    await _create_partition(db, month)
+                created.append(month)
+            except DBAPIError as e:
+                logger.error("Could not create vote partition for %s: %s", month.isoformat(), e)
+        month = add_months(month, 1)
+    return created
+
+
+async def archive_month(db: AsyncSession, month: date) -> None:
+    """Add a month's per-item vote counts to vote_tally_archive (idempotent)"""
+    tallies = (
+        select(
+            literal(month, Date),
+            vote_media.media_type,
+            vote_media.media_id,
+            func.count(),
+            func.count().filter(Vote.vote_type == "like"),
+            func.count().filter(Vote.vote_type == "dislike"),
+        )
+        .where(
+            Vote.created_at >= _start(month),
+            Vote.created_at < _start(add_months(month, 1)),
+            vote_media.media_id.isnot(None),
+        )
+        .group_by(vote_media.media_type, vote_media.media_id)
+    )
+    stmt = insert(VoteTallyArchive).from_select(
+        ["month", "media_type", "media_id", "votes", "likes", "dislikes"], tallies
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["month", "media_type", "media_id"],
+        set_={
+            "votes": stmt.excluded.votes,
+            "likes": stmt.excluded.likes,
+            "dislikes": stmt.excluded.dislikes,
+            "archived_at": func.now(),
+        },
+    ))
+
+
+async def retire_partitions(db: AsyncSession, retention_months: int) -> List[date]:
+    """Archive, detach and drop partitions entirely older than the retention window"""
+    cutoff = add_months(datetime.now(timezone.utc).date().replace(day=1), -retention_months)
+    retired = []
+    # Imported here: vote_archive uses this module's month helpers
+    from . import vote_archive
+
+    for month in await partition_months(db):
+        if month >= cutoff:
+            break
+        if vote_archive.available() and not await asyncio.to_thread(vote_archive.is_archived, month):
+            logger.info("Keeping vote partition %s until it has been archived", month.isoformat())
+            break
+        await archive_month(db, month)
+        # DETACH needs a brief exclusive lock on votes; don't queue behind long readers
+        await db.execute(text("SET LOCAL lock_timeout = '5s'"))
+        await db.execute(text(f"ALTER TABLE votes DETACH PARTITION {partition_name(month)}"))
+        await db.execute(text(f"DROP TABLE {partition_name(month)}"))
+        retired.append(month)
+    return retired
+
+
+async def run_partition_job(db: AsyncSession) -> None:
+    """Scheduler job: create upcoming partitions and retire expired ones"""
+    if not await is_partitioned(db):
+        return
+    created = await create_partitions(db, settings.vote_partitions_ahead)
+    if created:
+        logger.info("Created vote partitions for %s", ", ".join(m.isoformat() for m in created))
+    if settings.vote_retention_months > 0:
+        retired = await retire_partitions(db, settings.vote_retention_months)
+        if retired:
+            logger.info("Retired vote partitions for %s", ", ".join(m.isoformat() for m in retired))
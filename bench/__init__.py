@@ -0,0 +1,18 @@
+"""
+Benchmark and load-test harness.
+
+    python -m bench generate --boards 50 --media 5000 --votes 1000000
+    python -m bench run                      # every scenario, in-process
+    python -m bench run board_views --serve  # through a local uvicorn
+    python -m bench run --base-url http://127.0.0.1:8000
+    python -m bench reset
+
+``generate`` bulk-loads a synthetic dataset with COPY into the database in
+``DATABASE_URL`` (see bench/generate.py). ``run`` drives the scenarios in
+bench/scenarios.py and reports latency percentiles and SQL queries per
+request; ``--json`` writes the report and ``--baseline`` compares against an
+earlier one, exiting non-zero on a regression so it can gate changes.
+
+Everything runs against a local Postgres with no network access: Brevo, Google
+and reCAPTCHA are never called by the scenarios.
+"""
@@ -0,0 +1,83 @@
+"""Command line entry point: python -m bench {generate,run,reset}"""
+import argparse
+import asyncio
+import sys
+
+from .generate import generate, reset
+from .runner import compare, format_report, run, write_json
+from .scenarios import SCENARIOS
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="UrVote benchmark harness")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="bulk-load a synthetic dataset")
+    gen.add_argument("--boards", type=int, default=20)
+    gen.add_argument("--media", type=int, default=2000, help="media items across all boards")
+    gen.add_argument("--votes", type=int, default=200_000)
+    gen.add_argument("--users", type=int, default=1000)
+    gen.add_argument("--days", type=int, default=30, help="spread votes over this many days")
+    gen.add_argument("--seed", type=int, default=1)
+
+    bench = commands.add_parser("run", help="run scenarios and report latency and queries")
+    bench.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    bench.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    bench.add_argument("--concurrency", type=int, default=20)
+    bench.add_argument("--warmup", type=int, default=20)
+    bench.add_argument("--upload-bytes", type=int, default=256 * 1024)
+    bench.add_argument("--seed", type=int, default=1)
+    target = bench.add_mutually_exclusive_group()
+    target.add_argument("--serve", action="store_true", help="run the app under uvicorn in this process")
+    target.add_argument("--base-url", help="benchmark an already running server")
+    bench.add_argument("--json", help="write the report to this file")
+    bench.add_argument("--baseline", help="compare with an earlier --json report")
+    bench.add_argument("--max-regression", type=float, default=0.2,
+                       help="allowed relative increase in p95/p99/queries (default 0.2)")
+
+    commands.add_parser("reset", help="delete all generated data")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        counts = asyncio.run(generate(
+            boards=args.boards, media=args.media, votes=args.votes,
+            users=args.users, days=args.days, seed=args.seed,
+        ))
+        print("Loaded " + ", ".join(f"{n} {table}" for table, n in counts.items()))
+        return 0
+
+    if args.command == "reset":
+        counts = asyncio.run(reset())
+        print("Deleted " + ", ".join(f"{n} {table}" for table, n in counts.items()))
+        return 0
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(
+        args.scenarios or list(SCENARIOS),
+        requests=args.requests,
+        concurrency=args.concurrency,
+        warmup=args.warmup,
+        serve=args.serve,
+        base_url=args.base_url,
+        upload_bytes=args.upload_bytes,
+        seed=args.seed,
+    ))
+    print(format_report(results))
+    if args.json:
+        write_json(results, args.json)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions:")
+            print("\n".join(f"  {line}" for line in regressions))
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
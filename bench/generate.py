@@ -0,0 +1,249 @@
+"""
+Synthetic dataset generator.
+
+Loads users, boards, media and votes with asyncpg's COPY support, which is
+orders of magnitude faster than ORM inserts at millions of rows. Ids come
+from the tables' own sequences, so generated data can live alongside real
+rows; everything generated is tagged (``bench-`` board slugs, ``@bench.example``
+emails) so ``reset`` can remove exactly that.
+
+Shapes follow production rather than uniform noise: a few boards hold most of
+the media, a few items get most of the votes (Pareto), voters vote several
+times, and votes are spread over the last ``days`` days.
+"""
+import hashlib
+import os
+import random
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Tuple
+
+import asyncpg
+
+from app.config import settings
+
+EMAIL_DOMAIN = "bench.example"
+SLUG_PREFIX = "bench-"
+
+MEDIA_TABLES = {"music": "songs", "video": "videos", "visuals": "visuals"}
+# Share of generated media per type
+MEDIA_MIX = (("music", 0.6), ("video", 0.2), ("visuals", 0.2))
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Mobile Safari/537.36",
+]
+COUNTRIES = ["US", "US", "US", "GB", "CA", "DE", "BR", "IN", "AU", "FR"]
+GENRES = ["Pop", "Hip Hop", "Electronic", "Rock", "Indie", "R&B", "Country", "Jazz"]
+WORDS = [
+    "Electric", "Dreams", "Binary", "Love", "Neural", "Nights", "Quantum", "Groove",
+    "Digital", "Sunrise", "Pixel", "Soul", "Synth", "Sky", "Midnight", "Drive",
+]
+
+COPY_CHUNK = 50_000
+
+
+def dsn() -> str:
+    """asyncpg DSN for the app's database URL"""
+    return settings.database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.sample(WORDS, 2))
+
+
+def skewed_index(rng: random.Random, n: int, alpha: float = 1.16) -> int:
+    """Index in [0, n) where low indexes are much more likely (80/20 at the default alpha)"""
+    return min(int(rng.paretovariate(alpha)) - 1, n - 1)
+
+
+async def _copy(conn: asyncpg.Connection, table: str, columns: List[str], records: Iterator[tuple]) -> int:
+    """COPY records into a table in chunks; returns the row count"""
+    total = 0
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= COPY_CHUNK:
+            await conn.copy_records_to_table(table, records=chunk, columns=columns)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        await conn.copy_records_to_table(table, records=chunk, columns=columns)
+        total += len(chunk)
+    return total
+
+
+async def _load_users(conn, rng, count: int, run_tag: str) -> List[int]:
+    # Not a usable password hash: generated users exist to own boards and votes
+    hashed = "!bench"
+    now = datetime.now(timezone.utc)
+    records = (
+        (f"user{run_tag}{i}@{EMAIL_DOMAIN}", f"bench{run_tag}{i}", hashed, True, False, False,
+         True, False, "voter", now - timedelta(days=rng.randint(0, 365)))
+        for i in range(count)
+    )
+    await _copy(conn, "users", [
+        "email", "username", "hashed_password", "is_active", "is_admin", "email_verified",
+        "is_voter", "is_contestant", "user_type", "created_at",
+    ], records)
+    rows = await conn.fetch("SELECT id FROM users WHERE email LIKE $1", f"user{run_tag}%@{EMAIL_DOMAIN}")
+    return [row["id"] for row in rows]
+
+
+async def _load_boards(conn, rng, count: int, run_tag: str, user_ids: List[int]) -> List[int]:
+    records = (
+        (f"{SLUG_PREFIX}{run_tag}-{i}", f"Bench Board {i}", "Generated benchmark board",
+         rng.choice(user_ids) if user_ids else None,
+         True, True, True, 100, 50, 100, False, True)
+        for i in range(count)
+    )
+    await _copy(conn, "boards", [
+        "slug", "title", "description", "user_id",
+        "allow_music", "allow_video", "allow_visuals",
+        "max_music_uploads", "max_video_uploads", "max_visuals_uploads",
+        "require_approval", "allow_anonymous_uploads",
+    ], records)
+    rows = await conn.fetch(
+        "SELECT id FROM boards WHERE slug LIKE $1 ORDER BY id", f"{SLUG_PREFIX}{run_tag}-%"
+    )
+    return [row["id"] for row in rows]
+
+
+def _media_records(rng, media_type: str, count: int, board_ids: List[int], user_ids: List[int], days: int):
+    now = datetime.now(timezone.utc)
+    for _ in range(count):
+        board_id = board_ids[skewed_index(rng, len(board_ids))]
+        owner = rng.choice(user_ids) if user_ids else None
+        created = now - timedelta(seconds=rng.randint(0, days * 86400))
+        digest = hashlib.sha256(rng.randbytes(16)).hexdigest()
+        if media_type == "music":
+            yield (_title(rng), f"Artist {rng.randint(1, 5000)}", rng.choice(GENRES),
+                   f"uploads/music/bench/{digest[:16]}.mp3", rng.randint(2, 12) * 1_000_000, digest,
+                   "upload", True, False, "stream_only", board_id, owner, owner, owner, created, created)
+        else:
+            yield (_title(rng), f"Artist {rng.randint(1, 5000)}",
+                   f"uploads/{media_type}/bench/{digest[:16]}", rng.randint(1, 50) * 1_000_000, digest,
+                   "upload", True, False, board_id, owner, owner, owner, created, created)
+
+
+MEDIA_COLUMNS = {
+    "music": [
+        "title", "artist_name", "genre", "file_path", "file_size", "file_hash", "content_source",
+        "is_approved", "is_rejected", "license_type", "board_id", "artist_id", "board_owner_id",
+        "uploader_id", "created_at", "approved_at",
+    ],
+    "other": [
+        "title", "artist_name", "file_path", "file_size", "file_hash", "content_source",
+        "is_approved", "is_rejected", "board_id", "artist_id", "board_owner_id", "uploader_id",
+        "created_at", "approved_at",
+    ],
+}
+
+
+async def _load_media(conn, rng, count: int, board_ids, user_ids, days) -> List[Tuple[str, int]]:
+    media = []
+    for media_type, share in MEDIA_MIX:
+        n = max(1, int(count * share))
+        table = MEDIA_TABLES[media_type]
+        columns = MEDIA_COLUMNS["music" if media_type == "music" else "other"]
+        await _copy(conn, table, columns, _media_records(rng, media_type, n, board_ids, user_ids, days))
+        rows = await conn.fetch(f"SELECT id FROM {table} WHERE board_id = ANY($1::bigint[])", board_ids)
+        media.extend((media_type, row["id"]) for row in rows)
+    # Shuffle so popularity (position) is independent of type and board
+    rng.shuffle(media)
+    return media
+
+
+def _vote_records(rng, count: int, media, user_ids, days: int, run_tag: str):
+    now = datetime.now(timezone.utc)
+    voters = max(1, count // 3)
+    ips = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(max(1, voters // 2))]
+    for _ in range(count):
+        media_type, media_id = media[skewed_index(rng, len(media))]
+        voter = rng.randrange(voters)
+        ip = ips[voter % len(ips)]
+        agent = USER_AGENTS[voter % len(USER_AGENTS)]
+        fingerprint = hashlib.sha256(f"{ip}{agent}".encode()).hexdigest()[:32]
+        voter_id = None
+        voter_type = "anonymous"
+        if user_ids and voter % 5 == 0:
+            voter_id = user_ids[voter % len(user_ids)]
+            voter_type = "authenticated"
+        yield (
+            media_id if media_type == "music" else None, voter_id, voter_type,
+            f"voter{run_tag}{voter}@{EMAIL_DOMAIN}", None, media_type, media_id, "like",
+            ip, agent, fingerprint, f"{rng.uniform(0.5, 1.0):.1f}", 1,
+            COUNTRIES[voter % len(COUNTRIES)],
+            now - timedelta(seconds=rng.randint(0, days * 86400)),
+        )
+
+
+async def _load_votes(conn, rng, count: int, media, user_ids, days: int, run_tag: str) -> int:
+    return await _copy(conn, "votes", [
+        "song_id", "voter_id", "voter_type", "voter_email", "voter_name", "media_type", "media_id",
+        "vote_type", "ip_address", "user_agent", "device_fingerprint", "recaptcha_score",
+        "votes_per_email_per_day", "country_code", "created_at",
+    ], _vote_records(rng, count, media, user_ids, days, run_tag))
+
+
+async def generate(
+    boards: int = 20,
+    media: int = 2000,
+    votes: int = 200_000,
+    users: int = 1000,
+    days: int = 30,
+    seed: int = 1,
+) -> Dict[str, int]:
+    """Load one synthetic dataset; returns row counts per table"""
+    rng = random.Random(seed)
+    # Unique per run, so repeated runs never collide on unique columns
+    run_tag = format(int(time.time()), "x")
+    conn = await asyncpg.connect(dsn())
+    try:
+        async with conn.transaction():
+            user_ids = await _load_users(conn, rng, users, run_tag)
+            board_ids = await _load_boards(conn, rng, boards, run_tag, user_ids)
+            media_items = await _load_media(conn, rng, media, board_ids, user_ids, days)
+            vote_count = await _load_votes(conn, rng, votes, media_items, user_ids, days, run_tag)
+        # Fresh statistics, or the planner benchmarks a plan production would never use
+        await conn.execute("ANALYZE users, boards, songs, videos, visuals, votes")
+    finally:
+        await conn.close()
+    return {"users": len(user_ids), "boards": len(board_ids), "media": len(media_items), "votes": vote_count}
+
+
+async def reset() -> Dict[str, int]:
+    """Delete every generated row (and uploaded file); returns row counts per table"""
+    conn = await asyncpg.connect(dsn())
+    deleted = {}
+    boards = []
+    try:
+        async with conn.transaction():
+            boards = await conn.fetch("SELECT id, slug FROM boards WHERE slug LIKE $1", f"{SLUG_PREFIX}%")
+            board_ids = [row["id"] for row in boards]
+            user_ids = [row["id"] for row in await conn.fetch(
+                "SELECT id FROM users WHERE email LIKE $1", f"%@{EMAIL_DOMAIN}"
+            )]
+            status = await conn.execute(
+                "DELETE FROM votes WHERE voter_email LIKE $1 OR voter_id = ANY($2::int[])"
+                " OR song_id IN (SELECT id FROM songs WHERE board_id = ANY($3::bigint[]))",
+                f"%@{EMAIL_DOMAIN}", user_ids, board_ids,
+            )
+            deleted["votes"] = int(status.split()[-1])
+            for table in MEDIA_TABLES.values():
+                status = await conn.execute(f"DELETE FROM {table} WHERE board_id = ANY($1::bigint[])", board_ids)
+                deleted[table] = int(status.split()[-1])
+            status = await conn.execute("DELETE FROM boards WHERE id = ANY($1::bigint[])", board_ids)
+            deleted["boards"] = int(status.split()[-1])
+            status = await conn.execute("DELETE FROM users WHERE id = ANY($1::int[])", user_ids)
+            deleted["users"] = int(status.split()[-1])
+    finally:
+        await conn.close()
+    # Files written by the upload scenario
+    for row in boards:
+        for media_type in MEDIA_TABLES:
+            shutil.rmtree(os.path.join("uploads", media_type, row["slug"]), ignore_errors=True)
+    return deleted
@@ -0,0 +1,62 @@
+"""
+Per-request SQL query counting.
+
+An engine event increments a counter held in a context variable;
+QueryCountMiddleware sets a fresh counter for each request and reports it in
+the ``X-Query-Count`` response header. Context variables follow the request
+through Starlette middleware tasks and SQLAlchemy's greenlets, so concurrent
+requests never share a count.
+
+Counts are taken when the response starts, which is after all queries for
+everything but streaming responses.
+"""
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+HEADER = b"x-query-count"
+
+_counter: ContextVar[Optional[List[int]]] = ContextVar("bench_query_counter", default=None)
+_installed = set()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def install(engine) -> None:
+    """Start counting queries on an (async) engine"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if id(sync_engine) not in _installed:
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        _installed.add(id(sync_engine))
+
+
+class QueryCountMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # A mutable cell, so increments made in copied contexts are still seen here
+        counter = [0]
+        token = _counter.set(counter)
+
+        async def send_with_count(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((HEADER, str(counter[0]).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _counter.reset(token)
@@ -0,0 +1,216 @@
+"""
+Scenario runner and report.
+
+Three ways to reach the app:
+
+  * in-process (default) - httpx's ASGITransport calls the app directly, with
+    its lifespan running; no sockets, lowest noise;
+  * serve                - the same app behind uvicorn on a local port, in
+    this process, so HTTP parsing and the socket are included;
+  * base_url             - an already running server. Queries per request
+    are only reported when that server counts them (see querycount.py).
+
+In the first two modes rate limiting is switched off (the scenarios are
+floods by design) and the app is wrapped in QueryCountMiddleware.
+"""
+import asyncio
+import json
+import random
+import socket
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.config import settings
+from app.database import engine
+
+from . import querycount
+from .scenarios import SCENARIOS, Dataset, load_dataset
+
+# Gated metrics and whether higher is worse
+GATED = {"p95_ms": True, "p99_ms": True, "queries_per_request": True}
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    requests: int
+    errors: int
+    seconds: float
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    queries_per_request: Optional[float]
+    max_queries: Optional[int]
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    data: Dataset,
+    requests: int,
+    concurrency: int,
+    seed: int = 1,
+) -> ScenarioResult:
+    scenario = SCENARIOS[name]
+    latencies: List[float] = []
+    queries: List[int] = []
+    statuses: Dict[int, int] = {}
+    errors = 0
+    remaining = requests
+
+    async def worker(worker_id: int) -> None:
+        nonlocal remaining, errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await scenario(client, data, rng)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code >= 400:
+                errors += 1
+            count = response.headers.get(querycount.HEADER.decode())
+            if count is not None:
+                queries.append(int(count))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return ScenarioResult(
+        scenario=name,
+        requests=requests,
+        errors=errors,
+        seconds=round(seconds, 3),
+        rps=round(requests / seconds, 1) if seconds else 0.0,
+        p50_ms=round(percentile(latencies, 50), 2),
+        p95_ms=round(percentile(latencies, 95), 2),
+        p99_ms=round(percentile(latencies, 99), 2),
+        max_ms=round(latencies[-1], 2) if latencies else 0.0,
+        queries_per_request=round(sum(queries) / len(queries), 2) if queries else None,
+        max_queries=max(queries) if queries else None,
+        statuses=statuses,
+    )
+
+
+def _prepare_app():
+    """The app wrapped for benchmarking: query counting on, rate limits off"""
+    from app.main import app
+
+    settings.rate_limit_enabled = False
+    querycount.install(engine)
+    return app, querycount.QueryCountMiddleware(app)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(
+    names: List[str],
+    requests: int = 500,
+    concurrency: int = 20,
+    warmup: int = 20,
+    serve: bool = False,
+    base_url: Optional[str] = None,
+    upload_bytes: int = 256 * 1024,
+    seed: int = 1,
+) -> List[ScenarioResult]:
+    data = await load_dataset()
+    data.upload_bytes = upload_bytes
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(60.0)
+
+    async def run_all(client: httpx.AsyncClient) -> List[ScenarioResult]:
+        results = []
+        for name in names:
+            if warmup:
+                await run_scenario(client, name, data, warmup, min(concurrency, warmup), seed=seed + 1)
+            results.append(await run_scenario(client, name, data, requests, concurrency, seed=seed))
+        return results
+
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            return await run_all(client)
+
+    app, wrapped = _prepare_app()
+    if not serve:
+        transport = httpx.ASGITransport(app=wrapped)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+                return await run_all(client)
+
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(wrapped, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    async with app.router.lifespan_context(app):
+        serve_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout) as client:
+                return await run_all(client)
+        finally:
+            server.should_exit = True
+            await serve_task
+
+
+def format_report(results: List[ScenarioResult]) -> str:
+    header = f"{'scenario':<22}{'reqs':>7}{'errs':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>8}{'q max':>7}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        qpr = f"{r.queries_per_request:.1f}" if r.queries_per_request is not None else "-"
+        qmax = str(r.max_queries) if r.max_queries is not None else "-"
+        lines.append(
+            f"{r.scenario:<22}{r.requests:>7}{r.errors:>6}{r.rps:>9.1f}"
+            f"{r.p50_ms:>9.1f}{r.p95_ms:>9.1f}{r.p99_ms:>9.1f}{qpr:>8}{qmax:>7}"
+        )
+    return "\n".join(lines)
+
+
+def write_json(results: List[ScenarioResult], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump({"results": [asdict(r) for r in results]}, f, indent=2)
+
+
+def compare(results: List[ScenarioResult], baseline_path: str, max_regression: float) -> List[str]:
+    """Regressions against a baseline report, as human-readable lines"""
+    with open(baseline_path) as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get(result.scenario)
+        if before is None:
+            continue
+        for metric in GATED:
+            old, new = before.get(metric), getattr(result, metric)
+            if old is None or new is None or old <= 0:
+                continue
+            change = (new - old) / old
+            if change > max_regression:
+                regressions.append(
+                    f"{result.scenario}: {metric} {old} -> {new} (+{change:.0%}, limit {max_regression:.0%})"
+                )
+    return regressions
@@ -0,0 +1,119 @@
+"""
+Benchmark scenarios.
+
+Each scenario is a coroutine making ONE request against the app; the runner
+calls it repeatedly from concurrent workers and times every call. Traffic is
+skewed like production: a few hot boards and items get most of it.
+
+  * board_views          - anonymous board pages and the board content API;
+  * vote_storm           - anonymous votes from new voters on hot items;
+  * leaderboard_polling  - clients polling leaderboards and vote stats,
+                           replaying ETags the way browsers do;
+  * concurrent_uploads   - music uploads with a real file body.
+"""
+import random
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models import Board, Song, Video, Visual
+
+from .generate import EMAIL_DOMAIN, SLUG_PREFIX, USER_AGENTS, skewed_index
+
+
+@dataclass
+class Dataset:
+    """Generated boards and media the scenarios pick targets from"""
+    boards: List[Tuple[int, str]]  # (id, slug), hottest first
+    media: List[Tuple[str, int, int]]  # (media_type, id, board_id)
+    etags: Dict[str, str] = field(default_factory=dict)
+    upload_bytes: int = 256 * 1024
+
+    def board(self, rng: random.Random) -> Tuple[int, str]:
+        return self.boards[skewed_index(rng, len(self.boards))]
+
+    def item(self, rng: random.Random) -> Tuple[str, int, int]:
+        return self.media[skewed_index(rng, len(self.media))]
+
+
+async def load_dataset(max_boards: int = 200, max_media: int = 10_000) -> Dataset:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Board.id, Board.slug)
+            .where(Board.slug.like(f"{SLUG_PREFIX}%"))
+            .order_by(Board.id)
+            .limit(max_boards)
+        )
+        boards = [tuple(row) for row in result.all()]
+        board_ids = [board_id for board_id, _ in boards]
+        media = []
+        for media_type, model in (("music", Song), ("video", Video), ("visuals", Visual)):
+            result = await db.execute(
+                select(model.id, model.board_id)
+                .where(model.board_id.in_(board_ids), model.is_approved == True)
+                .limit(max_media)
+            )
+            media.extend((media_type, item_id, board_id) for item_id, board_id in result.all())
+    if not boards or not media:
+        raise RuntimeError("No generated data found; run `python -m bench generate` first")
+    random.Random(0).shuffle(media)
+    return Dataset(boards=boards, media=media)
+
+
+def _headers(rng: random.Random) -> Dict[str, str]:
+    return {"user-agent": rng.choice(USER_AGENTS)}
+
+
+async def board_views(client: httpx.AsyncClient, data: Dataset, rng: random.Random) -> httpx.Response:
+    board_id, slug = data.board(rng)
+    if rng.random() < 0.7:
+        return await client.get(f"/board/{slug}", headers=_headers(rng))
+    return await client.get(f"/api/boards/{board_id}/content", headers=_headers(rng))
+
+
+async def vote_storm(client: httpx.AsyncClient, data: Dataset, rng: random.Random) -> httpx.Response:
+    media_type, media_id, _ = data.item(rng)
+    return await client.post("/api/voting/vote/anonymous", headers=_headers(rng), data={
+        "media_type": media_type,
+        "media_id": str(media_id),
+        "voter_email": f"storm-{uuid.uuid4().hex[:12]}@{EMAIL_DOMAIN}",
+    })
+
+
+async def leaderboard_polling(client: httpx.AsyncClient, data: Dataset, rng: random.Random) -> httpx.Response:
+    board_id, _ = data.board(rng)
+    if rng.random() < 0.5:
+        return await client.get(f"/api/voting/leaderboard/{board_id}", headers=_headers(rng))
+    url = f"/api/boards/{board_id}/vote-stats"
+    headers = _headers(rng)
+    if url in data.etags:
+        headers["if-none-match"] = data.etags[url]
+    response = await client.get(url, headers=headers)
+    if "etag" in response.headers:
+        data.etags[url] = response.headers["etag"]
+    return response
+
+
+async def concurrent_uploads(client: httpx.AsyncClient, data: Dataset, rng: random.Random) -> httpx.Response:
+    board_id, _ = data.board(rng)
+    body = rng.randbytes(data.upload_bytes)
+    return await client.post(
+        f"/api/boards/{board_id}/upload/music",
+        headers=_headers(rng),
+        data={"title": "Bench Upload", "artist_name": "Bench Artist"},
+        files={"file": ("bench.mp3", body, "audio/mpeg")},
+    )
+
+
+Scenario = Callable[[httpx.AsyncClient, Dataset, random.Random], Awaitable[httpx.Response]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    "board_views": board_views,
+    "vote_storm": vote_storm,
+    "leaderboard_polling": leaderboard_polling,
+    "concurrent_uploads": concurrent_uploads,
+}
@@ -1,6 +1,7 @@
 import asyncio
 import random
-from app.models import Board, Song, User
+import hashlib
+from app.models import Board, Song, User, Vote
 from app.database import AsyncSessionLocal
 from sqlalchemy import select
 
@@ -59,17 +60,23 @@ async def seed():
         for user in users:
             await session.refresh(user)
 
-        # Create songs
+        # Create songs (external links, so there are no files to store)
         songs = []
         for board in boards:
             for i in range(5):
+                url = f"https://cdn.example.com/audio/{random.randint(1000,9999)}.mp3"
                 song = Song(
                     title=random.choice(SONG_TITLES) + f" #{i+1}",
                     artist_name=random.choice(ARTISTS),
-                    board_id=board.id,  # <-- Correct usage
-                    url=f"https://cdn.example.com/audio/{random.randint(1000,9999)}.mp3",
+                    board_id=board.id,
+                    url=url,
+                    file_path=url,
+                    file_size=0,
+                    file_hash="",
+                    external_link=url,
+                    content_source="external",
                     social_link="https://twitter.com/demo_artist",
-                    votes=random.randint(0, 100)
+                    is_approved=True
                 )
                 session.add(song)
                 songs.append(song)
@@ -77,7 +84,25 @@ async def seed():
         for song in songs:
             await session.refresh(song)
 
-    print("Demo data seeded!")
+        # Votes are rows, not a counter on the song
+        for song in songs:
+            for n in range(random.randint(0, 100)):
+                email = f"voter{n}@demo.com"
+                user_agent = "Mozilla/5.0 (demo seed data; not a real browser)"
+                session.add(Vote(
+                    song_id=song.id,
+                    media_type="music",
+                    media_id=song.id,
+                    voter_type="anonymous",
+                    voter_email=email,
+                    vote_type="like",
+                    ip_address=f"10.0.{n // 250}.{n % 250 + 1}",
+                    user_agent=user_agent,
+                    device_fingerprint=hashlib.sha256(f"{n}{user_agent}".encode()).hexdigest()[:32],
+                ))
+        await session.commit()
+
+    print("Demo data seeded! For production-scale data use `python -m bench generate`.")
 
 if __name__ == "__main__":
     asyncio.run(seed())
\ No newline at end of file
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Test script for the email outbox dispatcher
+
+Runs enqueue -> dispatch against a local Brevo stand-in (brevo_api_base_url
+points at it), checking delivery, contact batching, that one malformed
+contact doesn't fail the rest of its batch, retry backoff on 5xx responses
+and giving up after the maximum number of attempts. Needs the database; the
+rows it creates are deleted afterwards.
+"""
+import asyncio
+import sys
+import threading
+import time
+
+# Add the app directory to Python path
+sys.path.insert(0, '/opt/urvote')
+
+FAKE_BREVO_PORT = 8766
+
+
+def start_fake_brevo():
+    """Serve /v3/smtp/email and /v3/contacts/import on localhost, recording each call"""
+    import uvicorn
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    brevo = FastAPI()
+    brevo.state.calls = []
+    brevo.state.fail_with = None  # status code to answer every call with
+
+    async def record(request: Request, path: str, ok_body: dict):
+        brevo.state.calls.append((path, request.headers.get("api-key"), await request.json()))
+        if brevo.state.fail_with:
+            return JSONResponse({"message": "stand-in failure"}, status_code=brevo.state.fail_with)
+        return JSONResponse(ok_body, status_code=201)
+
+    @brevo.post("/v3/smtp/email")
+    async def smtp_email(request: Request):
+        return await record(request, "/smtp/email", {"messageId": f"<fake-{len(brevo.state.calls)}@brevo>"})
+
+    @brevo.post("/v3/contacts/import")
+    async def contacts_import(request: Request):
+        # Like Brevo, reject the whole import if any address is malformed
+        body = await request.json()
+        if any("@" not in contact["email"] for contact in body["jsonBody"]):
+            brevo.state.calls.append(("/contacts/import", request.headers.get("api-key"), body))
+            return JSONResponse({"message": "invalid email"}, status_code=400)
+        return await record(request, "/contacts/import", {"processId": 1})
+
+    server = uvicorn.Server(uvicorn.Config(brevo, port=FAKE_BREVO_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return brevo
+
+
+def check(ok: bool, passed: str, failed: str) -> None:
+    print(f"✅ {passed}" if ok else f"❌ {failed}")
+
+
+async def run_outbox(brevo):
+    from sqlalchemy import delete, func, update
+    from app.config import settings
+    from app.database import AsyncSessionLocal
+    from app.http_client import close_http_client
+    from app.models import EmailOutbox
+    from app import email_outbox
+
+    # app.config clears os.environ on import, so override the settings directly
+    settings.brevo_api_base_url = f"http://127.0.0.1:{FAKE_BREVO_PORT}/v3"
+    settings.brevo_api_key = "fake-brevo-key"
+    settings.email_retry_base = 30.0
+    settings.email_retry_max = 3600.0
+    settings.email_max_attempts = 3
+    created = []
+
+    async def dispatch_all():
+        while await email_outbox.dispatch_batch():
+            pass
+
+    async def load(row_id):
+        async with AsyncSessionLocal() as db:
+            return await db.get(EmailOutbox, row_id)
+
+    async def make_due(row_id):
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(EmailOutbox).where(EmailOutbox.id == row_id).values(next_attempt_at=func.now()))
+            await db.commit()
+
+    try:
+        # Delivery: one email, and three contacts that go out in one call
+        async with AsyncSessionLocal() as db:
+            email = await email_outbox.enqueue_email(db, {
+                "sender": {"email": "noreply@example.com"},
+                "to": [{"email": "fan@example.com"}],
+                "subject": "Outbox test",
+                "htmlContent": "<p>Hello</p>",
+            })
+            contacts = [
+                await email_outbox.enqueue_contact(db, f"subscriber{i}@example.com", 4242)
+                for i in range(3)
+            ]
+            created += [email.id] + [row.id for row in contacts]
+
+        await dispatch_all()
+        rows = [await load(row_id) for row_id in created]
+        check(all(row.status == "sent" and row.sent_at for row in rows),
+              "Email and contacts delivered", f"Not delivered: {[(row.id, row.status) for row in rows]}")
+        imports = [body for path, _, body in brevo.state.calls if path == "/contacts/import" and body["listIds"] == [4242]]
+        check(len(imports) == 1 and len(imports[0]["jsonBody"]) == 3,
+              "Contacts for one list batched into a single import call",
+              f"Contact import calls: {imports}")
+        check(all(key == "fake-brevo-key" for _, key, _ in brevo.state.calls),
+              "API key sent with every call", "API key missing from a call")
+
+        # A malformed address fails only its own row, not the rest of the import
+        async with AsyncSessionLocal() as db:
+            mixed = [
+                await email_outbox.enqueue_contact(db, email, 4343)
+                for email in ("one@example.com", "not-an-address", "two@example.com", "three@example.com")
+            ]
+            created += [row.id for row in mixed]
+        await dispatch_all()
+        rows = [await load(row.id) for row in mixed]
+        statuses = {row.payload["email"]: row.status for row in rows}
+        check(statuses == {"one@example.com": "sent", "not-an-address": "failed",
+                           "two@example.com": "sent", "three@example.com": "sent"},
+              "Rejected import split until only the malformed contact failed",
+              f"After a rejected import: {statuses}")
+
+        # A 5xx reschedules the row with exponential backoff
+        brevo.state.fail_with = 503
+        async with AsyncSessionLocal() as db:
+            retried = await email_outbox.enqueue_email(db, {"to": [{"email": "retry@example.com"}], "subject": "Retry"})
+            created.append(retried.id)
+
+        delays = []
+        for attempt in (1, 2):
+            before = time.time()
+            await dispatch_all()
+            row = await load(retried.id)
+            delays.append(row.next_attempt_at.timestamp() - before)
+            if attempt == 1:
+                check(row.status == "pending" and row.attempts == 1 and "503" in (row.last_error or ""),
+                      "503 leaves the row pending with the error recorded",
+                      f"After a 503: status={row.status} attempts={row.attempts} error={row.last_error}")
+                await make_due(retried.id)
+        base = settings.email_retry_base
+        check(0.8 * base <= delays[0] <= 1.2 * base + 5 and 1.6 * base <= delays[1] <= 2.4 * base + 5,
+              f"Retries backed off {delays[0]:.0f}s then {delays[1]:.0f}s",
+              f"Unexpected retry delays: {delays}")
+
+        # Third failure reaches email_max_attempts
+        await make_due(retried.id)
+        await dispatch_all()
+        row = await load(retried.id)
+        check(row.status == "failed" and row.attempts == settings.email_max_attempts,
+              f"Row marked failed after {row.attempts} attempts",
+              f"After max attempts: status={row.status} attempts={row.attempts}")
+
+        # A 4xx other than 429 isn't retried
+        brevo.state.fail_with = 400
+        async with AsyncSessionLocal() as db:
+            rejected = await email_outbox.enqueue_email(db, {"to": [{"email": "bad@example.com"}], "subject": "Bad"})
+            created.append(rejected.id)
+        await dispatch_all()
+        row = await load(rejected.id)
+        check(row.status == "failed" and row.attempts == 1,
+              "400 fails the row without retrying",
+              f"After a 400: status={row.status} attempts={row.attempts}")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(created)))
+            await db.commit()
+        await close_http_client()
+
+
+def test_email_outbox():
+    try:
+        brevo = start_fake_brevo()
+        asyncio.run(run_outbox(brevo))
+    except Exception as e:
+        print(f"❌ Error testing email outbox: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    test_email_outbox()
@@ -1,51 +1,139 @@
 #!/usr/bin/env python3
 """
 Test script for Google OAuth configuration
+
+Also runs a full code exchange + ID token verification against a local fake
+identity provider, so the async OAuth client can be checked without Google.
 """
+import asyncio
 import sys
 import os
+import threading
+import time
 
 # Add the app directory to Python path
 sys.path.insert(0, '/opt/urvote')
 
+FAKE_IDP_PORT = 8765
+FAKE_CLIENT_ID = "fake-client-id.apps.googleusercontent.com"
+
+
+def start_fake_idp():
+    """Serve a token endpoint and JWKS on localhost, signing with a throwaway RSA key"""
+    import uvicorn
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from fastapi import FastAPI, Form
+    from fastapi.responses import JSONResponse
+    from jose import jwk, jwt
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    public_jwk["kid"] = "fake-key-1"
+    public_jwk = {k: v.decode() if isinstance(v, bytes) else v for k, v in public_jwk.items()}
+
+    idp = FastAPI()
+    idp.state.jwks_hits = 0
+
+    @idp.get("/certs")
+    async def certs():
+        idp.state.jwks_hits += 1
+        return JSONResponse({"keys": [public_jwk]}, headers={"Cache-Control": "public, max-age=300"})
+
+    @idp.post("/token")
+    async def token(code: str = Form(...), client_id: str = Form(...)):
+        now = int(time.time())
+        id_token = jwt.encode({
+            "iss": "https://fake-idp.local",
+            "aud": client_id,
+            "sub": "fake-google-id-123",
+            "email": f"{code}@example.com",
+            "name": "Fake User",
+            "iat": now,
+            "exp": now + 600,
+        }, private_pem.decode(), algorithm="RS256", headers={"kid": "fake-key-1"})
+        return {"access_token": "fake-access", "id_token": id_token, "token_type": "Bearer"}
+
+    server = uvicorn.Server(uvicorn.Config(idp, port=FAKE_IDP_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return idp
+
+
+async def run_fake_login(idp):
+    from app.config import settings
+    from app import google_oauth
+
+    base = f"http://127.0.0.1:{FAKE_IDP_PORT}"
+    settings.google_client_id = FAKE_CLIENT_ID
+    settings.google_client_secret = "fake-secret"
+    settings.google_token_uri = f"{base}/token"
+    settings.google_jwks_uri = f"{base}/certs"
+    settings.google_issuers = ["https://fake-idp.local"]
+
+    for code in ("alice", "bob"):
+        tokens = await google_oauth.exchange_code(code)
+        claims = await google_oauth.verify_id_token(tokens["id_token"])
+        print(f"✅ Verified ID token for {claims['email']}")
+
+    if idp.state.jwks_hits == 1:
+        print("✅ Signing keys fetched once and served from cache")
+    else:
+        print(f"❌ Signing keys fetched {idp.state.jwks_hits} times")
+
+    settings.google_client_id = "someone-else"
+    try:
+        await google_oauth.verify_id_token(tokens["id_token"])
+        print("❌ Token for another audience was accepted")
+    except google_oauth.GoogleAuthError:
+        print("✅ Token for another audience rejected")
+
+
 def test_google_oauth_config():
     try:
         from app.config import settings
         print("✅ Successfully imported settings")
-        
+
         # Test Google OAuth configuration
         print(f"Google Client ID: {settings.google_client_id}")
         print(f"Google Client Secret: {settings.google_client_secret}")
         print(f"Google Redirect URI: {settings.google_redirect_uri}")
-        
+
         # Check if credentials are set
         if settings.google_client_id and settings.google_client_secret:
             print("✅ Google OAuth credentials are configured")
         else:
             print("❌ Google OAuth credentials are missing")
-            
-        # Test Google OAuth imports
+
+        # Test OAuth client import and authorization URL
         try:
-            from google.auth.transport import requests
-            from google.oauth2 import id_token
-            from google_auth_oauthlib.flow import Flow
-            print("✅ Google OAuth libraries imported successfully")
-        except ImportError as e:
-            print(f"❌ Failed to import Google OAuth libraries: {e}")
-            print("Run: pip install google-auth google-auth-oauthlib google-auth-httplib2")
-            
-        # Test OAuth flow creation
+            from app import google_oauth
+            url = google_oauth.authorization_url("test-state")
+            print(f"✅ Authorization URL built: {url[:80]}...")
+        except Exception as e:
+            print(f"❌ Failed to build authorization URL: {e}")
+
+        # Round trip against the local fake IdP
         try:
-            from app.routers.auth_google import get_google_flow
-            flow = get_google_flow()
-            print("✅ Google OAuth flow created successfully")
+            idp = start_fake_idp()
+            asyncio.run(run_fake_login(idp))
         except Exception as e:
-            print(f"❌ Failed to create Google OAuth flow: {e}")
-            
+            print(f"❌ Fake IdP login failed: {e}")
+
     except Exception as e:
         print(f"❌ Error testing Google OAuth: {e}")
         import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
-    test_google_oauth_config()
\ No newline at end of file
+    test_google_oauth_config()